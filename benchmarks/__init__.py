@@ -0,0 +1,4 @@
+"""Scaling benchmarks for the differ and the applier.
+
+Run with `python -m benchmarks.scaling`.
+"""
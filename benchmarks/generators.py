@@ -0,0 +1,152 @@
+"""Generators of large synthetic modules and of their edited versions."""
+
+from __future__ import annotations
+
+import random
+
+
+class ModuleSpec:
+    """Shape of a synthetic module.
+
+    Args:
+        functions: Number of top-level functions
+        classes: Number of classes
+        methods: Number of methods per class
+        imports: Number of import statements
+        dict_size: Number of items of the module level dict literal
+        depth: Nesting depth of the function bodies
+    """
+
+    def __init__(
+        self,
+        functions: int = 0,
+        classes: int = 0,
+        methods: int = 5,
+        imports: int = 0,
+        dict_size: int = 0,
+        depth: int = 1,
+    ) -> None:
+        self.functions = functions
+        self.classes = classes
+        self.methods = methods
+        self.imports = imports
+        self.dict_size = dict_size
+        self.depth = depth
+
+    def __repr__(self) -> str:
+        return "<%s %s>" % (
+            self.__class__.__name__,
+            " ".join("%s=%s" % item for item in vars(self).items()),
+        )
+
+
+class Edits:
+    """Edits applied to one side of a synthetic merge."""
+
+    def __init__(self) -> None:
+        # Functions and methods whose body is changed
+        self.changed: set[str] = set()
+        self.added_functions: list[str] = []
+        self.added_imports: list[str] = []
+        self.added_keys: list[str] = []
+
+
+def _function(name: str, depth: int, indent: str = "", changed: bool = False) -> list[str]:
+    lines = ["%sdef %s(a, b=1, *args, **kwargs):" % (indent, name)]
+    indent += "    "
+    for level in range(depth - 1):
+        lines.append("%sif a > %d:" % (indent, level))
+        indent += "    "
+    # Distinct bodies, like real code
+    lines.append("%sx = a + b + %d" % (indent, sum(map(ord, name))))
+    if changed:
+        lines.append("%sx = x * len(args)" % indent)
+    lines.append("%sreturn x" % indent)
+    return lines
+
+
+def render_module(spec: ModuleSpec, edits: Edits | None = None) -> str:
+    """Return the source of a module of the given shape with edits applied."""
+    if edits is None:
+        edits = Edits()
+    lines = []
+
+    for index in range(spec.imports):
+        lines.append("import module_%d" % index)
+    lines += ["import %s" % name for name in edits.added_imports]
+    if lines:
+        lines += ["", ""]
+
+    if spec.dict_size or edits.added_keys:
+        lines.append("CONFIG = {")
+        for index in range(spec.dict_size):
+            lines.append("    'key_%d': %d," % (index, index))
+        lines += ["    '%s': None," % key for key in edits.added_keys]
+        lines += ["}", "", ""]
+
+    for index in range(spec.functions):
+        name = "function_%d" % index
+        lines += _function(name, spec.depth, changed=name in edits.changed)
+        lines += ["", ""]
+
+    for index in range(spec.classes):
+        lines.append("class Class%d(Base):" % index)
+        lines.append("    attribute = %d" % index)
+        for method_index in range(spec.methods):
+            name = "method_%d_%d" % (index, method_index)
+            lines.append("")
+            lines += _function(name, spec.depth, indent="    ", changed=name in edits.changed)
+        lines += ["", ""]
+
+    for name in edits.added_functions:
+        lines += _function(name, spec.depth)
+        lines += ["", ""]
+
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines) + "\n"
+
+
+def _callables(spec: ModuleSpec) -> list[str]:
+    names = ["function_%d" % index for index in range(spec.functions)]
+    names += [
+        "method_%d_%d" % (index, method_index)
+        for index in range(spec.classes)
+        for method_index in range(spec.methods)
+    ]
+    return names
+
+
+def generate_versions(
+    spec: ModuleSpec, density: float = 0.05, seed: int = 0
+) -> tuple[str, str, str]:
+    """Return base, current and other versions of a synthetic module.
+
+    Each side changes a disjoint share `density` of the function and method
+    bodies and adds as many new functions, imports and dict items, so that
+    the merge is free of conflicts.
+    """
+    rng = random.Random(seed)
+    names = _callables(spec)
+    rng.shuffle(names)
+    changes_count = max(1, int(len(names) * density)) if names else 0
+
+    sides = []
+    for side in ("current", "other"):
+        edits = Edits()
+        edits.changed = set(names[:changes_count])
+        names = names[changes_count:]
+        added_count = max(1, int(spec.functions * density)) if spec.functions else 0
+        edits.added_functions = ["%s_function_%d" % (side, i) for i in range(added_count)]
+        if spec.imports:
+            edits.added_imports = [
+                "%s_module_%d" % (side, i) for i in range(max(1, int(spec.imports * density)))
+            ]
+        if spec.dict_size:
+            edits.added_keys = [
+                "%s_key_%d" % (side, i) for i in range(max(1, int(spec.dict_size * density)))
+            ]
+        sides.append(edits)
+
+    current_edits, other_edits = sides
+    return render_module(spec), render_module(spec, current_edits), render_module(spec, other_edits)
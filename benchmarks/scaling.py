@@ -0,0 +1,226 @@
+"""Measure how the merge steps scale with the size of the merged modules.
+
+Each scenario grows one dimension of a synthetic module. The diff, apply
+and full merge steps are timed for every size and a power law is fitted
+to the timings: an exponent of 1 means linear growth, 2 quadratic.
+
+    python -m benchmarks.scaling
+    python -m benchmarks.scaling --scenario dict --sizes 100,200,400
+    python -m benchmarks.scaling --save-baseline
+
+The run fails if an exponent exceeds the one stored in the baseline by
+more than the tolerance, or if there is no baseline. The baseline records
+the machine it was measured on, the sizes and the tolerance to use.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import time
+from collections.abc import Callable
+
+from redbaron import RedBaron
+
+from benchmarks.generators import ModuleSpec, generate_versions
+from gitmergepy.applier import apply_changes
+from gitmergepy.differ import compute_diff_iterables
+from gitmergepy.runner import merge_ast
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+STEPS = ("diff", "apply", "merge")
+
+DEFAULT_TOLERANCE = 0.3
+
+SCENARIOS: dict[str, tuple[Callable[[int], ModuleSpec], list[int]]] = {
+    "functions": (lambda n: ModuleSpec(functions=n), [50, 100, 200, 400]),
+    "classes": (lambda n: ModuleSpec(classes=n, methods=5), [10, 20, 40, 80]),
+    "imports": (lambda n: ModuleSpec(imports=n, functions=5), [50, 100, 200, 400]),
+    "dict": (lambda n: ModuleSpec(dict_size=n), [100, 200, 400, 800]),
+    "depth": (lambda n: ModuleSpec(functions=20, depth=n), [2, 4, 8, 16]),
+}
+
+
+def _best_time(fun: Callable[[], float], repeat: int) -> float:
+    return min(fun() for _ in range(repeat))
+
+
+def time_steps(base: str, current: str, other: str, repeat: int = 3) -> dict[str, float]:
+    """Time the diff, apply and merge steps on one set of versions.
+
+    Parsing is left out of the timings.
+    """
+
+    def time_diff() -> float:
+        base_ast, other_ast = RedBaron(base), RedBaron(other)
+        start = time.perf_counter()
+        compute_diff_iterables(base_ast, other_ast)
+        return time.perf_counter() - start
+
+    def time_apply() -> float:
+        changes = compute_diff_iterables(RedBaron(base), RedBaron(other))
+        current_ast = RedBaron(current)
+        start = time.perf_counter()
+        apply_changes(current_ast, changes)
+        return time.perf_counter() - start
+
+    def time_merge() -> float:
+        base_ast, current_ast, other_ast = RedBaron(base), RedBaron(current), RedBaron(other)
+        start = time.perf_counter()
+        merge_ast(base_ast, current_ast, other_ast)
+        return time.perf_counter() - start
+
+    return {
+        "diff": _best_time(time_diff, repeat),
+        "apply": _best_time(time_apply, repeat),
+        "merge": _best_time(time_merge, repeat),
+    }
+
+
+def fit_exponent(sizes: list[int], timings: list[float]) -> float:
+    """Least squares slope of log(timing) over log(size)."""
+    points = [(math.log(size), math.log(max(timing, 1e-9))) for size, timing in zip(sizes, timings)]
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def run_scenario(
+    name: str, sizes: list[int] | None = None, density: float = 0.05, repeat: int = 3
+) -> dict[str, float]:
+    """Return the fitted exponent of each step for a scenario."""
+    make_spec, default_sizes = SCENARIOS[name]
+    sizes = sizes or default_sizes
+    timings: dict[str, list[float]] = {step: [] for step in STEPS}
+    for size in sizes:
+        step_timings = time_steps(*generate_versions(make_spec(size), density), repeat=repeat)
+        print(
+            "%-10s %6d  %s"
+            % (
+                name,
+                size,
+                "  ".join("%s %8.4fs" % (step, step_timings[step]) for step in STEPS),
+            )
+        )
+        for step in STEPS:
+            timings[step].append(step_timings[step])
+    return {step: fit_exponent(sizes, timings[step]) for step in STEPS}
+
+
+def environment() -> dict[str, str]:
+    """Describe the machine the exponents are measured on."""
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def save_baseline(
+    path: str, results: dict[str, dict[str, float]], tolerance: float, sizes: list[int] | None
+) -> None:
+    """Store the exponents along with the environment they were measured in.
+
+    The scenarios missing from results keep their stored exponents.
+    """
+    baseline: dict = {"scenarios": {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            baseline = json.load(f)
+    baseline["environment"] = environment()
+    baseline["tolerance"] = tolerance
+    for scenario, exponents in results.items():
+        baseline["scenarios"][scenario] = {
+            "sizes": sizes or SCENARIOS[scenario][1],
+            "exponents": {step: round(exponent, 2) for step, exponent in exponents.items()},
+        }
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(
+    results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float
+) -> list[str]:
+    """Return the steps whose exponent grew past the baseline."""
+    regressions = []
+    for scenario, exponents in results.items():
+        expected_exponents = baseline["scenarios"].get(scenario, {}).get("exponents", {})
+        for step, exponent in exponents.items():
+            expected = expected_exponents.get(step)
+            if expected is not None and exponent > expected + tolerance:
+                regressions.append(
+                    "%s/%s: exponent %.2f, baseline %.2f" % (scenario, step, exponent, expected)
+                )
+    return regressions
+
+
+def main(args: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.scaling")
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), help="default: all"
+    )
+    parser.add_argument("--sizes", help="comma separated sizes, default per scenario")
+    parser.add_argument("--density", type=float, default=0.05, help="share of edited elements")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="default: the one stored in the baseline, else %s" % DEFAULT_TOLERANCE,
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store the exponents as the new baseline"
+    )
+    options = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(size) for size in options.sizes.split(",")] if options.sizes else None
+
+    results = {}
+    for scenario in options.scenario or sorted(SCENARIOS):
+        results[scenario] = run_scenario(scenario, sizes, options.density, options.repeat)
+        print(
+            "%-10s exponents  %s"
+            % (
+                scenario,
+                "  ".join("%s %.2f" % (step, results[scenario][step]) for step in STEPS),
+            )
+        )
+
+    if options.save_baseline:
+        tolerance = DEFAULT_TOLERANCE if options.tolerance is None else options.tolerance
+        save_baseline(options.baseline, results, tolerance, sizes)
+        return 0
+
+    if not os.path.exists(options.baseline):
+        # Without a baseline nothing would ever be reported as a regression
+        print("no baseline at %s, run with --save-baseline" % options.baseline)
+        return 2
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+    if baseline["environment"] != environment():
+        # Exponents are fairly stable across machines, timings are not
+        print("baseline measured on %s" % baseline["environment"]["system"])
+    tolerance = options.tolerance
+    if tolerance is None:
+        tolerance = baseline.get("tolerance", DEFAULT_TOLERANCE)
+    regressions = compare(results, baseline, tolerance)
+    for regression in regressions:
+        print("scaling regression: %s" % regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,99 @@
+"""Measure the import time of the command line entry point.
+
+Short merges run as a git merge driver are dominated by the startup of
+the interpreter, so the entry point must not load the parser and the
+merge modules before they are needed.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --max-ms 50
+
+The module is imported in a fresh interpreter with `python -X importtime`,
+the best cumulative time of the runs is reported with the slowest
+imports. The run fails if one of the deferred modules is imported or if
+the import takes longer than --max-ms.
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+
+ENTRY_POINT = "gitmergepy.runner"
+
+# Only imported once a merge starts
+DEFERRED_MODULES = (
+    "redbaron",
+    "Levenshtein",
+    "diff_match_patch",
+    "gitmergepy.actions",
+    "gitmergepy.differ",
+)
+
+
+def parse_importtime(output: str) -> dict[str, tuple[int, int]]:
+    """Return the self and cumulative import time in microseconds of
+    each module listed by `python -X importtime`."""
+    timings = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            # Header line
+            continue
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def import_timings(module: str = ENTRY_POINT) -> dict[str, tuple[int, int]]:
+    """Import module in a fresh interpreter and return its import timings."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(process.stderr)
+
+
+def deferred_imports(timings: dict[str, tuple[int, int]]) -> list[str]:
+    """Return the deferred modules, or their submodules, that were imported."""
+    return sorted(
+        name
+        for name in timings
+        if any(name == module or name.startswith(module + ".") for module in DEFERRED_MODULES)
+    )
+
+
+def main(args: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--module", default=ENTRY_POINT)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports shown")
+    parser.add_argument("--max-ms", type=float, help="fail above this cumulative import time")
+    options = parser.parse_args(args)
+
+    runs = [import_timings(options.module) for _ in range(options.repeat)]
+    timings = min(runs, key=lambda run: run[options.module][1])
+    total_ms = timings[options.module][1] / 1000
+    print("%s imported in %.1fms" % (options.module, total_ms))
+    slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[: options.top]:
+        print(
+            "  %-40s self %7.1fms  cumulative %7.1fms"
+            % (name, self_us / 1000, cumulative_us / 1000)
+        )
+
+    failed = False
+    for name in deferred_imports(timings):
+        print("startup regression: %s imported" % name)
+        failed = True
+    if options.max_ms is not None and total_ms > options.max_ms:
+        print("startup regression: %.1fms, maximum %.1fms" % (total_ms, options.max_ms))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
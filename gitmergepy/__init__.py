@@ -1,6 +1,20 @@
 """gitmergepy - AST-based merge conflict resolver for Python files."""
 
-from .runner import main, merge_ast, merge_files
+from __future__ import annotations
 
-__all__ = ["main", "merge_ast", "merge_files"]
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .runner import check_ast, check_files, main, merge_ast, merge_files
+
+__all__ = ["check_ast", "check_files", "main", "merge_ast", "merge_files"]
 __version__ = "0.1.0"
+
+
+def __getattr__(name: str) -> Any:
+    # Importing the package does not load the runner and the parser
+    if name in __all__:
+        from . import runner
+
+        return getattr(runner, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
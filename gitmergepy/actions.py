@@ -3,7 +3,6 @@ from __future__ import annotations
 import logging
 from typing import TYPE_CHECKING, Any
 
-from diff_match_patch import diff_match_patch
 from redbaron import nodes
 from redbaron.base_nodes import BaseNode, NodeList
 from redbaron.node_mixin import CodeBlockMixin
@@ -13,6 +12,7 @@ from .applier import apply_changes
 from .conflicts import add_conflict, add_conflicts
 from .context import (
     AfterContext,
+    ContextEl,
     find_context,
     find_context_with_reduction,
     gather_after_context,
@@ -21,15 +21,18 @@ from .context import (
 from .matcher import (
     CODE_BLOCK_SIMILARITY_THRESHOLD,
     code_block_similarity,
+    dict_key_index,
     find_class,
     find_el,
     find_func,
     find_import,
     find_imports,
     find_key,
-    same_arg_guess,
+    forget_call_index,
+    forget_dict_key_index,
     same_el_guess,
 )
+from .stringdiff import apply_patches
 from .tools import (
     apply_diff_to_list,
     as_from_contexts,
@@ -38,6 +41,7 @@ from .tools import (
     get_call_els,
     id_from_arg,
     id_from_el,
+    import_key,
     merge_imports,
     same_el,
     short_context,
@@ -57,6 +61,10 @@ if TYPE_CHECKING:
 
 # Type alias for action classes (no common base class)
 Action = Any
+# Text of a list item and its rank among the items with the same text
+ItemAnchor = tuple[str, int]
+# Previous and following unchanged items, removed items and added items
+SequenceEdit = tuple[ItemAnchor | None, ItemAnchor | None, list[ItemAnchor], list["Node"]]
 
 BaseNode.new = False
 BaseNode.already_processed = False
@@ -82,6 +90,33 @@ def set_cursor(tree: ProxyList, el: Node) -> None:
     tree.cursor = el
 
 
+def insert_el(tree: ProxyList, el_to_add: Node, index: int) -> Node:
+    """Insert a copy of el_to_add at index, keeping its line layout."""
+    if index > 0 and not el_to_add.on_new_line:
+        tree[index - 1].remove_endl()
+
+    el = el_to_add.copy()
+    el.new = True
+    # Add endl for code proxy lists
+    endl = isinstance(el_to_add.associated_sep, nodes.EndlNode)
+    if el_to_add.associated_sep:
+        endl = endl or bool(el_to_add.associated_sep.endl)
+
+    if endl:
+        tree.insert_with_new_line(index, el)
+    else:
+        tree.insert(index, el)
+
+    set_cursor(tree, el)
+
+    # Handle comma separated lists and such that don't add a new line
+    # by default
+    if el_to_add.on_new_line and not el.on_new_line:
+        tree.put_on_new_line(el)
+
+    return el
+
+
 def first_index_after_cursor(tree: ProxyList, indexes: list[int]) -> int | None:
     assert indexes
 
@@ -95,6 +130,8 @@ def first_index_after_cursor(tree: ProxyList, indexes: list[int]) -> int | None:
 
 
 class BaseEl:
+    __slots__ = ("el",)
+
     def __init__(self, el: Node) -> None:
         self.el = el
 
@@ -103,6 +140,8 @@ class BaseEl:
 
 
 class ElWithContext(BaseEl):
+    __slots__ = ("context",)
+
     def __init__(self, el: Node, context: BeforeContext) -> None:
         super().__init__(el)
         self.context = context
@@ -116,6 +155,8 @@ class ElWithContext(BaseEl):
 
 
 class RemoveEls:
+    __slots__ = ("to_remove", "context")
+
     def __init__(self, to_remove: list[Node], context: BeforeContext) -> None:
         assert to_remove
         self.to_remove = to_remove
@@ -203,6 +244,8 @@ class RemoveEls:
 
 
 class AddImports:
+    __slots__ = ("imports", "one_per_line", "add_brackets")
+
     def __init__(
         self, imports: list[Node], one_per_line: bool = False, add_brackets: bool = False
     ) -> None:
@@ -243,6 +286,8 @@ class AddImports:
 
 
 class RemoveImports:
+    __slots__ = ("imports",)
+
     def __init__(self, imports: list[Node]) -> None:
         self.imports = imports
 
@@ -269,6 +314,8 @@ class RemoveImports:
 
 
 class BaseAddEls:
+    __slots__ = ("to_add", "context", "after_context", "added")
+
     def __init__(
         self,
         to_add: list[Node],
@@ -292,7 +339,7 @@ class BaseAddEls:
         self.to_add.append(el)
         if isinstance(self.context, AfterContext):
             first_in_context = self.context.pop(0)
-            assert el is first_in_context
+            assert first_in_context == ContextEl(el)
             self.context = gather_after_context(self.to_add[-1])
 
     def apply(self, tree: ProxyList) -> list[Conflict]:
@@ -320,9 +367,11 @@ class BaseAddEls:
                 logging.debug(". context not found")
                 if empty_lines(self.to_add):
                     return []
-                if isinstance(self.context[0], (nodes.DefNode, nodes.ClassNode)) and all(
-                    isinstance(el, nodes.CommentNode) for el in self.to_add
-                ):
+                first_in_context = self.context[0]
+                if (
+                    first_in_context is not None
+                    and first_in_context.is_a((nodes.DefNode, nodes.ClassNode))
+                ) and all(isinstance(el, nodes.CommentNode) for el in self.to_add):
                     return []
                 return [Conflict(self.to_add, self, reason="context not found")]
 
@@ -353,36 +402,16 @@ class BaseAddEls:
         return []
 
     def _insert_el(self, el_to_add: Node, index: int, tree: ProxyList) -> None:
-        if index > 0 and not el_to_add.on_new_line:
-            tree[index - 1].remove_endl()
-
-        el = el_to_add.copy()
-        el.new = True
-        # Add endl for code proxy lists
-        endl = isinstance(el_to_add.associated_sep, nodes.EndlNode)
-        if el_to_add.associated_sep:
-            endl = endl or bool(el_to_add.associated_sep.endl)
-
-        if endl:
-            tree.insert_with_new_line(index, el)
-        else:
-            tree.insert(index, el)
-
-        self.added.append(el)
-
-        set_cursor(tree, el)
-
-        # Handle comma separated lists and such that don't add a new line
-        # by default
-        if el_to_add.on_new_line and not el.on_new_line:
-            tree.put_on_new_line(el)
+        self.added.append(insert_el(tree, el_to_add, index))
 
 
 class AddEls(BaseAddEls):
-    pass
+    __slots__ = ()
 
 
 class AddChangeEl(BaseAddEls):
+    __slots__ = ("changes",)
+
     def __init__(
         self,
         to_add: Node,
@@ -401,6 +430,8 @@ class AddChangeEl(BaseAddEls):
 
 
 class ReplaceEls(BaseAddEls):
+    __slots__ = ("to_remove",)
+
     def __init__(
         self, to_add: list[Node], to_remove: list[Node], context: BeforeContext | AfterContext
     ) -> None:
@@ -511,6 +542,8 @@ class ReplaceEls(BaseAddEls):
 
 
 class Replace:
+    __slots__ = ("new_value", "old_value")
+
     def __init__(self, new_value: Node, old_value: Node) -> None:
         self.new_value = new_value
         self.old_value = old_value
@@ -525,6 +558,7 @@ class Replace:
                         reason="Different from old value %r" % short_display_el(self.old_value),
                     )
                 ]
+        forget_call_index(tree.parent)
         tree.replace(self.new_value.copy())
         return []
 
@@ -533,12 +567,16 @@ class Replace:
 
 
 class ReplaceTarget(Replace):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         tree.target = self.new_value
         return []
 
 
 class ReplaceAttr:
+    __slots__ = ("attr_name", "attr_value")
+
     def __init__(self, attr_name: str, attr_value: Any) -> None:
         self.attr_name = attr_name
         self.attr_value = attr_value
@@ -563,6 +601,8 @@ class ReplaceAttr:
 
 
 class ReplaceAnnotation:
+    __slots__ = ("new_value",)
+
     def __init__(self, new_value: Node | None) -> None:
         self.new_value = new_value
 
@@ -580,18 +620,23 @@ class ReplaceAnnotation:
 
 
 class RemoveAllDecoratorArgs(BaseEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         tree.call = None
         return []
 
 
 class AddAllDecoratorArgs(BaseEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         tree.call = self.el.copy()
         return []
 
 
 class ChangeEl(BaseEl):
+    __slots__ = ("changes", "context")
     write_conflicts: bool = True
 
     def __init__(
@@ -632,6 +677,8 @@ class ChangeEl(BaseEl):
 
 
 class ChangeAttr:
+    __slots__ = ("attr_name", "changes")
+
     def __init__(self, attr_name: str, changes: list[Action]) -> None:
         self.attr_name = attr_name
         self.changes = changes
@@ -649,13 +696,118 @@ class ChangeAttr:
 
 
 class ChangeValue(ChangeEl):
+    __slots__ = ()
     write_conflicts: bool = False
 
     def apply(self, tree: Node) -> list[Conflict]:
         return apply_changes(tree.value, self.changes)
 
 
+class ChangeSequence:
+    """Remove and insert items of a long list or tuple.
+
+    Items are identified by their text and their rank among the items with
+    the same text. Each edit is anchored on the unchanged items around it,
+    which are located through an index built once per apply.
+    """
+
+    __slots__ = ("edits",)
+
+    def __init__(self, edits: list[SequenceEdit]) -> None:
+        self.edits = edits
+
+    def __repr__(self) -> str:
+        return "<%s edits=%r>" % (
+            self.__class__.__name__,
+            [
+                (
+                    [key for key, _ in removed],
+                    [short_display_el(el) for el in added],
+                )
+                for _, _, removed, added in self.edits
+            ],
+        )
+
+    def apply(self, tree: ProxyList) -> list[Conflict]:
+        logging.debug(". changing %d sequence items", len(self.edits))
+        positions: dict[str, list[int]] = {}
+        for index, el in enumerate(tree):
+            if not el.hidden:
+                positions.setdefault(el.dumps(), []).append(index)
+
+        def locate(item: ItemAnchor | None) -> int | None:
+            if item is None:
+                return None
+            key, rank = item
+            indexes = positions.get(key, [])
+            # A rank past the duplicates left means the item is gone
+            if rank >= len(indexes):
+                return None
+            return indexes[rank]
+
+        def already_applied(
+            previous: ItemAnchor | None, following: ItemAnchor | None, added: list[Node]
+        ) -> bool:
+            """Whether the items between the anchors are the added ones."""
+            start = 0 if previous is None else locate(previous)
+            end = len(tree) if following is None else locate(following)
+            if start is None or end is None:
+                return False
+            if previous is not None:
+                start += 1
+            between = [tree[i].dumps() for i in range(start, end) if not tree[i].hidden]
+            return between == [el.dumps() for el in added]
+
+        conflicts = []
+        insertions = []
+        # Hidden elements keep their place, the indexes stay valid
+        for number, (previous, following, removed, added) in enumerate(self.edits):
+            indexes = [locate(item) for item in removed]
+            if None in indexes:
+                # Also changed on this side, unless it made the same change
+                if already_applied(previous, following, added):
+                    logging.debug(".. sequence edit already applied")
+                else:
+                    conflicts.append(Conflict(added, self, reason="removed item changed"))
+                continue
+            low = -1 if previous is None else locate(previous)
+            high = len(tree) if following is None else locate(following)
+            if any(
+                (low is not None and index <= low) or (high is not None and index >= high)
+                for index in indexes
+            ):
+                # The rank points to a duplicate added elsewhere on this side
+                conflicts.append(Conflict(added, self, reason="removed item moved"))
+                continue
+            for index in indexes:
+                tree.hide(tree[index])
+            if not added:
+                continue
+
+            if previous is None:
+                index = 0
+            else:
+                index = locate(previous)
+                if index is not None:
+                    index += 1
+            if index is None:
+                index = len(tree) if following is None else locate(following)
+            if index is None:
+                conflicts.append(Conflict(added, self, reason="context not found"))
+                continue
+            insertions.append((index, number, added))
+
+        # From the end so that the insertions do not move the next ones
+        for index, _, added in sorted(insertions, key=lambda i: i[:2], reverse=True):
+            for offset, el in enumerate(added):
+                insert_el(tree, el, index + offset)
+
+        return conflicts
+
+
 class ChangeReturn(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug(". changing %s", short_display_el(tree))
         conflicts = apply_changes(tree.value, self.changes)
@@ -664,25 +816,33 @@ class ChangeReturn(ChangeEl):
 
 
 class ChangeCall(ChangeEl):
-    pass
+    __slots__ = ()
 
 
 class ChangeDecoratorArgs(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         return apply_changes(tree.call, self.changes)
 
 
 class ChangeArg(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         return apply_changes(tree.value, self.changes)
 
 
 class ChangeAnnotation(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         return apply_changes(tree.annotation, self.changes)
 
 
 class ChangeDefArg(ChangeEl):
+    __slots__ = ()
+
     def get_args(self, tree: Node) -> ProxyList:
         return tree.arguments
 
@@ -704,11 +864,15 @@ class ChangeDefArg(ChangeEl):
 
 
 class ChangeCallArg(ChangeDefArg):
+    __slots__ = ()
+
     def get_args(self, tree: Node) -> Node:  # type: ignore[override]
         return tree
 
 
 class ArgOnNewLine:
+    __slots__ = ("indentation",)
+
     def __init__(self, indentation: str | None = None) -> None:
         self.indentation = indentation
 
@@ -722,6 +886,8 @@ class ArgOnNewLine:
 
 
 class ArgRemoveNewLine:
+    __slots__ = ()
+
     def __repr__(self) -> str:
         return "<%s>" % self.__class__.__name__
 
@@ -732,6 +898,8 @@ class ArgRemoveNewLine:
 
 
 class RemoveCallEndl:
+    __slots__ = ()
+
     def __repr__(self) -> str:
         return "<%s>" % (self.__class__.__name__)
 
@@ -744,6 +912,8 @@ class RemoveCallEndl:
 
 
 class Conflict:
+    __slots__ = ("els", "change", "reason", "insert_before")
+
     def __init__(
         self, els: list[Node], change: Action, reason: str = "", insert_before: bool = True
     ) -> None:
@@ -762,6 +932,8 @@ class Conflict:
 
 
 class ChangeFun(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: ProxyList) -> list[Conflict]:
         logging.debug("changing fun %r", short_display_el(self.el))
         el = find_func(tree, self.el)
@@ -780,6 +952,8 @@ class ChangeFun(ChangeEl):
 
 
 class ChangeImport(ChangeEl):
+    __slots__ = ("can_be_added_as_is",)
+
     def __init__(
         self,
         el: Node,
@@ -836,7 +1010,163 @@ class ChangeImport(ChangeEl):
         return []
 
 
+class MergeImportBlock:
+    """Add and remove the names imported by a block of imports in one pass.
+
+    Used instead of one ChangeImport per import statement for large
+    import blocks, the order of the statements is not merged. Only the
+    leading import block of the module is changed.
+    """
+
+    __slots__ = ("added", "removed", "added_plain", "removed_plain")
+
+    def __init__(
+        self,
+        added: list[tuple[Node, list[Node]]],
+        removed: list[tuple[str, list[Node]]],
+        added_plain: list[Node],
+        removed_plain: list[str],
+    ) -> None:
+        # from imports with the targets to add
+        self.added = added
+        # Modules of from imports with the targets to remove
+        self.removed = removed
+        # Plain import statements
+        self.added_plain = added_plain
+        self.removed_plain = removed_plain
+
+    def __repr__(self) -> str:
+        return "<%s added=%r removed=%r>" % (
+            self.__class__.__name__,
+            [short_display_el(el) for el in self.added_plain]
+            + [
+                "%s: %s" % (id_from_el(el), short_display_list(targets))
+                for el, targets in self.added
+            ],
+            self.removed_plain
+            + [
+                "%s: %s" % (module, short_display_list(targets)) for module, targets in self.removed
+            ],
+        )
+
+    def _insert(self, tree: ProxyList, index: int, statement: Node) -> Node:
+        el = statement.copy()
+        el.new = True
+        tree.insert_with_new_line(index, el)
+        return el
+
+    def _leading_block(self, tree: ProxyList) -> tuple[list[Node], int, int]:
+        """Return the visible imports of the leading import block of tree,
+        the index of its first import and the index following its last.
+
+        Without imports both indexes follow the docstring and comments
+        at the top of the module.
+        """
+        imports = []
+        start = 0
+        end = None
+        for index, el in enumerate(tree):
+            if el.hidden or isinstance(el, nodes.EmptyLineNode):
+                continue
+            if isinstance(el, (nodes.FromImportNode, nodes.ImportNode)):
+                if not imports:
+                    start = index
+                imports.append(el)
+                end = index + 1
+            elif imports or not isinstance(el, (nodes.StringNode, nodes.CommentNode)):
+                break
+            else:
+                # Docstring or comment before the imports
+                start = index + 1
+        return imports, start, start if end is None else end
+
+    def apply(self, tree: ProxyList) -> list[Conflict]:
+        logging.debug("merging import block")
+        imports, start, index = self._leading_block(tree)
+        from_imports: dict[str, list[Node]] = {}
+        plain_imports: dict[str, Node] = {}
+        # Imported name -> module, alias and statement, to tell changed
+        # imports apart from removed ones
+        names: dict[str, list[tuple[str, str, Node]]] = {}
+        for el in imports:
+            if isinstance(el, nodes.FromImportNode):
+                module = id_from_el(el)
+                from_imports.setdefault(module, []).append(el)
+                for target in el.targets:
+                    name, alias = import_key(target)
+                    names.setdefault(name, []).append((module, alias, el))
+            else:
+                plain_imports.setdefault(id_from_el(el), el)
+
+        conflicts = []
+        # Hidden at the end to keep the insertion index valid
+        to_hide: dict[int, Node] = {}
+        for module, targets in self.removed:
+            keys = set(import_key(target) for target in targets)
+            found = set()
+            for el in from_imports.get(module, []):
+                to_remove = [target for target in el.targets if import_key(target) in keys]
+                found.update(import_key(target) for target in to_remove)
+                if len(to_remove) == len(el.targets):
+                    to_hide[id(el)] = el
+                elif to_remove:
+                    RemoveImports(to_remove).apply(el)
+            for name, alias in keys - found:
+                changed = [
+                    el
+                    for other_module, other_alias, el in names.get(name, [])
+                    if (other_module, other_alias) != (module, alias)
+                ]
+                if changed:
+                    # Aliased or moved to another module on the other side
+                    logging.debug(". import %s changed, can not remove it", name)
+                    conflicts.append(Conflict(changed[:1], self, reason="removed import changed"))
+        for key in self.removed_plain:
+            if key in plain_imports:
+                el = plain_imports.pop(key)
+                to_hide[id(el)] = el
+
+        for statement, targets in self.added:
+            module = id_from_el(statement)
+            existing = [el for el in from_imports.get(module, []) if id(el) not in to_hide]
+            existing_names = set(target.value for el in existing for target in el.targets)
+            existing_keys = set(import_key(target) for el in existing for target in el.targets)
+            targets = [target for target in targets if import_key(target) not in existing_keys]
+            if not targets:
+                continue
+            # The same name with another alias needs its own statement
+            if existing and all(target.value not in existing_names for target in targets):
+                AddImports(targets).apply(existing[0])
+                continue
+            logging.debug(". adding %r", short_display_el(statement))
+            if module == "__future__":
+                # Future imports have to come before any other import
+                el = self._insert(tree, start, statement)
+                start += 1
+            else:
+                el = self._insert(tree, index, statement)
+            index += 1
+            keys = set(import_key(target) for target in targets)
+            extra_targets = [target for target in el.targets if import_key(target) not in keys]
+            if extra_targets:
+                RemoveImports(extra_targets).apply(el)
+            from_imports.setdefault(module, []).append(el)
+        for statement in self.added_plain:
+            if id_from_el(statement) not in plain_imports:
+                logging.debug(". adding %r", short_display_el(statement))
+                plain_imports[id_from_el(statement)] = self._insert(tree, index, statement)
+                index += 1
+
+        for el in to_hide.values():
+            logging.debug(". removing %r", short_display_el(el))
+            tree.hide(el)
+
+        return conflicts
+
+
 class ChangeClass(ChangeEl):
+    __slots__ = ("old_name",)
+
     def __init__(
         self,
         el: Node,
@@ -873,6 +1203,8 @@ class ChangeClass(ChangeEl):
 
 
 class EnsureEmptyLines:
+    __slots__ = ("lines",)
+
     def __init__(self, lines: list[Node]) -> None:
         self.lines = lines
 
@@ -897,6 +1229,7 @@ class EnsureEmptyLines:
 
 
 class MoveElWithId(ChangeEl):
+    __slots__ = ("old_empty_lines", "finder")
     finder: Any  # Callable set by subclasses
 
     def __init__(
@@ -958,33 +1291,44 @@ class MoveElWithId(ChangeEl):
 
 
 class MoveFun(MoveElWithId):
+    __slots__ = ()
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.finder = find_func
 
 
 class MoveClass(MoveElWithId):
+    __slots__ = ()
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.finder = find_class
 
 
 class ChangeAssignment(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         return apply_changes(tree.value, self.changes)
 
 
 class ChangeAtomTrailer(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         if not isinstance(tree, nodes.AtomtrailersNode) or len(tree.value.node_list) != len(
             self.el.value.node_list
         ):
+            forget_call_index(tree.parent)
             tree.replace(self.el.copy())
             return []
         return apply_changes(tree, self.changes)
 
 
 class ChangeAtomtrailersEl(ChangeEl):
+    __slots__ = ("index",)
+
     def __init__(self, el: Node, changes: list[Action], index: int) -> None:
         super().__init__(el, changes=changes)
         self.index = index
@@ -1001,6 +1345,8 @@ class ChangeAtomtrailersEl(ChangeEl):
 
 
 class ChangeAtomtrailersCall(ChangeEl):
+    __slots__ = ("index",)
+
     def __init__(self, el: Node, changes: list[Action], index: int) -> None:
         super().__init__(el, changes=changes)
         self.index = index
@@ -1016,6 +1362,8 @@ class ChangeAtomtrailersCall(ChangeEl):
 
 
 class ChangeDecorator(ChangeEl):
+    __slots__ = ()
+
     def __init__(
         self, el: Node, changes: list[Action], context: BeforeContext | None = None
     ) -> None:
@@ -1030,6 +1378,8 @@ class ChangeDecorator(ChangeEl):
 
 
 class AddFunArg:
+    __slots__ = ("arg", "context", "on_new_line")
+
     def __init__(self, arg: Node, context: BeforeContext, on_new_line: bool) -> None:
         self.arg = arg
         self.context = context
@@ -1075,6 +1425,8 @@ class AddFunArg:
 
 
 class AddCallArg(AddFunArg):
+    __slots__ = ()
+
     def get_args(self, tree: Node) -> Node:  # type: ignore[override]
         return tree
 
@@ -1083,13 +1435,15 @@ class AddCallArg(AddFunArg):
 
 
 class AddDecorator(ElWithContext):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         decorator = self.el.copy()
         logging.debug(
             ". adding decorator %r to %r", short_display_el(self.el), short_display_el(tree)
         )
         context = self.context.copy()
-        if isinstance(context[0], nodes.EndlNode):
+        if context[0] is not None and context[0].is_a(nodes.EndlNode):
             del context[0]
         logging.debug(".. context %s", short_context(context))
         indexes = find_context(self.get_elements(tree), context)
@@ -1108,6 +1462,8 @@ class AddDecorator(ElWithContext):
 
 
 class AddBase(AddDecorator):
+    __slots__ = ()
+
     @staticmethod
     def get_elements(tree: Node) -> ProxyList:
         return tree.inherit_from
@@ -1125,6 +1481,8 @@ class AddBase(AddDecorator):
 
 
 class RemoveFunArgs:
+    __slots__ = ("args",)
+
     def __init__(self, args: list[Node]) -> None:
         self.args = args
 
@@ -1149,11 +1507,15 @@ class RemoveFunArgs:
 
 
 class RemoveCallArgs(RemoveFunArgs):
+    __slots__ = ()
+
     def get_args(self, tree: Node) -> Node:  # type: ignore[override]
         return tree
 
 
 class RemoveDecorators(RemoveFunArgs):
+    __slots__ = ()
+
     def get_args(self, tree: Node) -> ProxyList:
         return tree.decorators
 
@@ -1167,6 +1529,8 @@ class RemoveDecorators(RemoveFunArgs):
 
 
 class RemoveBases(RemoveDecorators):
+    __slots__ = ()
+
     def get_args(self, tree: Node) -> ProxyList:
         return tree.inherit_from
 
@@ -1180,6 +1544,8 @@ class RemoveBases(RemoveDecorators):
 
 
 class RemoveWith(ElWithContext):
+    __slots__ = ()
+
     def apply(self, tree: ProxyList) -> list[Conflict]:
         logging.debug('removing "with"')
         el_node_as = as_from_contexts(self.el.contexts)
@@ -1201,7 +1567,11 @@ class RemoveWith(ElWithContext):
                         if (
                             self.context[-1] is None
                             and previous_el is None
-                            or (self.context[-1] and same_el(previous_el, self.context[-1]))
+                            or (
+                                self.context[-1] is not None
+                                and previous_el is not None
+                                and ContextEl(previous_el) == self.context[-1]
+                            )
                         ):
                             context_with_nodes += [el]
             if not isinstance(el, nodes.EndlNode):
@@ -1242,6 +1612,8 @@ class RemoveWith(ElWithContext):
 
 
 class ChangeIndentation:
+    __slots__ = ("relative_indentation",)
+
     def __init__(self, relative_indentation: int) -> None:
         self.relative_indentation = relative_indentation
 
@@ -1271,6 +1643,8 @@ class ChangeIndentation:
 
 
 class AddDictItem(BaseAddEls):
+    __slots__ = ()
+
     def __init__(self, el: Node, previous_item: Node | None) -> None:
         super().__init__([el], context=[previous_item])
 
@@ -1286,7 +1660,8 @@ class AddDictItem(BaseAddEls):
         if not isinstance(tree, nodes.DictNode):
             return [Conflict([tree], self, reason="Invalid type %s, expected dict" % type(tree))]
 
-        if find_key(self.el.key, tree):
+        key_index = dict_key_index(tree)
+        if key_index.find_position(self.el.key) is not None:
             logging.debug("key %s already exists", short_display_el(self.el.key))
             return []
 
@@ -1297,34 +1672,42 @@ class AddDictItem(BaseAddEls):
                 short_display_el(self.previous_item.key),
             )
 
-            previous_key = find_key(self.previous_item.key, tree)
-            if not previous_key:
+            previous_position = key_index.find_position(self.previous_item.key)
+            if previous_position is None:
                 index = len(tree.value)
             else:
-                index = tree.index(previous_key) + 1
+                index = previous_position + 1
         else:
             logging.debug("adding key %s at the beginning", short_display_el(self.el.key))
             index = 0
 
         self._insert_el(self.el, index, tree)
+        key_index.add(self.added[-1], index)
 
         return []
 
 
 class RemoveDictItem(BaseEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug("removing key %s", short_display_el(self.el))
 
         if not isinstance(tree, nodes.DictNode):
             return [Conflict([tree], self, reason="Invalid type %s, expected dict" % type(tree))]
 
-        item = find_key(self.el.key, tree)
-        if item is not None:
+        key_index = dict_key_index(tree)
+        position = key_index.find_position(self.el.key)
+        if position is not None:
+            item = tree.value[position]
             tree.remove(item)
+            key_index.remove(item, position)
         return []
 
 
 class ChangeDictValue(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug("changing key %s", short_display_el(self.el.key))
 
@@ -1338,6 +1721,8 @@ class ChangeDictValue(ChangeEl):
 
 
 class ChangeDictItem(ChangeEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug("changing key %s", short_display_el(self.el.key))
 
@@ -1347,10 +1732,17 @@ class ChangeDictItem(ChangeEl):
         item = find_key(self.el.key, tree)
         if not item:
             return []
-        return apply_changes(item, self.changes)
+        key = item.key.dumps()
+        conflicts = apply_changes(item, self.changes)
+        if item.key.dumps() != key:
+            # The item is indexed under its old key
+            forget_dict_key_index(tree)
+        return conflicts
 
 
 class ChangeAssociatedSep:
+    __slots__ = ("changes",)
+
     def __repr__(self) -> str:
         return "<%s changes=%r>" % (self.__class__.__name__, self.changes)
 
@@ -1374,6 +1766,8 @@ class ChangeAssociatedSep:
 
 
 class ReplaceDictComment(BaseEl):
+    __slots__ = ("new_value",)
+
     def __init__(self, el: Node, new_value: Node) -> None:
         super().__init__(el)
         self.new_value = new_value
@@ -1390,6 +1784,8 @@ class ReplaceDictComment(BaseEl):
 
 
 class RenameClass(BaseEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug("renaming class %s to %s", tree.name, self.el.name)
         tree.name = self.el.name
@@ -1397,6 +1793,8 @@ class RenameClass(BaseEl):
 
 
 class RenameDef(BaseEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug("renaming def %s to %s", tree.name, self.el.name)
         tree.name = self.el.name
@@ -1404,6 +1802,8 @@ class RenameDef(BaseEl):
 
 
 class MoveArg:
+    __slots__ = ("context",)
+
     def __init__(self, context: BeforeContext) -> None:
         self.context = context
 
@@ -1415,7 +1815,11 @@ class MoveArg:
         if tree.previous is None and self.context[0] is None:
             logging.debug("... already at the beginning")
             return []
-        if tree.previous and self.context[0] and same_arg_guess(self.context[0], tree.previous):
+        if (
+            tree.previous
+            and self.context[0]
+            and self.context[0].arg_id == id_from_arg(tree.previous)
+        ):
             logging.debug("... already in place")
             return []
 
@@ -1425,7 +1829,7 @@ class MoveArg:
             return []
 
         for el in tree.parent:
-            if same_arg_guess(self.context[0], el):
+            if self.context[0].arg_id == id_from_arg(el):
                 tree.parent.remove(tree)
                 el.insert_after(tree)
                 return []
@@ -1456,6 +1860,7 @@ def copy_and_transfer_anchors(el: Node) -> Node:
 
 
 class MoveEl(ElWithContext):
+    __slots__ = ()
     conflict_if_missing: bool = True
 
     def apply(self, tree: Node) -> list[Conflict]:
@@ -1486,10 +1891,13 @@ class MoveEl(ElWithContext):
 
 
 class MoveImport(MoveEl):
+    __slots__ = ()
     conflict_if_missing: bool = True
 
 
 class ChangeHeader:
+    __slots__ = ("changes",)
+
     def __init__(self, changes: list[Action]) -> None:
         self.changes = changes
 
@@ -1499,6 +1907,8 @@ class ChangeHeader:
 
 
 class MakeInline:
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug(".. making inline")
         if not tree.value.header:
@@ -1512,6 +1922,8 @@ class MakeInline:
 
 
 class MakeMultiline:
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug(".. making multiline")
         if tree.value.header:
@@ -1525,6 +1937,8 @@ class MakeMultiline:
 
 
 class SameEl(BaseEl):
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         from .differ import look_ahead
 
@@ -1538,6 +1952,8 @@ class SameEl(BaseEl):
 
 
 class ChangeElseNode:
+    __slots__ = ("changes",)
+
     def __init__(self, changes: list[Action]) -> None:
         self.changes = changes
 
@@ -1552,6 +1968,8 @@ class ChangeElseNode:
 
 
 class AddElseNode:
+    __slots__ = ("new_else",)
+
     def __init__(self, new_else: Node) -> None:
         self.new_else = new_else
 
@@ -1567,6 +1985,8 @@ class AddElseNode:
 
 
 class RemoveElseNode:
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug(". removing else")
 
@@ -1578,6 +1998,8 @@ class RemoveElseNode:
 
 
 class ChangeNumberValue:
+    __slots__ = ("new_value",)
+
     def __init__(self, new_value: str) -> None:
         self.new_value = new_value
 
@@ -1590,6 +2012,8 @@ class ChangeNumberValue:
 
 
 class ChangeExceptsNode:
+    __slots__ = ("index", "changes")
+
     def __init__(self, index: int, changes: list[Action]) -> None:
         self.index = index
         self.changes = changes
@@ -1619,6 +2043,8 @@ class ChangeExceptsNode:
 class ChangeExceptionType:
     """Change the exception type of an except clause."""
 
+    __slots__ = ("new_exception",)
+
     def __init__(self, new_exception: Node | None) -> None:
         self.new_exception = new_exception
 
@@ -1637,6 +2063,8 @@ class ChangeExceptionType:
 class ChangeExceptionTarget:
     """Change the exception target (as variable) of an except clause."""
 
+    __slots__ = ("new_target", "new_delimiter")
+
     def __init__(self, new_target: Node | None, new_delimiter: str) -> None:
         self.new_target = new_target
         self.new_delimiter = new_delimiter
@@ -1658,6 +2086,8 @@ class ChangeExceptionTarget:
 class AddExcept:
     """Add a new except clause to a try statement."""
 
+    __slots__ = ("except_node",)
+
     def __init__(self, except_node: Node) -> None:
         self.except_node = except_node
 
@@ -1675,6 +2105,8 @@ class AddExcept:
 class RemoveExcept:
     """Remove an except clause from a try statement by matching exception type."""
 
+    __slots__ = ("except_node", "exception_type")
+
     def __init__(self, except_node: Node) -> None:
         self.except_node = except_node
         # Store the exception type for matching
@@ -1702,6 +2134,8 @@ class RemoveExcept:
 class AddFinally:
     """Add a finally block to a try statement."""
 
+    __slots__ = ("finally_node",)
+
     def __init__(self, finally_node: Node) -> None:
         self.finally_node = finally_node
 
@@ -1729,6 +2163,8 @@ class AddFinally:
 class RemoveFinally:
     """Remove a finally block from a try statement."""
 
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         logging.debug(". removing finally block")
         if not tree.finally_:
@@ -1744,6 +2180,8 @@ class RemoveFinally:
 class ChangeFinallyNode:
     """Change the content of a finally block."""
 
+    __slots__ = ("changes",)
+
     def __init__(self, changes: list[Action]) -> None:
         self.changes = changes
 
@@ -1760,6 +2198,8 @@ class ChangeFinallyNode:
 
 
 class ChangeString(ChangeEl):
+    __slots__ = ()
+
     def __repr__(self) -> str:
         return '<%s el="%s" context=%r>' % (
             self.__class__.__name__,
@@ -1768,16 +2208,15 @@ class ChangeString(ChangeEl):
         )
 
     def apply(self, tree: Node) -> list[Conflict]:
-        dmp = diff_match_patch()
-        patches = dmp.patch_fromText(self.changes)
-        patched, _ = dmp.patch_apply(patches, tree.value)
-        tree.value = patched
+        tree.value = apply_patches(self.changes, tree.value)
         return []
 
 
 class ChangeLambdaBody(ChangeEl):
     """Change the body of a lambda expression."""
 
+    __slots__ = ()
+
     def __init__(self, changes: list[Action]) -> None:
         super().__init__(None, changes)
 
@@ -1792,6 +2231,8 @@ class ChangeLambdaBody(ChangeEl):
 class ChangeComprehensionResult(ChangeEl):
     """Change the result expression of a comprehension."""
 
+    __slots__ = ()
+
     def __init__(self, changes: list[Action]) -> None:
         super().__init__(None, changes)
 
@@ -1806,6 +2247,8 @@ class ChangeComprehensionResult(ChangeEl):
 class ChangeComprehensionGenerator:
     """Change a generator (for clause) in a comprehension."""
 
+    __slots__ = ("index", "changes")
+
     def __init__(self, index: int, changes: list[Action]) -> None:
         self.index = index
         self.changes = changes
@@ -1824,6 +2267,8 @@ class ChangeComprehensionGenerator:
 
 
 class RemoveSepComment:
+    __slots__ = ()
+
     def apply(self, tree: Node) -> list[Conflict]:
         sep = tree.associated_sep
         if sep:
@@ -1835,6 +2280,8 @@ class RemoveSepComment:
 
 
 class AddSepComment(BaseEl):
+    __slots__ = ()
+
     @property
     def comments(self) -> list[Node]:
         return self.el.associated_sep.second_formatting
@@ -1851,6 +2298,8 @@ class AddSepComment(BaseEl):
 
 
 class ChangeSepComment(ChangeEl):
+    __slots__ = ()
+
     def __init__(self, changes: list[Action]) -> None:
         super().__init__(None, changes)
 
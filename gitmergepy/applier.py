@@ -1,29 +1,104 @@
 from __future__ import annotations
 
+import sys
 from typing import TYPE_CHECKING
 
 from redbaron import RedBaron, nodes
 from redbaron.base_nodes import Node, NodeList
-from redbaron.node_mixin import ValueIterableMixin
+from redbaron.node_mixin import CodeBlockMixin, ValueIterableMixin
 from redbaron.proxy_list import DictProxyList, ProxyList
 
+from .budget import charge
+from .conflicts import active_report, add_conflicts
+from .profiling import APPLY, active_profile
+
 if TYPE_CHECKING:
     from .actions import Action, Conflict
 
-PLACEHOLDER = RedBaron("# GITMERGEPY PLACEHOLDER")[0]
-
 
 def hide_if_empty(tree: NodeList | ValueIterableMixin) -> None:
     if all(el.hidden for el in tree):
         tree.hidden = True
 
 
+def compact_hidden(tree: ProxyList) -> int:
+    """Delete the hidden elements of tree and of its nested code blocks.
+
+    Removed elements are hidden rather than deleted because the contexts
+    of the changes still to apply can refer to them. Once a plan is fully
+    applied they are only slowing down the scans and the rendering. The
+    elements added by the plan lose their new flag, for the same reason.
+
+    Returns:
+        The number of deleted elements.
+    """
+    deleted = 0
+    for index in range(len(tree) - 1, -1, -1):
+        el = tree[index]
+        if el.hidden:
+            del tree[index]
+            deleted += 1
+            continue
+        if el.new:
+            el.new = False
+        if isinstance(el, CodeBlockMixin):
+            deleted += compact_hidden(el.value)
+    return deleted
+
+
+def plan_size(changes: list[Action]) -> tuple[int, int]:
+    """Return the number of actions of a plan, nested ones included,
+    and the memory they take in bytes.
+
+    The nodes referenced by the actions are not counted, they are
+    shared with the trees.
+    """
+    from . import actions
+    from .context import ContextEl
+
+    count = 0
+    size = 0
+    seen = set()
+    stack: list[object] = list(changes)
+    size += sys.getsizeof(changes)
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, (list, tuple)):
+            size += sys.getsizeof(value)
+            stack.extend(value)
+        elif type(value).__module__ == actions.__name__:
+            count += 1
+            size += sys.getsizeof(value)
+            for cls in type(value).__mro__:
+                for slot in cls.__dict__.get("__slots__", ()):
+                    if hasattr(value, slot):
+                        stack.append(getattr(value, slot))
+        elif isinstance(value, ContextEl):
+            size += sys.getsizeof(value)
+    return count, size
+
+
 def apply_changes(tree: Node, changes: list[Action], skip_checks: bool = False) -> list[Conflict]:
     from .actions import RemoveImports, Replace
 
     conflicts = []
+    profile = active_profile()
+    report = active_report()
     for change in changes:
-        conflicts += change.apply(tree)
+        charge("apply")
+        if profile is None:
+            change_conflicts = change.apply(tree)
+        else:
+            change_conflicts = profile.call(
+                APPLY, type(change).__name__, getattr(change, "el", None), change.apply, tree
+            )
+        if change_conflicts and report is not None and report.stop_at_first:
+            # Raises FirstConflict before the following changes are applied
+            add_conflicts(tree, change_conflicts)
+        conflicts += change_conflicts
 
     if len(changes) == 1 and isinstance(changes[0], (Replace, RemoveImports)):
         # we don't have the new tree here and tree is now a fragment
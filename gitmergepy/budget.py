@@ -0,0 +1,150 @@
+"""Cooperative limits on the work done by a merge."""
+
+from __future__ import annotations
+
+import gc
+import os
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+# Number of operations between two clock reads
+CLOCK_CHECK_INTERVAL = 64
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def memory_usage() -> int | None:
+    """Return the resident memory of the process in bytes.
+
+    Falls back to the peak resident memory where /proc is not available
+    and returns None when neither can be read.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class Budget:
+    """Wall time, operation count and memory limits for one merge.
+
+    The differ and the actions call charge() for their costly operations
+    (similarity computations, context probes, ...), which raises
+    BudgetExceeded once a limit is reached. Operations are counted even
+    without limits.
+
+    The memory limit applies to the resident memory of the whole process.
+    It is sampled with the clock and at the phase boundaries of the merge,
+    see checkpoint().
+    """
+
+    def __init__(
+        self,
+        max_seconds: float | None = None,
+        max_ops: int | None = None,
+        max_memory: int | None = None,
+    ) -> None:
+        self.max_seconds = max_seconds
+        self.max_ops = max_ops
+        self.max_memory = max_memory
+        self.ops: Counter[str] = Counter()
+        self.total_ops = 0
+        self.peak_memory = 0
+        self.started_at = time.monotonic()
+        self._next_clock_check = CLOCK_CHECK_INTERVAL
+
+    def __repr__(self) -> str:
+        return "<%s max_seconds=%r max_ops=%r ops=%d>" % (
+            self.__class__.__name__,
+            self.max_seconds,
+            self.max_ops,
+            self.total_ops,
+        )
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+
+    def charge(self, kind: str, count: int = 1) -> None:
+        self.ops[kind] += count
+        self.total_ops += count
+
+        if self.max_ops is not None and self.total_ops > self.max_ops:
+            raise BudgetExceeded("operation budget of %d exceeded" % self.max_ops)
+
+        if self.total_ops >= self._next_clock_check:
+            self._next_clock_check = self.total_ops + CLOCK_CHECK_INTERVAL
+            self.check_time()
+            if self.max_memory is not None:
+                self.check_memory(kind)
+
+    def check_time(self) -> None:
+        if self.max_seconds is not None and self.elapsed > self.max_seconds:
+            raise BudgetExceeded("time budget of %ss exceeded" % self.max_seconds)
+
+    def check_memory(self, phase: str) -> None:
+        usage = memory_usage()
+        if usage is None:
+            return
+        self.peak_memory = max(self.peak_memory, usage)
+        if self.max_memory is not None and usage > self.max_memory:
+            raise BudgetExceeded(
+                "memory budget of %dMB exceeded during %s" % (self.max_memory // 2**20, phase)
+            )
+
+    def checkpoint(self, phase: str) -> None:
+        """Check the limits at the end of a phase of the merge.
+
+        When over the memory limit, garbage is collected first so that the
+        trees released by the previous phase do not count.
+        """
+        self.check_time()
+        if self.max_memory is not None:
+            usage = memory_usage()
+            if usage is not None and usage > self.max_memory:
+                gc.collect()
+        self.check_memory(phase)
+
+
+_budget: Budget | None = None
+
+
+@contextmanager
+def enforce(budget: Budget) -> Iterator[Budget]:
+    """Charge all the operations done while active to budget."""
+    global _budget  # pylint: disable=global-statement
+    previous_budget = _budget
+    _budget = budget
+    budget.start()
+    try:
+        yield budget
+    finally:
+        _budget = previous_budget
+
+
+def charge(kind: str, count: int = 1) -> None:
+    """Charge operations to the active budget, if any."""
+    if _budget is not None:
+        _budget.charge(kind, count)
+
+
+def checkpoint(phase: str) -> None:
+    """Check the limits of the active budget, if any, after a phase."""
+    if _budget is not None:
+        _budget.checkpoint(phase)
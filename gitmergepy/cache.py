@@ -0,0 +1,293 @@
+"""On-disk caches shared by the merges of a machine."""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from hashlib import sha256
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .actions import Action
+
+CACHE_DIR_ENV = "GITMERGEPY_CACHE_DIR"
+# Least recently used entries are deleted above this size in bytes, per cache
+MAX_CACHE_SIZE = 256 * 2**20
+# Pickled plans larger than this, in bytes, are not cached
+MAX_PLAN_SIZE = 16 * 2**20
+
+
+def cache_dir() -> str:
+    """Return the directory of the caches, $GITMERGEPY_CACHE_DIR if set."""
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if directory:
+        return directory
+    base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_dir, "gitmergepy")
+
+
+def content_key(*texts: str) -> str:
+    """Hash of texts, of the gitmergepy version and of the Python version."""
+    from . import __version__
+
+    digest = sha256()
+    digest.update(("%s %d.%d" % (__version__, *sys.version_info[:2])).encode())
+    for text in texts:
+        data = text.encode()
+        digest.update(b"\0%d\0" % len(data))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _trusted(stat_result: os.stat_result) -> bool:
+    """Whether a cache file belongs to the user and only they can write it."""
+    if hasattr(os, "getuid") and stat_result.st_uid != os.getuid():
+        return False
+    return not stat_result.st_mode & 0o022
+
+
+class FileCache:
+    """Directory of cache entries, one file each, bounded in size.
+
+    Reading an entry bumps its modification time, and the least recently
+    used entries are deleted once the files take more than max_size bytes.
+    """
+
+    name = ""
+    suffix = ""
+
+    def __init__(self, directory: str | None = None, max_size: int = MAX_CACHE_SIZE) -> None:
+        self.directory = directory or os.path.join(cache_dir(), self.name)
+        self.max_size = max_size
+
+    def __repr__(self) -> str:
+        return "<%s %s max_size=%d>" % (self.__class__.__name__, self.directory, self.max_size)
+
+    def path(self, *texts: str) -> str:
+        return os.path.join(self.directory, content_key(*texts) + self.suffix)
+
+    def read(self, path: str) -> bytes | None:
+        try:
+            with open(path, "rb") as f:
+                if not _trusted(os.fstat(f.fileno())):
+                    logging.warning("ignoring cache entry %s writable by other users", path)
+                    return None
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return data
+
+    def write(self, path: str, data: bytes) -> bool:
+        if len(data) > self.max_size:
+            return False
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_filename, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_filename)
+            raise
+        self.prune()
+        return True
+
+    def drop(self, path: str, reason: object) -> None:
+        logging.warning("dropping unreadable cache entry %s: %s", path, reason)
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+    def entries(self) -> list[os.DirEntry[str]]:
+        """Return the files of the cache."""
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith(self.suffix)]
+        except FileNotFoundError:
+            return []
+
+    def info(self) -> dict[str, Any]:
+        sizes = []
+        for entry in self.entries():
+            with contextlib.suppress(FileNotFoundError):
+                sizes.append(entry.stat().st_size)
+        return {
+            "directory": self.directory,
+            "entries": len(sizes),
+            "size": sum(sizes),
+            "max_size": self.max_size,
+        }
+
+    def prune(self) -> int:
+        """Delete the least recently used entries above max_size.
+
+        Returns:
+            The number of deleted entries.
+        """
+        files = []
+        for entry in self.entries():
+            with contextlib.suppress(FileNotFoundError):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in files)
+        deleted = 0
+        for _, size, path in sorted(files):
+            if total_size <= self.max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+                deleted += 1
+            total_size -= size
+        return deleted
+
+    def clear(self) -> int:
+        """Delete all the entries.
+
+        Returns:
+            The number of deleted entries.
+        """
+        deleted = 0
+        for entry in self.entries():
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(entry.path)
+                deleted += 1
+        return deleted
+
+
+class PlanCache(FileCache):
+    """Merge plans by content of the base and other versions.
+
+    The plans computed by compute_diff_iterables() are pickled. Their
+    actions hold nodes linked to their parents, so a plan drags the base
+    and other trees along. A plan that can not be pickled, is larger than
+    max_plan_size or can not be read back is not cached.
+
+    Unpickling runs arbitrary code, the cache directory is trusted like
+    the rest of the home directory of the user. Entries owned by another
+    user or writable by others are ignored.
+    """
+
+    name = "plans"
+    suffix = ".pickle"
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        max_size: int = MAX_CACHE_SIZE,
+        max_plan_size: int = MAX_PLAN_SIZE,
+    ) -> None:
+        super().__init__(directory, max_size)
+        self.max_plan_size = max_plan_size
+
+    def get(self, base: str, other: str) -> list[Action] | None:
+        path = self.path(base, other)
+        data = self.read(path)
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except Exception as e:  # pylint: disable=broad-except
+            # Truncated file or classes changed without a version bump
+            self.drop(path, e)
+            return None
+
+    def put(self, base: str, other: str, changes: list[Action]) -> bool:
+        """Store the plan of base and other.
+
+        Returns:
+            Whether the plan was stored.
+        """
+        try:
+            data = pickle.dumps(changes, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError, TypeError, AttributeError) as e:
+            logging.info("plan not cached: %s", e)
+            return False
+        if len(data) > self.max_plan_size:
+            logging.info("plan not cached: %d bytes pickled", len(data))
+            return False
+        return self.write(self.path(base, other), data)
+
+
+class OutcomeCache(FileCache):
+    """Merge results by content of all the versions and merge options.
+
+    An outcome is the merged output, whether it is clean and the details
+    of its conflicts as given by ConflictReport.to_dict(), stored as json.
+    """
+
+    name = "outcomes"
+    suffix = ".json"
+
+    def get(self, key: tuple[str, ...]) -> dict[str, Any] | None:
+        path = self.path(*key)
+        data = self.read(path)
+        if data is None:
+            return None
+        try:
+            outcome = json.loads(data)
+            return {
+                "output": outcome["output"],
+                "clean": outcome["clean"],
+                "conflicts": outcome["conflicts"],
+            }
+        except (ValueError, KeyError, TypeError) as e:
+            self.drop(path, e)
+            return None
+
+    def put(
+        self, key: tuple[str, ...], output: str, clean: bool, conflicts: list[dict[str, Any]]
+    ) -> bool:
+        """Store the outcome of the merge identified by key.
+
+        Returns:
+            Whether the outcome was stored.
+        """
+        data = json.dumps({"output": output, "clean": clean, "conflicts": conflicts})
+        return self.write(self.path(*key), data.encode())
+
+
+_plan_cache: PlanCache | None = None
+
+
+@contextmanager
+def use_plan_cache(plan_cache: PlanCache | None) -> Iterator[PlanCache | None]:
+    """Look up and store the merge plans in plan_cache while active."""
+    global _plan_cache  # pylint: disable=global-statement
+    previous_plan_cache = _plan_cache
+    _plan_cache = plan_cache
+    try:
+        yield plan_cache
+    finally:
+        _plan_cache = previous_plan_cache
+
+
+def active_plan_cache() -> PlanCache | None:
+    return _plan_cache
+
+
+_outcome_cache: OutcomeCache | None = None
+
+
+@contextmanager
+def use_outcome_cache(outcome_cache: OutcomeCache | None) -> Iterator[OutcomeCache | None]:
+    """Look up and store the merge outcomes in outcome_cache while active."""
+    global _outcome_cache  # pylint: disable=global-statement
+    previous_outcome_cache = _outcome_cache
+    _outcome_cache = outcome_cache
+    try:
+        yield outcome_cache
+    finally:
+        _outcome_cache = previous_outcome_cache
+
+
+def active_outcome_cache() -> OutcomeCache | None:
+    return _outcome_cache
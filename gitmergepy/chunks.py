@@ -0,0 +1,153 @@
+"""Collapse the top-level definitions identical in all versions before parsing.
+
+Building the RedBaron trees is the slowest step of a merge and most of a
+large module is usually untouched by both sides. The top-level functions
+and classes whose source is byte-identical in base, current and other are
+replaced by a one line placeholder comment before parsing, and put back
+in the merged output.
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import re
+from collections import Counter
+
+PLACEHOLDER_PREFIX = "# gitmergepy chunk "
+
+COLLAPSIBLE_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+LINE_RE = re.compile(r"[^\n]*\n|[^\n]+$")
+
+
+class Chunk:
+    """Source of a top-level statement, up to the next statement."""
+
+    __slots__ = ("text", "collapsible")
+
+    def __init__(self, text: str, collapsible: bool) -> None:
+        self.text = text
+        self.collapsible = collapsible
+
+    def __repr__(self) -> str:
+        return "<%s %r>" % (self.__class__.__name__, self.text[:30])
+
+
+def _start_line(stmt: ast.stmt) -> int:
+    decorators = getattr(stmt, "decorator_list", None)
+    if decorators:
+        return min(decorator.lineno for decorator in decorators)
+    return stmt.lineno
+
+
+def split_chunks(source: str) -> list[Chunk] | None:
+    """Split source into top-level statements using the ast line numbers.
+
+    The comments and blank lines following a statement belong to its
+    chunk. Returns None if source can not be split.
+    """
+    if "\r" in source.replace("\r\n", ""):
+        # Lone carriage returns are line endings for the parser
+        return None
+    try:
+        module = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    lines = LINE_RE.findall(source)
+    starts = {1: False}
+    for stmt in module.body:
+        starts[_start_line(stmt)] = isinstance(stmt, COLLAPSIBLE_TYPES)
+    boundaries = sorted(starts)
+
+    chunks = []
+    for start, end in zip(boundaries, boundaries[1:] + [len(lines) + 1]):
+        text = "".join(lines[start - 1 : end - 1])
+        chunks.append(Chunk(text, collapsible=starts[start] and text.endswith("\n")))
+    return chunks
+
+
+def _placeholder(text: str) -> str:
+    return PLACEHOLDER_PREFIX + hashlib.sha1(text.encode()).hexdigest() + "\n"
+
+
+def collapse_unchanged(
+    base: str, current: str, *others: str
+) -> tuple[tuple[str, ...], dict[str, str]] | None:
+    """Replace the definitions found once and unchanged in all versions.
+
+    Returns:
+        The collapsed sources, in the order of the arguments, and the
+        placeholders mapped to their source, or None if nothing can be
+        collapsed.
+    """
+    sources = (base, current, *others)
+    if any(PLACEHOLDER_PREFIX in source for source in sources):
+        return None
+    versions = []
+    for source in sources:
+        chunks = split_chunks(source)
+        if chunks is None:
+            return None
+        versions.append(chunks)
+
+    counts = [Counter(chunk.text for chunk in chunks) for chunks in versions]
+    unchanged = {
+        chunk.text
+        for chunk in versions[0]
+        if chunk.collapsible and all(count[chunk.text] == 1 for count in counts)
+    }
+    if not unchanged:
+        return None
+
+    placeholders = {text: _placeholder(text) for text in unchanged}
+    collapsed = tuple(
+        "".join(placeholders.get(chunk.text, chunk.text) for chunk in chunks) for chunks in versions
+    )
+    expansions = {placeholder: text for text, placeholder in placeholders.items()}
+    return collapsed, expansions
+
+
+def edit_sizes(base: str, *versions: str) -> list[int] | None:
+    """Estimate how much each version changed base.
+
+    The estimate is the number of lines of the top-level statements found
+    in only one of base and the version, which is cheap to get and grows
+    with the size of the diff between them.
+
+    Returns:
+        The estimate of each version, or None if a source can not be split.
+    """
+    base_chunks = split_chunks(base)
+    if base_chunks is None:
+        return None
+    base_counts = Counter(chunk.text for chunk in base_chunks)
+    sizes = []
+    for version in versions:
+        chunks = split_chunks(version)
+        if chunks is None:
+            return None
+        counts = Counter(chunk.text for chunk in chunks)
+        changed = (base_counts - counts) + (counts - base_counts)
+        sizes.append(sum(text.count("\n") * count for text, count in changed.items()))
+    return sizes
+
+
+def expand(source: str, expansions: dict[str, str]) -> str | None:
+    """Put back the collapsed definitions in a merged source.
+
+    The placeholders are plain comments the merge can move, reindent or
+    drop. Returns None unless each of them is found exactly once as a
+    whole line, with no other line mentioning one.
+    """
+    lines = LINE_RE.findall(source)
+    found: Counter[str] = Counter()
+    for line in lines:
+        if line in expansions:
+            found[line] += 1
+        elif PLACEHOLDER_PREFIX in line:
+            return None
+    if len(found) != len(expansions) or any(count != 1 for count in found.values()):
+        return None
+    return "".join(expansions.get(line, line) for line in lines)
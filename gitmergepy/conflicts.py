@@ -1,24 +1,198 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
-
-from redbaron import nodes
-from redbaron.base_nodes import Node
-from redbaron.node_mixin import CodeBlockMixin
-from redbaron.proxy_list import ProxyList
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
 
+# The reports are used without any tree for the cached outcomes,
+# redbaron is only imported to locate and insert conflicts
 if TYPE_CHECKING:
+    from redbaron.base_nodes import Node
+
     from .actions import Conflict
 
 
+class FirstConflict(Exception):
+    """Raised to abort a merge as soon as a conflict is known."""
+
+
+START_MARKER = "# <<<<<<<<<<"
+END_MARKER = "# >>>>>>>>>>"
+
+
+class ConflictRecord:
+    """Description of a conflict, independent of the tree it was found in.
+
+    start and end are the 1-based lines of the conflict markers in the
+    merged output, None until the report is located against it.
+    """
+
+    __slots__ = ("reason", "change", "location", "lines", "start", "end")
+
+    def __init__(
+        self,
+        reason: str,
+        change: str,
+        location: str,
+        lines: tuple[str, ...] = (),
+        start: int | None = None,
+        end: int | None = None,
+    ) -> None:
+        self.reason = reason
+        self.change = change
+        self.location = location
+        # The marker block, markers included
+        self.lines = lines
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return "<%s location=%r reason=%r>" % (
+            self.__class__.__name__,
+            self.location,
+            self.reason,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "reason": self.reason,
+            "change": self.change,
+            "location": self.location,
+            "start": self.start,
+            "end": self.end,
+        }
+
+
+class ConflictReport:
+    """Collects the conflicts met while applying changes.
+
+    With insert_markers=False conflicts are only recorded and the tree is
+    left without conflict comments.
+    """
+
+    def __init__(self, insert_markers: bool = True, stop_at_first: bool = False) -> None:
+        self.insert_markers = insert_markers
+        self.stop_at_first = stop_at_first
+        self.conflicts: list[ConflictRecord] = []
+
+    def __len__(self) -> int:
+        return len(self.conflicts)
+
+    def __repr__(self) -> str:
+        return "<%s conflicts=%r>" % (self.__class__.__name__, self.conflicts)
+
+    def record(self, source_el: Node, conflict: Conflict, lines: tuple[str, ...] = ()) -> None:
+        self.conflicts.append(
+            ConflictRecord(
+                reason=conflict.reason,
+                change=repr(conflict.change) if conflict.change else "",
+                location=conflict_location(source_el),
+                lines=lines,
+            )
+        )
+        if self.stop_at_first:
+            raise FirstConflict()
+
+    def locate(self, output: str) -> None:
+        """Set the lines of the conflict blocks in the merged output.
+
+        The blocks are told apart by their content, blocks with the same
+        content are attributed in the order they were recorded.
+        """
+        by_lines: dict[tuple[str, ...], list[ConflictRecord]] = {}
+        for conflict in self.conflicts:
+            by_lines.setdefault(conflict.lines, []).append(conflict)
+
+        block: list[str] = []
+        start = 0
+        for number, line in enumerate(output.splitlines(), start=1):
+            line = line.strip()
+            if line == START_MARKER:
+                block = [line]
+                start = number
+            elif block:
+                block.append(line)
+                if line == END_MARKER:
+                    candidates = by_lines.get(tuple(block))
+                    if candidates:
+                        conflict = candidates.pop(0)
+                        conflict.start, conflict.end = start, number
+                    block = []
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "conflicts": len(self.conflicts),
+            "details": [conflict.to_dict() for conflict in self.conflicts],
+        }
+
+
+_report: ConflictReport | None = None
+
+
+@contextmanager
+def collect_conflicts(report: ConflictReport) -> Iterator[ConflictReport]:
+    """Send all conflicts added while active to report."""
+    global _report  # pylint: disable=global-statement
+    previous_report = _report
+    _report = report
+    try:
+        yield report
+    finally:
+        _report = previous_report
+
+
+def active_report() -> ConflictReport | None:
+    return _report
+
+
+def conflict_location(el: Node | None) -> str:
+    """Return the path of classes and functions enclosing el."""
+    from redbaron import nodes
+
+    from .tools import short_display_el
+
+    path = []
+    while el is not None:
+        if isinstance(el, (nodes.DefNode, nodes.ClassNode)):
+            path.append(short_display_el(el))
+        el = getattr(el, "parent", None)
+    return " > ".join(reversed(path)) or "<module>"
+
+
 def add_conflicts(source_el: Node, conflicts: list[Conflict]) -> None:
     """Add all conflicts as comments to the source element."""
     for conflict in conflicts:
         add_conflict(source_el, conflict)
 
 
+def conflict_lines(conflict: Conflict) -> tuple[str, ...]:
+    """Return the comment lines of the marker block of a conflict."""
+    texts = ["<<<<<<<<<<"]
+    if conflict.reason:
+        texts.append("Conflict: reason %s" % conflict.reason)
+    if conflict.change:
+        texts += repr(conflict.change).splitlines()
+    if conflict.els:
+        for el in conflict.els:
+            texts += [line.rstrip() for line in el.dumps().splitlines()[0:5]]
+    texts.append(">>>>>>>>>>")
+    return tuple(("# " + text).strip() for text in texts)
+
+
 def add_conflict(source_el: Node, conflict: Conflict) -> None:
     """Insert conflict markers as comments before or at the source element."""
+    from redbaron import RedBaron, nodes
+    from redbaron.node_mixin import CodeBlockMixin
+    from redbaron.proxy_list import ProxyList
+
+    if _report is not None and not _report.insert_markers:
+        # The marker lines are only needed to locate inserted markers
+        _report.record(source_el, conflict)
+        return
+    lines = conflict_lines(conflict)
+    if _report is not None:
+        _report.record(source_el, conflict, lines)
+
     if isinstance(source_el.parent, ProxyList) and isinstance(
         source_el.parent.parent, nodes.IfelseblockNode
     ):
@@ -39,22 +213,7 @@ def add_conflict(source_el: Node, conflict: Conflict) -> None:
     # We can only add code to add CodeProxyList
     assert isinstance(tree, CodeBlockMixin)
 
-    def _insert(text: str) -> None:
-        nonlocal index
-        txt = "# " + text
-        tree.insert(index, txt.strip() + "\n")
-        index += 1
-
-    before_text = "<<<<<<<<<<"
-    after_text = ">>>>>>>>>>"
-    _insert(before_text)
-    if conflict.reason:
-        _insert("Conflict: reason %s" % conflict.reason)
-    if conflict.change:
-        for line in repr(conflict.change).splitlines():
-            _insert(line)
-    if conflict.els:
-        for el in conflict.els:
-            for line in el.dumps().splitlines()[0:5]:
-                _insert(line.rstrip())
-    _insert(after_text)
+    # Parse the whole block at once, one comment node per line
+    comments = list(RedBaron("".join(line + "\n" for line in lines)))
+    for offset, comment in enumerate(comments):
+        tree.insert(index + offset, comment)
@@ -4,40 +4,237 @@ from typing import TYPE_CHECKING, Any
 
 from redbaron import nodes
 
-from .matcher import same_el, same_el_guess
-from .tools import WHITESPACE_NODES, empty_lines
+from .budget import charge
+from .matcher import guess_summary, same_el_guess_summary
+from .metrics import CONTEXT_PROBE, count
+from .tools import (
+    WHITESPACE_NODES,
+    id_from_arg,
+    is_tombstone,
+    short_display_el,
+    visible_els,
+)
 
 if TYPE_CHECKING:
     from redbaron.base_nodes import Node
     from redbaron.proxy_list import ProxyList
 
+# same_el_guess() can match these with different fingerprints
+FUZZY_TYPES = (
+    nodes.DefNode,
+    nodes.ClassNode,
+    nodes.AtomtrailersNode,
+    nodes.AssignmentNode,
+    nodes.TryNode,
+    nodes.WithNode,
+    nodes.WhileNode,
+    nodes.ElifNode,
+    nodes.ForNode,
+    nodes.MatchNode,
+    nodes.DictNode,
+    nodes.ListNode,
+    nodes.TupleNode,
+    nodes.AssertNode,
+)
+# Only the same node shares the fingerprint of these
+IDENTITY_TYPES = (nodes.TryNode, nodes.DictNode, nodes.ListNode, nodes.TupleNode)
+# same_el_guess() matches these with any element of the same text
+WHITESPACE_TYPES = (nodes.SpaceNode, nodes.EmptyLineNode)
+
+
+def fingerprint(el: Node | None) -> tuple[Any, ...]:
+    """Cheap key of an element for context matching.
+
+    Two elements with the same fingerprint are the same for
+    same_el_guess(). Elements with different fingerprints can still be
+    for the FUZZY_TYPES and the whitespace nodes.
+    """
+    match el:
+        case None:
+            return (None,)
+        case nodes.SpaceNode() | nodes.EmptyLineNode():
+            return (type(el), el.dumps())
+        case (
+            nodes.IfNode()
+            | nodes.ElseNode()
+            | nodes.EndlNode()
+            | nodes.ReturnNode()
+            | nodes.NumberNode()
+            | nodes.IfelseblockNode()
+        ):
+            return (type(el),)
+        case nodes.DefNode() | nodes.ClassNode():
+            return (type(el), el.name)
+        case nodes.FromImportNode():
+            return (type(el), frozenset(m.dumps() for m in el.value))
+        case nodes.AssignmentNode():
+            return (type(el), el.target.dumps())
+        case nodes.WithNode():
+            return (type(el), el.contexts.dumps())
+        case nodes.WhileNode() | nodes.ElifNode():
+            return (type(el), el.test.dumps())
+        case nodes.ForNode():
+            return (type(el), el.target.dumps(), el.iterator.dumps())
+        case nodes.MatchNode():
+            return (type(el), el.subject.dumps())
+        case nodes.CaseNode():
+            return (type(el), el.pattern.dumps())
+        case nodes.TryNode() | nodes.DictNode() | nodes.ListNode() | nodes.TupleNode():
+            # Potentially big, only the same node shares a fingerprint
+            return (type(el), id(el))
+        case _:
+            return (type(el), el.dumps().lstrip(" "))
+
+
+class FingerprintCache(dict):
+    """Fingerprints of the elements of a tree, valid while it is not modified."""
+
+    def of(self, el: Node) -> tuple[Any, ...]:
+        key = id(el)
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = result = fingerprint(el)
+            return result
+
+
+# Arguments moved by MoveArg, found again by id_from_arg()
+ARGUMENT_TYPES = (
+    nodes.CallArgumentNode,
+    nodes.DefArgumentNode,
+    nodes.ListArgumentNode,
+    nodes.DictArgumentNode,
+)
+
+
+class ContextEl:
+    """What matching a context needs of one of its elements.
+
+    The actions keep their contexts, in plans cached or waiting to be
+    applied, long after the diff. Holding the elements would keep their
+    trees alive along with them, only their type, fingerprint, the data
+    the fuzzy fallback compares and a text to display are kept.
+    """
+
+    __slots__ = ("type", "fingerprint", "guess", "arg_id", "display")
+
+    def __init__(self, el: Node) -> None:
+        self.type = type(el)
+        # An identity can not be compared once the node is gone
+        self.fingerprint = None if isinstance(el, IDENTITY_TYPES) else fingerprint(el)
+        self.guess = guess_summary(el) if isinstance(el, FUZZY_TYPES + WHITESPACE_TYPES) else None
+        self.arg_id = id_from_arg(el) if isinstance(el, ARGUMENT_TYPES) else None
+        self.display = short_display_el(el)
+
+    def __repr__(self) -> str:
+        return "<%s %s>" % (self.__class__.__name__, self.display)
+
+    def __str__(self) -> str:
+        return self.display
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ContextEl):
+            return NotImplemented
+        return (self.type, self.fingerprint, self.guess, self.arg_id) == (
+            other.type,
+            other.fingerprint,
+            other.guess,
+            other.arg_id,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.type, self.fingerprint))
+
+    def is_a(self, types: type | tuple[type, ...]) -> bool:
+        return issubclass(self.type, types)
+
+
+def context_el(el: Node | ContextEl | None) -> ContextEl | None:
+    if el is None or isinstance(el, ContextEl):
+        return el
+    return ContextEl(el)
+
+
+def same_context_el(context_el: ContextEl, el: Node, fingerprints: FingerprintCache) -> bool:
+    """same_el_guess() that only runs when the fingerprints can not tell."""
+    if context_el.type is not type(el):
+        if context_el.is_a(WHITESPACE_TYPES):
+            return same_el_guess_summary(context_el.type, context_el.guess, el)
+        return False
+    if context_el.fingerprint == fingerprints.of(el):
+        return True
+    if not context_el.is_a(FUZZY_TYPES):
+        return False
+    return same_el_guess_summary(context_el.type, context_el.guess, el)
 
-class BeforeContext(list):
-    def __eq__(self, other: Any) -> bool:
-        if len(other) != len(self):
-            return False
-        return all(same_el(el, el_other) for el, el_other in zip(self, other))
+
+def only_empty_lines(context: list[ContextEl | None]) -> bool:
+    """empty_lines() for the elements of a context."""
+    return all(el is not None and el.is_a((nodes.EmptyLineNode, nodes.EndlNode)) for el in context)
+
+
+class Context(list):
+    """List of ContextEl around a change, the nodes added are converted.
+
+    None stands for the start or the end of the tree.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, els: Any = ()) -> None:
+        super().__init__(context_el(el) for el in els)
+
+    @property
+    def fingerprints(self) -> tuple[tuple[Any, ...] | None, ...]:
+        return tuple(fingerprint(None) if el is None else el.fingerprint for el in self)
+
+    def append(self, el: Any) -> None:
+        super().append(context_el(el))
+
+    def insert(self, index: Any, el: Any) -> None:
+        super().insert(index, context_el(el))
+
+    def extend(self, els: Any) -> None:
+        super().extend(context_el(el) for el in els)
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        if isinstance(index, slice):
+            super().__setitem__(index, [context_el(el) for el in value])
+        else:
+            super().__setitem__(index, context_el(value))
+
+    def __iadd__(self, els: Any) -> Any:
+        return super().__iadd__([context_el(el) for el in els])
+
+
+class BeforeContext(Context):
+    __slots__ = ()
 
     def match_el(self, tree: ProxyList, el: Node) -> bool:
         index = tree.index(el)
         return self.match(tree, index)
 
-    def _skip_els(self, els: list[Node], prev_elements: list[Node], old_tree: bool) -> None:
-        def _filter(el: Node) -> bool:
-            return (old_tree and el.new) or (not old_tree and el.hidden)
-
-        not_hidden_prev_elements = [el for el in prev_elements if not _filter(el)]
+    def _skip_els(self, els: list[Node], tree: ProxyList, start_index: int, old_tree: bool) -> None:
+        # Only walk back as far as the number of skipped elements
+        prev_elements = visible_els(tree, stop=start_index, reverse=True, old_tree=old_tree)
         for el in els:
-            if _filter(el):
+            if is_tombstone(el, old_tree):
                 els.remove(el)
-                if not_hidden_prev_elements:
-                    els.insert(0, not_hidden_prev_elements.pop())
-
-    def match(self, tree: ProxyList, index: int, old_tree: bool = False) -> bool:
+                prev_el = next(prev_elements, None)
+                if prev_el is not None:
+                    els.insert(0, prev_el)
+
+    def match(
+        self,
+        tree: ProxyList,
+        index: int,
+        old_tree: bool = False,
+        fingerprints: FingerprintCache | None = None,
+    ) -> bool:
         if not self:
             return True
 
-        context = self
+        context: list[ContextEl | None] = self
         start_index = index - len(context)
         if context[-1] is None:
             start_index += 1
@@ -48,13 +245,15 @@ class BeforeContext(list):
             return False
 
         els = tree[start_index:index]
-        self._skip_els(els, prev_elements=tree[:start_index], old_tree=old_tree)
+        self._skip_els(els, tree, start_index, old_tree=old_tree)
 
         if len(els) != len(context):
             return False
 
+        if fingerprints is None:
+            fingerprints = FingerprintCache()
         for context_el, el in zip(reversed(context), els):
-            if not same_el_guess(context_el, el):
+            if context_el is None or not same_context_el(context_el, el, fingerprints):
                 return False
 
         return True
@@ -63,24 +262,31 @@ class BeforeContext(list):
         return BeforeContext(self)
 
 
-class AfterContext(list):
+class AfterContext(Context):
+    __slots__ = ()
+
     def match_el(self, tree: ProxyList, el: Node) -> bool:
         index = tree.index(el) + 1
         return self.match(tree, index)
 
-    def _skip_els(self, els: list[Node], next_elements: list[Node], old_tree: bool) -> None:
-        def _filter(el: Node) -> bool:
-            return (old_tree and el.new) or (not old_tree and el.hidden)
-
-        not_hidden_next_elements = [el for el in next_elements if not _filter(el)]
+    def _skip_els(self, els: list[Node], tree: ProxyList, end_index: int, old_tree: bool) -> None:
+        # Only walk forward as far as the number of skipped elements
+        next_elements = visible_els(tree, start=end_index, old_tree=old_tree)
         for el in els:
-            if _filter(el):
+            if is_tombstone(el, old_tree):
                 els.remove(el)
-                if not_hidden_next_elements:
-                    els.append(not_hidden_next_elements.pop(0))
-
-    def match(self, tree: ProxyList, index: int, old_tree: bool = False) -> bool:
-        context = self
+                next_el = next(next_elements, None)
+                if next_el is not None:
+                    els.append(next_el)
+
+    def match(
+        self,
+        tree: ProxyList,
+        index: int,
+        old_tree: bool = False,
+        fingerprints: FingerprintCache | None = None,
+    ) -> bool:
+        context: list[ContextEl | None] = self
 
         if context[-1] is None:
             context = context[:-1]
@@ -90,13 +296,15 @@ class AfterContext(list):
         end_index = index + len(context)
 
         els = tree[index:end_index]
-        self._skip_els(els, next_elements=tree[end_index:], old_tree=old_tree)
+        self._skip_els(els, tree, end_index, old_tree=old_tree)
 
         if len(els) != len(context):
             return False
 
+        if fingerprints is None:
+            fingerprints = FingerprintCache()
         for context_el, el in zip(context, els):
-            if not same_el_guess(context_el, el):
+            if context_el is None or not same_context_el(context_el, el, fingerprints):
                 return False
 
         return True
@@ -109,20 +317,33 @@ def find_context_with_reduction(
     tree: ProxyList, context: BeforeContext | AfterContext, look_in_old_tree_first: bool = False
 ) -> list[int]:
     trimmed_context = context.copy()
+    fingerprints = FingerprintCache()
 
-    while trimmed_context and not empty_lines(trimmed_context):
+    while trimmed_context and not only_empty_lines(trimmed_context):
         # Simple case: exact context found
-        matches = find_context(tree, trimmed_context, look_in_old_tree_first=look_in_old_tree_first)
+        matches = find_context(
+            tree,
+            trimmed_context,
+            look_in_old_tree_first=look_in_old_tree_first,
+            fingerprints=fingerprints,
+        )
         if matches:
             return matches
 
         # Empty lines mismatch
-        if isinstance(trimmed_context[0], nodes.EmptyLineNode):
+        if trimmed_context[0] is not None and trimmed_context[0].is_a(nodes.EmptyLineNode):
             context_no_endl = trimmed_context.copy()
-            while context_no_endl and isinstance(context_no_endl[0], nodes.EmptyLineNode):
+            while (
+                context_no_endl
+                and context_no_endl[0] is not None
+                and context_no_endl[0].is_a(nodes.EmptyLineNode)
+            ):
                 del context_no_endl[0]
             matches = find_context(
-                tree, context_no_endl, look_in_old_tree_first=look_in_old_tree_first
+                tree,
+                context_no_endl,
+                look_in_old_tree_first=look_in_old_tree_first,
+                fingerprints=fingerprints,
             )
             if matches:
                 return matches
@@ -134,23 +355,42 @@ def find_context_with_reduction(
 
 
 def _find_context(
-    tree: ProxyList, context: BeforeContext | AfterContext, old_tree: bool
+    tree: ProxyList,
+    context: BeforeContext | AfterContext,
+    old_tree: bool,
+    fingerprints: FingerprintCache,
 ) -> list[int]:
     matches = []
+    charge("context_probe", len(tree) + 1)
+    count(CONTEXT_PROBE, len(tree) + 1)
 
     for index in range(len(tree) + 1):
-        if context.match(tree, index, old_tree=old_tree):
+        if context.match(tree, index, old_tree=old_tree, fingerprints=fingerprints):
             matches.append(index)
 
     return matches
 
 
 def find_context(
-    tree: ProxyList, context: BeforeContext | AfterContext, look_in_old_tree_first: bool = False
+    tree: ProxyList,
+    context: BeforeContext | AfterContext,
+    look_in_old_tree_first: bool = False,
+    fingerprints: FingerprintCache | None = None,
 ) -> list[int]:
-    indexes = _find_context(tree, context, old_tree=look_in_old_tree_first)
+    """Return the indexes in tree where context matches.
+
+    fingerprints can be shared between calls as long as tree is not
+    modified in between.
+    """
+    if fingerprints is None:
+        fingerprints = FingerprintCache()
+    indexes = _find_context(
+        tree, context, old_tree=look_in_old_tree_first, fingerprints=fingerprints
+    )
     if not indexes:
-        indexes = _find_context(tree, context, old_tree=not look_in_old_tree_first)
+        indexes = _find_context(
+            tree, context, old_tree=not look_in_old_tree_first, fingerprints=fingerprints
+        )
     return indexes
 
 
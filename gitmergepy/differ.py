@@ -4,7 +4,7 @@ import logging
 from itertools import islice
 from typing import TYPE_CHECKING, Any, Callable
 
-from redbaron import nodes
+from redbaron import RedBaron, nodes
 from redbaron.utils import indent_str
 
 from .actions import (
@@ -19,8 +19,10 @@ from .actions import (
     ReplaceEls,
     SameEl,
 )
+from .budget import charge
 from .context import gather_after_context, gather_context
 from .matcher import code_block_similarity, find_el_strong, same_el_guess
+from .profiling import DIFF, active_profile
 from .tools import INDENT, empty_lines, same_el, short_context, short_display_el
 from .tools_actions import remove_with
 
@@ -46,6 +48,7 @@ def compare_formatting(left: Node, right: Node) -> list[Action]:
 def compute_diff(left: Node, right: Node, indent: str = "") -> list[Action]:
     from .differ_one import COMPUTE_DIFF_ONE_CALLS
 
+    charge("diff")
     if left.dumps() == right.dumps():
         logging.debug(
             "%s compute_diff %s = %s", indent, short_display_el(left), short_display_el(right)
@@ -62,7 +65,14 @@ def compute_diff(left: Node, right: Node, indent: str = "") -> list[Action]:
         diff = [Replace(new_value=right, old_value=left)]
     else:
         logging.debug("%s diff_one %s", indent + INDENT, type(left).__name__)
-        diff += COMPUTE_DIFF_ONE_CALLS[type(left)](left, right, indent + INDENT)
+        handler = COMPUTE_DIFF_ONE_CALLS[type(left)]
+        profile = active_profile()
+        if profile is None:
+            diff += handler(left, right, indent + INDENT)
+        else:
+            diff += profile.call(
+                DIFF, handler.__name__, right, handler, left, right, indent + INDENT
+            )
 
         # Compare formatting
         diff += compare_formatting(left, right)
@@ -333,7 +343,13 @@ def call_diff_iterable(
 ) -> list[Action]:
     from .differ_iterable import COMPUTE_DIFF_ITERABLE_CALLS
 
-    return COMPUTE_DIFF_ITERABLE_CALLS[type(el)](stack_left, el, indent, global_diff=diff)
+    handler = COMPUTE_DIFF_ITERABLE_CALLS[type(el)]
+    profile = active_profile()
+    if profile is None:
+        return handler(stack_left, el, indent, global_diff=diff)
+    return profile.call(
+        DIFF, handler.__name__, el, handler, stack_left, el, indent, global_diff=diff
+    )
 
 
 def compare_with_code(with_node: nodes.WithNode, start_el: Node) -> float:
@@ -434,12 +450,18 @@ def compute_diff_iterables(
     logging.debug(
         "%s compute_diff_iterables %r <=> %r", indent, type(left).__name__, type(right).__name__
     )
+    from .differ_iterable import diff_import_block
+
     stack_left = list(left)
 
+    # Only modules have a leading import block worth merging as a whole
     diff = []
+    if isinstance(right, RedBaron):
+        diff = diff_import_block(stack_left, right, indent=indent + INDENT)
     last_added = False
 
     for el_right in right:
+        charge("diff")
         if el_right.already_processed:
             logging.debug("%s already processed %r", indent + INDENT, short_display_el(el_right))
             last_added = False
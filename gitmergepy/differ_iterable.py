@@ -13,6 +13,7 @@ from .actions import (
     ChangeFun,
     ChangeImport,
     EnsureEmptyLines,
+    MergeImportBlock,
     MoveClass,
     MoveFun,
     MoveImport,
@@ -27,14 +28,20 @@ from .differ import (
     simplify_white_lines,
 )
 from .matcher import find_class, find_func, find_import
-from .tools import INDENT, id_from_el, short_display_el
+from .tools import INDENT, id_from_el, import_key, short_display_el, short_display_list
 
 if TYPE_CHECKING:
     from redbaron.base_nodes import Node
+    from redbaron.proxy_list import ProxyList
 
 # Type alias for action classes (no common base class)
 Action = Any
 
+# Import blocks with at least this number of statements on both sides
+# are merged as a whole by diff_import_block()
+IMPORT_BLOCK_MIN_IMPORTS = 50
+IMPORT_TYPES = (nodes.FromImportNode, nodes.ImportNode)
+
 
 def _process_empty_lines(el: Node) -> list[nodes.EmptyLineNode]:
     empty_lines = []
@@ -172,6 +179,85 @@ def diff_atom_trailer_node(
     return diff
 
 
+def leading_import_block(els: list[Node] | ProxyList) -> list[Node]:
+    """Return the first run of import statements and empty lines of els."""
+    start = next((index for index, el in enumerate(els) if isinstance(el, IMPORT_TYPES)), None)
+    if start is None:
+        return []
+    end = start
+    for index in range(start, len(els)):
+        if isinstance(els[index], IMPORT_TYPES):
+            end = index + 1
+        elif not isinstance(els[index], nodes.EmptyLineNode):
+            break
+    return els[start:end]
+
+
+def diff_import_block(stack_left: list[Node], right: ProxyList, indent: str) -> list[Action]:
+    """Diff the leading import blocks as sets of imported names.
+
+    Diffing the imports one by one looks each of them up in both blocks,
+    which is quadratic in the size of the blocks. Only blocks with at least
+    IMPORT_BLOCK_MIN_IMPORTS statements on both sides are handled here.
+    The elements of the blocks are marked as processed.
+    """
+    left_block = leading_import_block(stack_left)
+    right_block = leading_import_block(right)
+    for block in (left_block, right_block):
+        if sum(1 for el in block if isinstance(el, IMPORT_TYPES)) < IMPORT_BLOCK_MIN_IMPORTS:
+            return []
+
+    logging.debug("%s import block", indent)
+    # The targets are compared by name and alias
+    left_names: dict[str, set[tuple[str, str]]] = {}
+    left_targets: dict[str, list[Node]] = {}
+    left_plain: list[str] = []
+    for el in left_block:
+        el.already_processed = True
+        if isinstance(el, nodes.FromImportNode):
+            module = id_from_el(el)
+            left_names.setdefault(module, set()).update(import_key(target) for target in el.targets)
+            left_targets.setdefault(module, []).extend(el.targets)
+        elif isinstance(el, nodes.ImportNode):
+            left_plain.append(id_from_el(el))
+
+    left_plain_keys = set(left_plain)
+    right_names: dict[str, set[tuple[str, str]]] = {}
+    right_plain: set[str] = set()
+    added = []
+    added_plain = []
+    for el in right_block:
+        el.already_processed = True
+        if isinstance(el, nodes.FromImportNode):
+            module = id_from_el(el)
+            right_names.setdefault(module, set()).update(
+                import_key(target) for target in el.targets
+            )
+            names = left_names.get(module, set())
+            targets = [target for target in el.targets if import_key(target) not in names]
+            if targets:
+                logging.debug("%s new imports %s", indent + INDENT, short_display_list(targets))
+                added.append((el, targets))
+        elif isinstance(el, nodes.ImportNode):
+            right_plain.add(id_from_el(el))
+            if id_from_el(el) not in left_plain_keys:
+                logging.debug("%s new import %r", indent + INDENT, short_display_el(el))
+                added_plain.append(el)
+
+    removed = []
+    for module, targets in left_targets.items():
+        names = right_names.get(module, set())
+        targets = [target for target in targets if import_key(target) not in names]
+        if targets:
+            logging.debug("%s removed imports %s", indent + INDENT, short_display_list(targets))
+            removed.append((module, targets))
+    removed_plain = [key for key in left_plain if key not in right_plain]
+
+    if not (added or removed or added_plain or removed_plain):
+        return []
+    return [MergeImportBlock(added, removed, added_plain, removed_plain)]
+
+
 def diff_from_import_node(
     stack_left: list[Node], el_right: Node, indent: str, global_diff: list[Action]
 ) -> list[Action]:
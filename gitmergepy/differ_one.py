@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import logging
+from difflib import SequenceMatcher
 from typing import TYPE_CHECKING, Any
 
-from diff_match_patch import diff_match_patch
 from redbaron import RedBaron, nodes
 
 from .actions import (
@@ -43,6 +43,7 @@ from .actions import (
     ChangeNumberValue,
     ChangeReturn,
     ChangeSepComment,
+    ChangeSequence,
     ChangeString,
     ChangeValue,
     MakeInline,
@@ -67,8 +68,10 @@ from .actions import (
     ReplaceAttr,
     ReplaceTarget,
 )
+from .budget import charge
 from .context import gather_context
 from .differ import compute_diff, compute_diff_iterables
+from .stringdiff import make_patches
 from .tools import (
     INDENT,
     changed_in_list,
@@ -83,9 +86,15 @@ if TYPE_CHECKING:
     from redbaron.base_nodes import Node
     from redbaron.proxy_list import ProxyList
 
+    from .actions import SequenceEdit
+
 # Type alias for action classes (no common base class)
 Action = Any
 
+# Lists and tuples with at least this number of items on both sides are
+# diffed by aligning their items, see align_sequence()
+SEQUENCE_ALIGNMENT_MIN_ITEMS = 32
+
 
 def get_previous_arg(arg: Node, deleted: list[Node]) -> Node | None:
     previous = arg.previous
@@ -465,15 +474,55 @@ def diff_return_node(left: nodes.ReturnNode, right: nodes.ReturnNode, indent: st
     return []
 
 
+def align_sequence(left: ProxyList, right: ProxyList) -> list[SequenceEdit]:
+    """Align the items of two sequences by their text and return the edits
+    turning left into right."""
+    left_keys = [el.dumps() for el in left]
+    right_keys = [el.dumps() for el in right]
+    counts: dict[str, int] = {}
+    left_anchors = []
+    for key in left_keys:
+        left_anchors.append((key, counts.get(key, 0)))
+        counts[key] = counts.get(key, 0) + 1
+
+    edits = []
+    # autojunk would leave the items repeated in more than 1% of a literal
+    # of 200 items or more out of the alignment, to be removed and added
+    # again. Without it the alignment is quadratic for literals made of a
+    # few distinct items, it stays close to linear when most are distinct.
+    matcher = SequenceMatcher(None, left_keys, right_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        charge("diff")
+        edits.append(
+            (
+                left_anchors[i1 - 1] if i1 > 0 else None,
+                left_anchors[i2] if i2 < len(left_anchors) else None,
+                left_anchors[i1:i2],
+                [right[j] for j in range(j1, j2)],
+            )
+        )
+    return edits
+
+
+def diff_sequence_items(left: ProxyList, right: ProxyList, indent: str) -> list[Action]:
+    if min(len(left), len(right)) >= SEQUENCE_ALIGNMENT_MIN_ITEMS:
+        logging.debug("%s aligning %d items", indent, len(right))
+        edits = align_sequence(left, right)
+        return [ChangeSequence(edits)] if edits else []
+    return compute_diff_iterables(left, right, indent)
+
+
 def diff_list_node(left: nodes.ListNode, right: nodes.ListNode, indent: str) -> list[Action]:
-    diff = compute_diff_iterables(left.value, right.value, indent + INDENT)
+    diff = diff_sequence_items(left.value, right.value, indent + INDENT)
     if diff:
         return [ChangeValue(right, changes=diff)]
     return []
 
 
 def diff_tuple_node(left: nodes.TupleNode, right: nodes.TupleNode, indent: str) -> list[Action]:
-    diff = compute_diff_iterables(left.value, right.value, indent + INDENT)
+    diff = diff_sequence_items(left.value, right.value, indent + INDENT)
     if diff:
         return [ChangeValue(right, changes=diff)]
     return []
@@ -646,10 +695,7 @@ def diff_excepts_node(left: nodes.TryNode, right: nodes.TryNode, indent: str) ->
 
 
 def diff_string_node(left: nodes.StringNode, right: nodes.StringNode, indent: str) -> list[Action]:
-    dmp = diff_match_patch()
-    patches = dmp.patch_make(left.value, right.value)
-    diff = dmp.patch_toText(patches)
-    return [ChangeString(left, changes=diff)]
+    return [ChangeString(left, changes=make_patches(left.value, right.value))]
 
 
 def diff_name_node(left: nodes.NameNode, right: nodes.NameNode, indent: str) -> list[Action]:
@@ -12,6 +12,16 @@ from redbaron.base_nodes import Node
 from redbaron.node_mixin import CodeBlockMixin
 from redbaron.proxy_list import ProxyList
 
+from .budget import charge
+from .metrics import (
+    CODE_BLOCK_SIMILARITY,
+    FIND_EL_CONTEXT,
+    FIND_EL_EXACT,
+    FIND_EL_GUESS,
+    FIND_EL_STRONG,
+    SAME_EL_GUESS,
+    count,
+)
 from .tools import (
     get_call_els,
     get_name_els_from_call,
@@ -19,6 +29,7 @@ from .tools import (
     id_from_el,
     name_els_to_string,
     same_el,
+    visible_els,
 )
 
 MAX_LEVENSHTEIN_DISTANCE = 2
@@ -78,12 +89,11 @@ def find_imports(tree: ProxyList, import_node: Node) -> list[Node]:
     import_types = (nodes.FromImportNode, nodes.ImportNode)
     assert isinstance(import_node, import_types)
 
+    import_id = id_from_el(import_node)
     return [
         el
         for el in tree
-        if isinstance(el, import_types)
-        and id_from_el(el) == id_from_el(import_node)
-        and not el.hidden
+        if isinstance(el, import_types) and not el.hidden and id_from_el(el) == import_id
     ]
 
 
@@ -130,62 +140,141 @@ def find_single(tree: ProxyList, types: type | tuple[type, ...]) -> Node | None:
     return None
 
 
-def same_call_guess(left: nodes.AtomtrailersNode, right: nodes.AtomtrailersNode) -> bool:
-    """Guess if two call expressions represent the same call."""
-    name_els_left = get_name_els_from_call(left)
-    name_els_right = get_name_els_from_call(right)
-    left_call_string = name_els_to_string(name_els_left)
-    right_call_string = name_els_to_string(name_els_right)
-
-    # Same function
-    if left_call_string.lower() != right_call_string.lower():
-        return False
-    # Same number of calls
-    if len(get_call_els(left)) != len(get_call_els(right)):
+def call_key(el: nodes.AtomtrailersNode) -> tuple[str, int]:
+    """Dotted name, lowercased, and number of calls of a call expression."""
+    return name_els_to_string(get_name_els_from_call(el)).lower(), len(get_call_els(el))
+
+
+class CallIndex:
+    """Call expressions of a tree by call_key().
+
+    Built on first use and kept on the tree. It is rebuilt if the number
+    of elements of the tree changed or if one of the calls looked up no
+    longer has the key it was indexed under.
+    """
+
+    def __init__(self, tree: ProxyList | CodeBlockMixin) -> None:
+        self.tree = tree
+        self.calls: dict[tuple[str, int], list[Node]] = {}
+        self.count = 0
+        self.size = 0
+        self.rebuild()
+
+    def __repr__(self) -> str:
+        return "<%s calls=%d>" % (self.__class__.__name__, self.count)
+
+    def rebuild(self) -> None:
+        self.calls = {}
+        self.count = 0
+        for el in self.tree:
+            if isinstance(el, nodes.AtomtrailersNode):
+                self.calls.setdefault(call_key(el), []).append(el)
+                self.count += 1
+        self.size = len(self.tree)
+
+    def calls_count(self) -> int:
+        if len(self.tree) != self.size:
+            self.rebuild()
+        return self.count
+
+    def find_all(self, key: tuple[str, int]) -> list[Node]:
+        if len(self.tree) != self.size:
+            self.rebuild()
+        els = self.calls.get(key, [])
+        if any(call_key(el) != key for el in els):
+            self.rebuild()
+            els = self.calls.get(key, [])
+        return els
+
+
+def call_index(tree: ProxyList | CodeBlockMixin) -> CallIndex:
+    """Return the call index of tree, building it if needed."""
+    index = tree.__dict__.get("call_index")
+    # Copies of the tree may carry the index of the original
+    if index is None or index.tree is not tree:
+        index = tree.call_index = CallIndex(tree)
+    return index
+
+
+def forget_call_index(tree: ProxyList | Node | None) -> None:
+    """Drop the call index of tree after one of its elements was replaced."""
+    if tree is not None:
+        tree.__dict__.pop("call_index", None)
+
+
+def calls_in_parent(el: nodes.AtomtrailersNode) -> int:
+    """Number of call expressions next to el, el included."""
+    if isinstance(el.parent, (ProxyList, CodeBlockMixin)):
+        return call_index(el.parent).calls_count()
+    return len(el.parent.find_all(el.baron_type, recursive=False))
+
+
+def call_summary(el: nodes.AtomtrailersNode) -> tuple[Any, ...]:
+    """What same_call_guess() compares of its left call.
+
+    The key of the call, the number of calls next to it, the first two
+    arguments of its first call as (is a string, text) and the arguments
+    as compared by args_similarity().
+    """
+    calls = get_call_els(el)
+    args = calls[0] if calls else []
+    return (
+        call_key(el),
+        calls_in_parent(el) if el.parent else None,
+        tuple(
+            (isinstance(args[index], nodes.StringNode), args[index].dumps())
+            for index in range(min(len(args), 2))
+        ),
+        frozenset(simplify_arg(arg) for arg in args),
+    )
+
+
+def same_call_summary(left: tuple[Any, ...], right: nodes.AtomtrailersNode) -> bool:
+    """same_call_guess() with the left call reduced to call_summary()."""
+    key, left_calls_in_parent, first_args, args = left
+    right_calls = get_call_els(right)
+
+    # Same function and same number of calls
+    if call_key(right) != key:
         return False
     # No calls
-    if len(get_call_els(left)) == len(get_call_els(right)) == 0:
+    if not right_calls:
         return True
 
     # Only one call in parent, we assume it's the same one
-    if (
-        left.parent
-        and right.parent
-        and len(left.parent.find_all(left.baron_type, recursive=False)) == 1
-        and len(right.parent.find_all(right.baron_type, recursive=False)) == 1
-    ):
+    if left_calls_in_parent == 1 and right.parent and calls_in_parent(right) == 1:
         return True
 
-    left_args = get_call_els(left)[0]
-    right_args = get_call_els(right)[0]
+    right_args = right_calls[0]
     # If first arg is a string and it's different, probably not the same call
-    if (
-        len(left_args) > 0
-        and len(right_args) > 0
-        and isinstance(left_args[0], nodes.StringNode)
-        and left_args[0].dumps() != right_args[0].dumps()
-    ):
-        return False
+    if len(first_args) > 0 and len(right_args) > 0:
+        is_string, text = first_args[0]
+        if is_string and text != right_args[0].dumps():
+            return False
 
     # If second arg is a string and it's different, probably not the same call
-    if (
-        len(left_args) > 1
-        and len(right_args) > 1
-        and isinstance(left_args[1], nodes.StringNode)
-        and left_args[0].dumps() == right_args[0].dumps()
-        and left_args[1].dumps() != right_args[1].dumps()
-    ):
-        return False
+    if len(first_args) > 1 and len(right_args) > 1:
+        is_string, text = first_args[1]
+        if (
+            is_string
+            and first_args[0][1] == right_args[0].dumps()
+            and text != right_args[1].dumps()
+        ):
+            return False
 
     # Check arguments similarity
-    if args_similarity(get_call_els(left)[0], get_call_els(right)[0]) > ARGS_SIMILARITY_THRESHOLD:
-        return True
+    right_set = frozenset(simplify_arg(arg) for arg in right_args)
+    return args_set_similarity(args, right_set) > ARGS_SIMILARITY_THRESHOLD
 
-    return False
+
+def same_call_guess(left: nodes.AtomtrailersNode, right: nodes.AtomtrailersNode) -> bool:
+    """Guess if two call expressions represent the same call."""
+    return same_call_summary(call_summary(left), right)
 
 
 def same_el_guess(left: Node, right: Node, context: Any = None) -> bool:
     """Guess if two elements represent the same logical element."""
+    count(SAME_EL_GUESS)
     if isinstance(left, (nodes.SpaceNode, nodes.EmptyLineNode)):
         return left.dumps() == right.dumps()
 
@@ -267,6 +356,122 @@ def same_el_guess(left: Node, right: Node, context: Any = None) -> bool:
             return same_el(left, right)
 
 
+def guess_summary(el: Node) -> Any:
+    """What same_el_guess() compares of its left element, when it is not
+    only its fingerprint (see context.fingerprint()).
+
+    Only the data is kept, no node, so that the summary can outlive the
+    tree of el.
+    """
+    match el:
+        case nodes.SpaceNode() | nodes.EmptyLineNode():
+            return el.dumps()
+        case nodes.DefNode() | nodes.ClassNode():
+            return el.name, getattr(el, "old_name", None)
+        case nodes.AtomtrailersNode():
+            return call_summary(el)
+        case nodes.AssignmentNode():
+            return el.target.dumps()
+        case nodes.TryNode():
+            return block_lines(el.value)
+        case nodes.WithNode():
+            return el.contexts.dumps(), block_lines(el.value)
+        case nodes.WhileNode() | nodes.ElifNode():
+            return el.test.dumps(), block_lines(el.value)
+        case nodes.ForNode():
+            return el.target.dumps(), el.iterator.dumps(), block_lines(el.value)
+        case nodes.MatchNode():
+            return el.subject.dumps(), block_lines(el.value)
+        case nodes.DictNode():
+            return dict_keys(el)
+        case nodes.ListNode() | nodes.TupleNode():
+            return list_items(el)
+        case nodes.AssertNode() if isinstance(el.value, nodes.ComparisonNode):
+            return el.value.first.dumps(), el.value.second.dumps()
+        case _:
+            return None
+
+
+def same_el_guess_summary(left_type: type, left: Any, right: Node) -> bool:
+    """same_el_guess() with the left element reduced to its type and its
+    guess_summary().
+
+    Only answers for the elements guess_summary() keeps data of, the
+    others are expected to be told apart by their fingerprint.
+    """
+    count(SAME_EL_GUESS)
+    if issubclass(left_type, (nodes.SpaceNode, nodes.EmptyLineNode)):
+        return left == right.dumps()
+
+    if left_type is not type(right) or left is None:
+        return False
+
+    match right:
+        case nodes.DefNode() | nodes.ClassNode():
+            name, old_name = left
+            return (
+                right.name == name
+                or getattr(right, "old_name", None) == name
+                or (old_name is not None and old_name == right.name)
+            )
+
+        case nodes.AtomtrailersNode():
+            return same_call_summary(left, right)
+
+        case nodes.AssignmentNode():
+            return levenshtein(left, right.target.dumps()) < MAX_LEVENSHTEIN_DISTANCE
+
+        case nodes.TryNode():
+            return (
+                lines_similarity(left, block_lines(right.value)) > CODE_BLOCK_SIMILARITY_THRESHOLD
+            )
+
+        case nodes.WithNode():
+            contexts, lines = left
+            if contexts == right.contexts.dumps():
+                return True
+            return (
+                lines_similarity(lines, block_lines(right.value)) > CODE_BLOCK_SIMILARITY_THRESHOLD
+            )
+
+        case nodes.WhileNode() | nodes.ElifNode():
+            test, lines = left
+            if test == right.test.dumps():
+                return True
+            return (
+                lines_similarity(lines, block_lines(right.value)) > CODE_BLOCK_SIMILARITY_THRESHOLD
+            )
+
+        case nodes.ForNode():
+            target, iterator, lines = left
+            if target == right.target.dumps() and iterator == right.iterator.dumps():
+                return True
+            return (
+                lines_similarity(lines, block_lines(right.value)) > CODE_BLOCK_SIMILARITY_THRESHOLD
+            )
+
+        case nodes.MatchNode():
+            subject, lines = left
+            if subject == right.subject.dumps():
+                return True
+            return (
+                lines_similarity(lines, block_lines(right.value)) > CODE_BLOCK_SIMILARITY_THRESHOLD
+            )
+
+        case nodes.DictNode():
+            return items_similarity(left, dict_keys(right)) > DICT_SIMILARITY_THRESHOLD
+
+        case nodes.ListNode() | nodes.TupleNode():
+            return items_similarity(left, list_items(right)) > LIST_SIMILARITY_THRESHOLD
+
+        case nodes.AssertNode() if isinstance(right.value, nodes.ComparisonNode):
+            first, second = left
+            return first == right.value.first.dumps() or second == right.value.second.dumps()
+
+        case _:
+            return False
+
+
 def find_el_strong(tree: ProxyList, target_el: Node) -> Node | None:
     """Strong matches: match with an id."""
     match target_el:
@@ -304,16 +509,7 @@ def find_el_strong(tree: ProxyList, target_el: Node) -> Node | None:
 
 def find_els_exact(tree: ProxyList, target_el: Node, old_tree: bool = False) -> list[Node]:
     """Find elements that exactly match target_el."""
-    if old_tree:
-
-        def filter_fn(el: Node) -> bool:
-            return not el.new
-    else:
-
-        def filter_fn(el: Node) -> bool:
-            return not el.hidden
-
-    return [el for el in tree if same_el(el, target_el) and filter_fn(el)]
+    return [el for el in visible_els(tree, old_tree=old_tree) if same_el(el, target_el)]
 
 
 def find_el(
@@ -323,11 +519,13 @@ def find_el(
     look_in_old_tree_first: bool = False,
 ) -> Node | None:
     """Find an element in tree that matches target_el."""
+    count(FIND_EL_STRONG)
     el = find_el_strong(tree, target_el)
     if el:
         return el
 
     # Match context
+    count(FIND_EL_CONTEXT)
     if context and isinstance(target_el, CodeBlockMixin):
         el = find_best_el_with_context(
             tree, target_el, context, look_in_old_tree_first=look_in_old_tree_first
@@ -346,6 +544,7 @@ def find_el(
         return None
 
     # Match with exact element
+    count(FIND_EL_EXACT)
     els = find_els_exact(tree, target_el, old_tree=False)
     if len(els) == 1:
         return els[0]
@@ -354,8 +553,12 @@ def find_el(
         return els[0]
 
     # Start guessing here
-    def _find_el(func: Callable[[Node, Node, Any], bool]) -> Node | None:
-        matches = [el for el in tree if func(el, target_el, context)]
+    count(FIND_EL_GUESS)
+
+    def _find_el(
+        func: Callable[[Node, Node, Any], bool], els: list[Node] | ProxyList = tree
+    ) -> Node | None:
+        matches = [el for el in els if func(el, target_el, context)]
         if len(matches) == 1:
             return matches[0]
         return None
@@ -370,7 +573,13 @@ def find_el(
         if el:
             return el
 
-    el = _find_el(same_el_guess)
+    if isinstance(target_el, nodes.AtomtrailersNode) and isinstance(
+        tree, (ProxyList, CodeBlockMixin)
+    ):
+        # Only the calls with the same name and number of calls can match
+        el = _find_el(same_el_guess, call_index(tree).find_all(call_key(target_el)))
+    else:
+        el = _find_el(same_el_guess)
     if el:
         return el
     return None
@@ -448,6 +657,20 @@ def best_block(tree: list[Node] | ProxyList, target_el: Node) -> Node | None:
     return None
 
 
+def block_lines(node: Node | ProxyList) -> frozenset[str]:
+    """The stripped non empty lines compared by code_block_similarity()."""
+    return frozenset(line.strip() for line in node.dumps().splitlines()) - {""}
+
+
+def lines_similarity(left_lines: frozenset[str], right_lines: frozenset[str]) -> float:
+    """Calculate similarity between two sets of block_lines() (0.0 to 1.0)."""
+    charge("similarity")
+    count(CODE_BLOCK_SIMILARITY)
+    same_lines_count = len(left_lines & right_lines)
+    total_lines_count = max(len(left_lines), len(right_lines))
+    return same_lines_count / total_lines_count
+
+
 def code_block_similarity(left: Node, right: Node) -> float:
     """Calculate similarity between two code blocks (0.0 to 1.0)."""
     left_node: Any = left
@@ -455,42 +678,44 @@ def code_block_similarity(left: Node, right: Node) -> float:
     if isinstance(left, (nodes.DefNode, nodes.ClassNode, nodes.WithNode, nodes.ForNode)):
         left_node = left.value
         right_node = right.value
-    left_lines = set(line.strip() for line in left_node.dumps().splitlines()) - set([""])
-    right_lines = set(line.strip() for line in right_node.dumps().splitlines()) - set([""])
-    same_lines_count = len(left_lines & right_lines)
-    total_lines_count = max(len(left_lines), len(right_lines))
+    return lines_similarity(block_lines(left_node), block_lines(right_node))
+
+
+def dict_keys(node: nodes.DictNode) -> frozenset[str]:
+    return frozenset(item.key.dumps() for item in node)
+
+
+def list_items(node: Node) -> frozenset[str]:
+    return frozenset(item.dumps() for item in node)
+
+
+def items_similarity(left_items: frozenset[str], right_items: frozenset[str]) -> float:
+    """Calculate similarity between the dict_keys() or list_items() of two nodes."""
+    charge("similarity")
+    same_lines_count = len(left_items & right_items)
+    total_lines_count = max(len(left_items), len(right_items))
     return same_lines_count / total_lines_count
 
 
 def dict_similarity(left: nodes.DictNode, right: nodes.DictNode) -> float:
     """Calculate similarity between two dict nodes by keys."""
-    left_lines = set(item.key.dumps() for item in left)
-    right_lines = set(item.key.dumps() for item in right)
-    same_lines_count = len(left_lines & right_lines)
-    total_lines_count = max(len(left_lines), len(right_lines))
-    return same_lines_count / total_lines_count
+    return items_similarity(dict_keys(left), dict_keys(right))
 
 
 def list_similarity(left: Node, right: Node) -> float:
     """Calculate similarity between two list/tuple nodes."""
-    left_lines = set(item.dumps() for item in left)
-    right_lines = set(item.dumps() for item in right)
-    same_lines_count = len(left_lines & right_lines)
-    total_lines_count = max(len(left_lines), len(right_lines))
-    return same_lines_count / total_lines_count
+    return items_similarity(list_items(left), list_items(right))
 
 
-def args_similarity(left: ProxyList, right: ProxyList) -> float:
-    """Calculate similarity between argument lists."""
-
-    def simplify_arg(arg: Node) -> str:
-        if getattr(arg, "target", None) and arg.target.dumps() == arg.value.dumps():
-            return arg.value.dumps()
-        return arg.dumps().strip()
+def simplify_arg(arg: Node) -> str:
+    if getattr(arg, "target", None) and arg.target.dumps() == arg.value.dumps():
+        return arg.value.dumps()
+    return arg.dumps().strip()
 
-    left_args = set(simplify_arg(arg) for arg in left)
-    right_args = set(simplify_arg(arg) for arg in right)
 
+def args_set_similarity(left_args: frozenset[str], right_args: frozenset[str]) -> float:
+    """Calculate similarity between two sets of simplify_arg()."""
+    charge("similarity")
     same_args_count = len(left_args & right_args)
     args_count = max(len(left_args), len(right_args))
     if args_count == 0:
@@ -498,15 +723,98 @@ def args_similarity(left: ProxyList, right: ProxyList) -> float:
     return same_args_count / args_count
 
 
-def find_key(key_node: Node, dict_node: nodes.DictNode) -> Node | None:
-    """Find a dict item by key in a dict node."""
-    key_str = key_node.dumps()
+def args_similarity(left: ProxyList, right: ProxyList) -> float:
+    """Calculate similarity between argument lists."""
+    return args_set_similarity(
+        frozenset(simplify_arg(arg) for arg in left),
+        frozenset(simplify_arg(arg) for arg in right),
+    )
+
+
+class DictKeyIndex:
+    """Positions of the items of a dict node by the text of their key.
+
+    Built on first use and kept on the dict node, the dict actions update
+    it as they add and remove items and drop it when they change a key.
+    The key at a cached position is checked before the position is
+    returned, the index is rebuilt if it does not match or if the number
+    of items changed behind its back.
+    """
+
+    def __init__(self, dict_node: nodes.DictNode) -> None:
+        self.dict_node = dict_node
+        self.positions: dict[str, int] = {}
+        self.size = 0
+        self.rebuild()
+
+    def __repr__(self) -> str:
+        return "<%s keys=%d>" % (self.__class__.__name__, len(self.positions))
+
+    def rebuild(self) -> None:
+        self.positions = {}
+        for position, item in enumerate(self.dict_node.value):
+            # The first item wins for duplicated keys
+            self.positions.setdefault(item.key.dumps(), position)
+        self.size = len(self.dict_node.value)
+
+    def _holds(self, position: int, key: str) -> bool:
+        items = self.dict_node.value
+        return position < len(items) and items[position].key.dumps() == key
+
+    def find_position(self, key_node: Node) -> int | None:
+        if len(self.dict_node.value) != self.size:
+            self.rebuild()
+        key = key_node.dumps()
+        position = self.positions.get(key)
+        if position is not None and not self._holds(position, key):
+            self.rebuild()
+            position = self.positions.get(key)
+        return position
+
+    def find(self, key_node: Node) -> Node | None:
+        position = self.find_position(key_node)
+        return None if position is None else self.dict_node.value[position]
+
+    def add(self, item: Node, position: int) -> None:
+        """Index item, inserted at position."""
+        for key, other_position in self.positions.items():
+            if other_position >= position:
+                self.positions[key] = other_position + 1
+        key = item.key.dumps()
+        if self.positions.get(key, position) >= position:
+            self.positions[key] = position
+        self.size += 1
+
+    def remove(self, item: Node, position: int) -> None:
+        """Forget item, removed from position."""
+        if len(self.positions) != self.size:
+            # Another item may have the same key, start over
+            self.size = -1
+            return
+        del self.positions[item.key.dumps()]
+        for key, other_position in self.positions.items():
+            if other_position > position:
+                self.positions[key] = other_position - 1
+        self.size -= 1
+
+
+def dict_key_index(dict_node: nodes.DictNode) -> DictKeyIndex:
+    """Return the key index of dict_node, building it if needed."""
+    index = dict_node.__dict__.get("key_index")
+    # Copies of the node may carry the index of the original
+    if index is None or index.dict_node is not dict_node:
+        index = dict_node.key_index = DictKeyIndex(dict_node)
+    return index
+
+
+def forget_dict_key_index(dict_node: nodes.DictNode) -> None:
+    """Drop the key index of dict_node after the key of an item changed."""
+    dict_node.__dict__.pop("key_index", None)
 
-    for dict_item in dict_node.value:
-        if dict_item.key.dumps() == key_str:
-            return dict_item
 
-    return None
+def find_key(key_node: Node, dict_node: nodes.DictNode) -> Node | None:
+    """Find a dict item by key in a dict node."""
+    return dict_key_index(dict_node).find(key_node)
 
 
 def same_arg_guess(left: Node, right: Node) -> bool:
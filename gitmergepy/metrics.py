@@ -0,0 +1,129 @@
+"""Deterministic counters of the hot paths of a merge.
+
+Unlike the operations charged to a budget, the counters do not limit
+anything. They count calls whose number reveals an algorithmic regression
+or a pathological file even when the wall time is too noisy to tell.
+"""
+
+from __future__ import annotations
+
+import inspect
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+# Calls of the node methods of redbaron, nested calls included
+DUMPS = "dumps"
+COPY = "copy"
+# Calls of the element comparisons
+SAME_EL = "same_el"
+SAME_EL_GUESS = "same_el_guess"
+CODE_BLOCK_SIMILARITY = "code_block_similarity"
+# Indexes of a tree tried by find_context()
+CONTEXT_PROBE = "context_probe"
+# Stages of find_el() reached, each one runs when the previous ones failed
+FIND_EL_STRONG = "find_el.strong"
+FIND_EL_CONTEXT = "find_el.context"
+FIND_EL_EXACT = "find_el.exact"
+FIND_EL_GUESS = "find_el.guess"
+
+
+class Metrics:
+    """Counters of one or more merges, by kind."""
+
+    def __init__(self) -> None:
+        self.counters: Counter[str] = Counter()
+
+    def __repr__(self) -> str:
+        return "<%s %s>" % (
+            self.__class__.__name__,
+            " ".join("%s=%d" % item for item in sorted(self.counters.items())),
+        )
+
+    def count(self, kind: str, number: int = 1) -> None:
+        self.counters[kind] += number
+
+    def to_dict(self) -> dict[str, int]:
+        return dict(sorted(self.counters.items()))
+
+
+_metrics: Metrics | None = None
+
+
+def _counting(name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+    def counting_method(node: Any, *args: Any, **kwargs: Any) -> Any:
+        # Overrides calling super() count once, in the most derived class
+        if getattr(type(node), name) is counting_method:
+            count(name)
+        return method(node, *args, **kwargs)
+
+    return counting_method
+
+
+def _count_node_calls() -> Callable[[], None]:
+    """Count the dumps() and copy() calls of the nodes, overrides included.
+
+    The methods are replaced on the classes, so the calls of every thread
+    are counted until restored.
+
+    Returns:
+        A function restoring the original methods.
+    """
+    from redbaron.base_nodes import Node
+
+    classes = [Node]
+    seen = set()
+    originals = []
+    while classes:
+        cls = classes.pop()
+        if cls in seen:
+            # Reached again through multiple inheritance
+            continue
+        seen.add(cls)
+        classes.extend(cls.__subclasses__())
+        for name in (DUMPS, COPY):
+            method = cls.__dict__.get(name)
+            if inspect.isfunction(method):
+                originals.append((cls, name, method))
+                setattr(cls, name, _counting(name, method))
+
+    def restore() -> None:
+        for cls, name, method in originals:
+            setattr(cls, name, method)
+
+    return restore
+
+
+@contextmanager
+def collect_metrics(metrics: Metrics) -> Iterator[Metrics]:
+    """Count the operations done while active in metrics.
+
+    The counts are added to the metrics active before, if any, so that
+    the counters of several merges can be aggregated. Merges only count
+    their operations while a collection is active, so that the node
+    methods are left alone otherwise.
+    """
+    global _metrics  # pylint: disable=global-statement
+    previous_metrics = _metrics
+    # The node methods are only wrapped once, by the outermost collection
+    restore = _count_node_calls() if previous_metrics is None else None
+    _metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _metrics = previous_metrics
+        if restore is not None:
+            restore()
+        if previous_metrics is not None:
+            previous_metrics.counters.update(metrics.counters)
+
+
+def active_metrics() -> Metrics | None:
+    return _metrics
+
+
+def count(kind: str, number: int = 1) -> None:
+    """Add number to the counter kind of the active metrics, if any."""
+    if _metrics is not None:
+        _metrics.counters[kind] += number
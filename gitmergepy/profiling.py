@@ -0,0 +1,133 @@
+"""Time spent by the merge per action and per differ handler."""
+
+from __future__ import annotations
+
+import cProfile
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, TypeVar
+
+if TYPE_CHECKING:
+    from redbaron.base_nodes import Node
+
+T = TypeVar("T")
+
+APPLY = "apply"
+DIFF = "diff"
+MAX_LABEL_LENGTH = 60
+
+
+def element_label(el: Node | None) -> str:
+    """Short description of the element an action or a handler works on."""
+    if el is None:
+        return ""
+    from .tools import short_display_el
+
+    label = short_display_el(el)
+    if len(label) > MAX_LABEL_LENGTH:
+        label = label[: MAX_LABEL_LENGTH - 3] + "..."
+    return label
+
+
+class Profile:
+    """Timings of the actions applied, by action class and element, and of
+    the COMPUTE_DIFF_ONE_CALLS and COMPUTE_DIFF_ITERABLE_CALLS handlers, by
+    handler and element.
+
+    The times include the nested actions and diffs. With cprofile set, the
+    whole merge is also profiled with cProfile, see dump_stats().
+    """
+
+    def __init__(self, cprofile: bool = False) -> None:
+        # (kind, name, element) -> [calls, seconds]
+        self.timings: dict[tuple[str, str, str], list[Any]] = {}
+        self.cprofile = cProfile.Profile() if cprofile else None
+
+    def __repr__(self) -> str:
+        return "<%s entries=%d>" % (self.__class__.__name__, len(self.timings))
+
+    def add(self, kind: str, name: str, label: str, seconds: float) -> None:
+        timing = self.timings.get((kind, name, label))
+        if timing is None:
+            self.timings[(kind, name, label)] = [1, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+
+    def call(
+        self,
+        kind: str,
+        name: str,
+        el: Node | None,
+        fun: Callable[..., T],
+        *args: Any,
+        **kwargs: Any,
+    ) -> T:
+        """Call fun and record its time under kind, name and el."""
+        start = time.perf_counter()
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            self.add(kind, name, element_label(el), time.perf_counter() - start)
+
+    def slowest(self, count: int = 20) -> list[tuple[str, str, str, int, float]]:
+        """Return the count slowest (kind, name, element, calls, seconds)."""
+        entries = [(*key, calls, seconds) for key, (calls, seconds) in self.timings.items()]
+        entries.sort(key=lambda entry: entry[4], reverse=True)
+        return entries[:count]
+
+    def totals(self, kind: str) -> list[tuple[str, int, float]]:
+        """Return the (name, calls, seconds) of kind, slowest first."""
+        totals: dict[str, list[Any]] = {}
+        for (entry_kind, name, _), (calls, seconds) in self.timings.items():
+            if entry_kind == kind:
+                total = totals.setdefault(name, [0, 0.0])
+                total[0] += calls
+                total[1] += seconds
+        return sorted(
+            ((name, calls, seconds) for name, (calls, seconds) in totals.items()),
+            key=lambda total: total[2],
+            reverse=True,
+        )
+
+    def report(self, count: int = 20) -> str:
+        """Return the slowest elements and the time per action class and
+        per handler as text."""
+        lines = ["slowest elements:"]
+        for kind, name, label, calls, seconds in self.slowest(count):
+            lines.append("  %8.3fs %6d  %s %s %s" % (seconds, calls, kind, name, label))
+        for kind in (DIFF, APPLY):
+            lines.append("%s:" % kind)
+            for name, calls, seconds in self.totals(kind)[:count]:
+                lines.append("  %8.3fs %6d  %s" % (seconds, calls, name))
+        return "\n".join(lines) + "\n"
+
+    def dump_stats(self, filename: str) -> None:
+        """Write the cProfile data, to be read with pstats."""
+        if self.cprofile is None:
+            raise ValueError("profile created without cprofile")
+        self.cprofile.dump_stats(filename)
+
+
+_profile: Profile | None = None
+
+
+@contextmanager
+def profiling(profile: Profile) -> Iterator[Profile]:
+    """Record the timings of the merges run while active in profile."""
+    global _profile  # pylint: disable=global-statement
+    previous_profile = _profile
+    _profile = profile
+    if profile.cprofile is not None:
+        profile.cprofile.enable()
+    try:
+        yield profile
+    finally:
+        if profile.cprofile is not None:
+            profile.cprofile.disable()
+        _profile = previous_profile
+
+
+def active_profile() -> Profile | None:
+    return _profile
@@ -0,0 +1,254 @@
+"""Replay the merges of a git history to measure speed and resolution rate."""
+
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from .budget import Budget
+from .resolve import CatFile, GitError, git
+from .stats import MergeStats
+
+CLEAN = "clean"
+CONFLICTS = "conflicts"
+FALLBACK = "fallback"
+ERROR = "error"
+
+REPORT_FIELDS = (
+    "commit",
+    "path",
+    "outcome",
+    "agrees",
+    "elapsed",
+    "peak_memory",
+    "size",
+    "error",
+)
+
+
+class ReplayResult:
+    def __init__(self, commit: str, path: str) -> None:
+        self.commit = commit
+        self.path = path
+        self.outcome = ERROR
+        # Whether the merged file matches the committed resolution,
+        # None when the merge commit deleted the file
+        self.agrees: bool | None = None
+        self.elapsed = 0.0
+        self.peak_memory = 0
+        # Total size of the three versions in bytes
+        self.size = 0
+        self.error = ""
+
+    def __repr__(self) -> str:
+        return "<%s %s:%s outcome=%s agrees=%r>" % (
+            self.__class__.__name__,
+            self.commit[:10],
+            self.path,
+            self.outcome,
+            self.agrees,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "commit": self.commit,
+            "path": self.path,
+            "outcome": self.outcome,
+            "agrees": self.agrees,
+            "elapsed": round(self.elapsed, 6),
+            "peak_memory": self.peak_memory,
+            "size": self.size,
+            "error": self.error,
+        }
+
+
+def list_merges(repo: str, rev: str = "HEAD", max_count: int | None = None) -> Iterator[list[str]]:
+    """Yield the merge commits reachable from rev followed by their parents."""
+    args = ["rev-list", "--merges", "--parents", rev]
+    if max_count is not None:
+        args.insert(1, "--max-count=%d" % max_count)
+    for line in git(args, cwd=repo).decode().splitlines():
+        yield line.split()
+
+
+def changed_paths(repo: str, base: str, commit: str, suffix: str = ".py") -> set[str]:
+    output = git(["diff", "--name-only", "--no-renames", "-z", base, commit], cwd=repo)
+    return {
+        os.fsdecode(path) for path in output.split(b"\0") if path and path.endswith(suffix.encode())
+    }
+
+
+def _read_text(cat_file: CatFile, rev: str, path: str) -> str | None:
+    """Return the content of path at rev, None if it does not exist."""
+    try:
+        return cat_file.read("%s:%s" % (rev, path)).decode()
+    except GitError:
+        return None
+
+
+def replay_file(
+    result: ReplayResult,
+    base: str,
+    current: str,
+    other: str,
+    resolution: str | None,
+    budget: Budget | None = None,
+    chunked: bool = False,
+    trace_memory: bool = False,
+) -> None:
+    """Merge one file like the merge driver does and fill result."""
+    from .runner import merge_files
+
+    result.size = len(base) + len(current) + len(other)
+    stats = MergeStats()
+    with tempfile.TemporaryDirectory(prefix="gitmergepy-replay-") as tmp_dir:
+        paths = []
+        for name, content in (("base.py", base), ("current.py", current), ("other.py", other)):
+            paths.append(os.path.join(tmp_dir, name))
+            with open(paths[-1], "w") as f:
+                f.write(content)
+
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            clean = merge_files(*paths, budget=budget, stats=stats, chunked=chunked)
+        except (SyntaxError, ValueError) as e:
+            result.error = str(e) or e.__class__.__name__
+            return
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # Crashes are recorded like the other outcomes of the corpus
+            logging.debug("merge failed", exc_info=True)
+            result.error = "%s: %s" % (e.__class__.__name__, e)
+            return
+        finally:
+            result.elapsed = time.perf_counter() - start
+            if trace_memory:
+                result.peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                result.peak_memory = stats.peak_memory
+
+        with open(paths[1]) as f:
+            output = f.read()
+
+    if stats.fell_back:
+        result.outcome = FALLBACK
+    else:
+        result.outcome = CLEAN if clean else CONFLICTS
+    if resolution is not None:
+        result.agrees = output == resolution
+
+
+def replay_repository(
+    repo: str,
+    rev: str = "HEAD",
+    max_merges: int | None = None,
+    budget_factory: Callable[[], Budget | None] | None = None,
+    chunked: bool = False,
+    trace_memory: bool = False,
+) -> list[ReplayResult]:
+    """Redo the merge of every Python file changed on both sides of the
+    merge commits reachable from rev.
+
+    Args:
+        repo: A directory inside the repository
+        rev: Where to start walking the history
+        max_merges: Number of merge commits to replay, from the most recent
+        budget_factory: Called to get a fresh Budget for each merge
+        chunked: Use the chunked merge mode
+        trace_memory: Measure the peak memory with tracemalloc instead of
+            sampling the resident memory, which slows down the merges
+    """
+    results = []
+    with CatFile(cwd=repo) as cat_file:
+        for commit, *parents in list_merges(repo, rev, max_merges):
+            if len(parents) != 2:
+                logging.info("%s: skipping octopus merge", commit)
+                continue
+            current_rev, other_rev = parents
+            try:
+                base_rev = git(["merge-base", current_rev, other_rev], cwd=repo).decode().strip()
+            except GitError:
+                logging.info("%s: no merge base", commit)
+                continue
+
+            paths = changed_paths(repo, base_rev, current_rev) & changed_paths(
+                repo, base_rev, other_rev
+            )
+            for path in sorted(paths):
+                result = ReplayResult(commit, path)
+                try:
+                    versions = [
+                        _read_text(cat_file, version, path)
+                        for version in (base_rev, current_rev, other_rev)
+                    ]
+                    resolution = _read_text(cat_file, commit, path)
+                except UnicodeDecodeError:
+                    result.error = "not utf-8"
+                    results.append(result)
+                    continue
+                base, current, other = versions
+                if base is None or current is None or other is None:
+                    # Added or deleted on one side, nothing to merge
+                    continue
+                budget = budget_factory() if budget_factory else None
+                replay_file(
+                    result,
+                    base,
+                    current,
+                    other,
+                    resolution,
+                    budget=budget,
+                    chunked=chunked,
+                    trace_memory=trace_memory,
+                )
+                logging.info("%s %s: %s", commit[:10], path, result.outcome)
+                results.append(result)
+    return results
+
+
+def summarize(results: list[ReplayResult]) -> dict[str, Any]:
+    """Aggregate the outcomes, rates, timings and memory of a replay."""
+    compared = [result for result in results if result.agrees is not None]
+    merged = [result for result in results if result.outcome != ERROR]
+    return {
+        "files": len(results),
+        "outcomes": {
+            outcome: sum(1 for result in results if result.outcome == outcome)
+            for outcome in (CLEAN, CONFLICTS, FALLBACK, ERROR)
+        },
+        "resolution_rate": (
+            sum(1 for result in merged if result.outcome == CLEAN) / len(merged) if merged else 0.0
+        ),
+        "agreement_rate": (
+            sum(1 for result in compared if result.agrees) / len(compared) if compared else 0.0
+        ),
+        "elapsed": round(sum(result.elapsed for result in results), 6),
+        "max_elapsed": round(max((result.elapsed for result in results), default=0.0), 6),
+        "peak_memory": max((result.peak_memory for result in results), default=0),
+    }
+
+
+def write_report(results: list[ReplayResult], filename: str) -> None:
+    """Write the results as csv if filename ends with .csv, json otherwise."""
+    with open(filename, "w", newline="") as f:
+        if filename.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            for result in results:
+                writer.writerow(result.to_dict())
+        else:
+            report = {
+                "summary": summarize(results),
+                "results": [result.to_dict() for result in results],
+            }
+            json.dump(report, f, indent=2)
+            f.write("\n")
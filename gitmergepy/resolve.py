@@ -0,0 +1,200 @@
+"""Resolve the conflicted Python files of a stopped git merge or rebase."""
+
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO
+
+from .writer import write_if_changed
+
+# Index stages of an unmerged path
+BASE_STAGE = 1
+CURRENT_STAGE = 2
+OTHER_STAGE = 3
+
+
+class GitError(Exception):
+    pass
+
+
+def git(args: list[str], cwd: str | None = None) -> bytes:
+    """Run a git command and return its output."""
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise GitError(result.stderr.decode(errors="replace").strip())
+    return result.stdout
+
+
+def repository_root(cwd: str | None = None) -> str:
+    return git(["rev-parse", "--show-toplevel"], cwd=cwd).decode().strip()
+
+
+class CatFile:
+    """Long-lived `git cat-file --batch` process to read many blobs."""
+
+    def __init__(self, cwd: str | None = None) -> None:
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def __enter__(self) -> CatFile:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @property
+    def stdin(self) -> IO[bytes]:
+        assert self.process.stdin
+        return self.process.stdin
+
+    @property
+    def stdout(self) -> IO[bytes]:
+        assert self.process.stdout
+        return self.process.stdout
+
+    def read(self, object_name: str) -> bytes:
+        """Return the content of a blob, commit or tree."""
+        self.stdin.write(object_name.encode() + b"\n")
+        self.stdin.flush()
+        return self._read_object(object_name)
+
+    def read_many(self, object_names: Iterable[str], batch_size: int = 256) -> list[bytes]:
+        """Return the content of many objects, sending the requests in batches."""
+        object_names = list(object_names)
+        contents = []
+        for start in range(0, len(object_names), batch_size):
+            batch = object_names[start : start + batch_size]
+            self.stdin.write(b"".join(name.encode() + b"\n" for name in batch))
+            self.stdin.flush()
+            contents += [self._read_object(name) for name in batch]
+        return contents
+
+    def _read_object(self, object_name: str) -> bytes:
+        header = self.stdout.readline().split()
+        if len(header) != 3:
+            raise GitError("object not found: %s" % object_name)
+        content = self.stdout.read(int(header[2]))
+        self.stdout.read(1)  # trailing new line
+        return content
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.stdin.close()
+            self.process.wait()
+
+
+def list_unmerged(cwd: str, suffix: str = ".py") -> dict[str, dict[int, str]]:
+    """Return the unmerged paths of the index with the blob of each stage.
+
+    Paths are relative to the repository root when cwd is the root.
+    """
+    unmerged: dict[str, dict[int, str]] = {}
+    output = git(["ls-files", "--unmerged", "-z"], cwd=cwd)
+    for entry in output.split(b"\0"):
+        if not entry:
+            continue
+        info, path_bytes = entry.split(b"\t", 1)
+        _, sha, stage = info.split()
+        path = os.fsdecode(path_bytes)
+        if path.endswith(suffix):
+            unmerged.setdefault(path, {})[int(stage)] = sha.decode()
+    return unmerged
+
+
+class ResolveResult:
+    def __init__(
+        self, path: str, output: str | None = None, clean: bool = False, error: str = ""
+    ) -> None:
+        self.path = path
+        self.output = output
+        self.clean = clean
+        self.error = error
+
+    def __repr__(self) -> str:
+        return "<%s path=%r clean=%r error=%r>" % (
+            self.__class__.__name__,
+            self.path,
+            self.clean,
+            self.error,
+        )
+
+
+def _merge_one(path: str, base: str, current: str, other: str) -> ResolveResult:
+    from .runner import merge_text
+
+    try:
+        output, clean = merge_text(base, current, other)
+    except (SyntaxError, ValueError) as e:
+        return ResolveResult(path, error=str(e) or e.__class__.__name__)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # A crash on one file must not keep the other files from being resolved
+        logging.debug("%s: merge failed", path, exc_info=True)
+        return ResolveResult(path, error="%s: %s" % (e.__class__.__name__, e))
+    return ResolveResult(path, output=output, clean=clean)
+
+
+def resolve_repository(
+    cwd: str | None = None, jobs: int | None = None, stage: bool = True
+) -> list[ResolveResult]:
+    """Merge every conflicted Python file of the index.
+
+    Clean merges are written to the work tree and, if stage is set, added
+    to the index. Files that still have conflicts are left untouched.
+
+    Args:
+        cwd: A directory inside the repository
+        jobs: Number of merge processes, defaults to the number of CPUs
+        stage: Add the cleanly merged files to the index
+    """
+    root = repository_root(cwd)
+    unmerged = list_unmerged(root)
+
+    results = []
+    to_merge = []
+    for path, stages in sorted(unmerged.items()):
+        if set(stages) != {BASE_STAGE, CURRENT_STAGE, OTHER_STAGE}:
+            # Added or deleted on one side, nothing to merge
+            results.append(ResolveResult(path, error="missing stage"))
+            continue
+        to_merge.append((path, stages))
+
+    with CatFile(cwd=root) as cat_file:
+        blobs = cat_file.read_many(
+            stages[stage_number]
+            for _, stages in to_merge
+            for stage_number in (BASE_STAGE, CURRENT_STAGE, OTHER_STAGE)
+        )
+
+    merges = []
+    for index, (path, _) in enumerate(to_merge):
+        try:
+            texts = [blob.decode() for blob in blobs[index * 3 : index * 3 + 3]]
+        except UnicodeDecodeError:
+            results.append(ResolveResult(path, error="not utf-8"))
+            continue
+        merges.append((path, *texts))
+    del blobs
+
+    if merges:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results += executor.map(_merge_one, *zip(*merges))
+
+    resolved = []
+    for result in results:
+        if result.clean and result.output is not None:
+            write_if_changed(os.path.join(root, result.path), [result.output])
+            resolved.append(result.path)
+        logging.info("%s: %s", result.path, "resolved" if result.clean else "not resolved")
+
+    if stage and resolved:
+        git(["add", "--", *resolved], cwd=root)
+
+    return sorted(results, key=lambda result: result.path)
@@ -2,17 +2,37 @@
 
 from __future__ import annotations
 
+import argparse
+import contextlib
+import gc
+import json
 import logging
+import sys
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
 
-from redbaron import RedBaron
+from gitmergepy.budget import Budget, BudgetExceeded, checkpoint, enforce
+from gitmergepy.stats import TEXT_STRATEGY, MergeStats
+from gitmergepy.textmerge import conflict_ranges, merge_lines
+from gitmergepy.writer import write_if_changed
 
-from gitmergepy.applier import apply_changes
-from gitmergepy.conflicts import add_conflicts
-from gitmergepy.differ import compute_diff_iterables
+# The parser and the merge modules are imported by the functions using
+# them, so that the subcommands and --help start without loading them
+if TYPE_CHECKING:
+    from redbaron import RedBaron
+
+    from gitmergepy.actions import Action
+    from gitmergepy.conflicts import ConflictReport
+
+# In symmetric mode, the changes of current are applied to other when
+# the estimated changes of other are this many times larger
+SWAP_RATIO = 2
 
 
 def parse_file(filename: str) -> RedBaron:
     """Parse a Python file and return its AST as a RedBaron tree."""
+    from redbaron import RedBaron
+
     with open(filename) as f:
         return RedBaron(f.read())
 
@@ -21,7 +41,8 @@ def main(args: list[str]) -> int:
     """Main entry point for the merge tool.
 
     Args:
-        args: List of [base_file, current_file, other_file]
+        args: List of [base_file, current_file, other_file], or a
+            subcommand name followed by its arguments
 
     Returns:
         0 if merge succeeded without conflicts,
@@ -29,53 +50,678 @@ def main(args: list[str]) -> int:
         2 if merge failed due to syntax/value error,
         130 if interrupted by user.
     """
+    if args and args[0] in COMMANDS:
+        return COMMANDS[args[0]](args[1:])
+
+    from gitmergepy.cache import OutcomeCache, PlanCache, use_outcome_cache, use_plan_cache
+    from gitmergepy.conflicts import ConflictReport
+    from gitmergepy.metrics import Metrics, collect_metrics
+    from gitmergepy.profiling import Profile, profiling
+
+    parser = argparse.ArgumentParser(prog="gitmergepy")
+    _add_files_arguments(parser)
+    parser.add_argument(
+        "more_other_files",
+        nargs="*",
+        metavar="other_file",
+        help="more versions to merge, one after the other",
+    )
+    _add_budget_arguments(parser)
+    parser.add_argument(
+        "--stats", action="store_true", help="print merge statistics as json on stderr"
+    )
+    parser.add_argument(
+        "--chunked",
+        action="store_true",
+        help="only parse the top-level definitions that differ between the versions",
+    )
+    parser.add_argument(
+        "--report", metavar="FILE", help="write the conflicts and their lines as json to FILE"
+    )
+    parser.add_argument(
+        "--symmetric",
+        action="store_true",
+        help="apply the changes of the current version to the other one when they are smaller",
+    )
+    parser.add_argument(
+        "--plan-cache",
+        action="store_true",
+        help="reuse the merge plans of the same base and other versions across runs",
+    )
+    parser.add_argument(
+        "--outcome-cache",
+        action="store_true",
+        help="reuse the result of a merge of the same versions across runs",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the slowest actions and differ handlers on stderr",
+    )
+    parser.add_argument(
+        "--profile-stats",
+        metavar="FILE",
+        help="profile the merge with cProfile and write the pstats data to FILE",
+    )
+    options = parser.parse_args(args)
+
     logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     logging.debug(" ".join(args))
-    base_file = args[0]
-    current_file = args[1]
-    other_file = args[2]
 
+    stats = MergeStats()
+    report = ConflictReport()
+    plan_cache = PlanCache() if options.plan_cache else None
+    outcome_cache = OutcomeCache() if options.outcome_cache else None
+    profile = None
+    if options.profile or options.profile_stats:
+        profile = Profile(cprofile=bool(options.profile_stats))
     try:
-        r = merge_files(base_file, current_file, other_file)
+        other_files = [options.other_file, *options.more_other_files]
+        with (
+            use_plan_cache(plan_cache),
+            use_outcome_cache(outcome_cache),
+            profiling(profile) if profile is not None else contextlib.nullcontext(),
+            collect_metrics(Metrics()) if options.stats else contextlib.nullcontext(),
+        ):
+            r = merge_files(
+                options.base_file,
+                options.current_file,
+                other_files if options.more_other_files else options.other_file,
+                budget=_budget_from_options(options),
+                stats=stats,
+                chunked=options.chunked,
+                report=report,
+                symmetric=options.symmetric,
+            )
     except (SyntaxError, ValueError) as e:
         logging.error("Failed to merge: %s", e)
         return 2
     except KeyboardInterrupt:
         return 130
-    else:
-        return 0 if r else 1
+
+    if options.stats:
+        sys.stderr.write(json.dumps(stats.to_dict()) + "\n")
+    if profile is not None:
+        sys.stderr.write(profile.report())
+        if options.profile_stats:
+            profile.dump_stats(options.profile_stats)
+    if options.report:
+        with open(options.report, "w") as f:
+            json.dump(
+                {"file": options.current_file, "strategy": stats.strategy, **report.to_dict()},
+                f,
+                indent=2,
+            )
+            f.write("\n")
+    if stats.fell_back:
+        # Still a merge, only the exit code tells git about conflicts
+        logging.warning("Merged line by line: %s", stats.fallback_reason)
+    return 0 if r else 1
+
+
+def check_main(args: list[str]) -> int:
+    """Entry point for `gitmergepy check`.
+
+    Reports the conflicts a merge would produce without touching any file.
+    Uses the same exit codes as main().
+    """
+    parser = argparse.ArgumentParser(prog="gitmergepy check")
+    _add_files_arguments(parser)
+    parser.add_argument("--first", action="store_true", help="stop at the first conflict found")
+    options = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    try:
+        report = check_files(
+            options.base_file,
+            options.current_file,
+            options.other_file,
+            stop_at_first=options.first,
+        )
+    except (SyntaxError, ValueError) as e:
+        logging.error("Failed to check: %s", e)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+
+    for conflict in report.conflicts:
+        sys.stdout.write("%s: %s\n" % (conflict.location, conflict.reason))
+    return 1 if report.conflicts else 0
+
+
+def _add_files_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("base_file", help="the common ancestor file")
+    parser.add_argument("current_file", help="the current version")
+    parser.add_argument("other_file", help="the other version to merge")
+
+
+def _add_budget_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        metavar="SECONDS",
+        help="fall back to a line based merge after this time",
+    )
+    parser.add_argument(
+        "--max-ops",
+        type=int,
+        metavar="N",
+        help="fall back to a line based merge after this number of operations",
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        metavar="MB",
+        help="fall back to a line based merge above this resident memory",
+    )
+
+
+def _budget_from_options(options: argparse.Namespace) -> Budget | None:
+    if options.timeout is None and options.max_ops is None and options.max_memory is None:
+        return None
+    max_memory = options.max_memory * 2**20 if options.max_memory is not None else None
+    return Budget(max_seconds=options.timeout, max_ops=options.max_ops, max_memory=max_memory)
 
 
-def merge_files(base_file: str, current_file: str, other_file: str) -> bool:
+def merge_files(
+    base_file: str,
+    current_file: str,
+    other_file: str | list[str],
+    budget: Budget | None = None,
+    stats: MergeStats | None = None,
+    chunked: bool = False,
+    report: ConflictReport | None = None,
+    symmetric: bool = False,
+) -> bool:
     """Perform a three-way merge of Python files.
 
     Args:
         base_file: Path to the common ancestor file
-        current_file: Path to the current version (will be modified in place)
-        other_file: Path to the other version to merge
+        current_file: Path to the current version, replaced by the merge
+            result unless it is unchanged
+        other_file: Path to the other version to merge, or a list of paths
+            to merge several versions, see merge_text()
+        budget: Limits after which the merge is done line by line
+        stats: Filled with statistics about the merge
+        chunked: Skip parsing the top-level definitions unchanged in all versions
+        report: Filled with the conflicts and their lines in the merged file
+        symmetric: Apply the changes of current to other when they are
+            smaller, see merge_text()
 
     Returns:
         True if merge succeeded without conflicts, False if conflicts remain.
     """
-    base_ast = parse_file(base_file)
-    current_ast = parse_file(current_file)
-    other_ast = parse_file(other_file)
-    merge_ast(base_ast, current_ast, other_ast)
-    output = current_ast.dumps()
-    with open(current_file, "w") as out:
-        out.write(output)
-    return ">>>>>>>>>>>>>>>>>>>" not in output
+    with open(base_file) as f:
+        base = f.read()
+    with open(current_file) as f:
+        current = f.read()
+    others = []
+    for filename in [other_file] if isinstance(other_file, str) else other_file:
+        with open(filename) as f:
+            others.append(f.read())
+    output, clean = merge_text(
+        base,
+        current,
+        others[0] if isinstance(other_file, str) else others,
+        budget=budget,
+        stats=stats,
+        chunked=chunked,
+        report=report,
+        symmetric=symmetric,
+    )
+    write_if_changed(current_file, output, original=current)
+    return clean
+
+
+def merge_text(
+    base: str,
+    current: str,
+    other: str | list[str],
+    budget: Budget | None = None,
+    stats: MergeStats | None = None,
+    chunked: bool = False,
+    report: ConflictReport | None = None,
+    symmetric: bool = False,
+) -> tuple[str, bool]:
+    """Perform a three-way merge of Python source code.
+
+    If the budget is exceeded, the AST merge is abandoned and the sources
+    are merged line by line instead. The trees are released before that so
+    the fallback does not add to the memory use.
+
+    In chunked mode, the top-level functions and classes identical in all
+    the versions are not parsed, see chunks.collapse_unchanged().
 
+    other can be a list of versions sharing the same base, like the
+    branches of an octopus merge. They are merged one after the other into
+    a single parsed current, which is rendered once at the end.
 
-def merge_ast(base_ast: RedBaron, current_ast: RedBaron, other_ast: RedBaron) -> None:
+    In symmetric mode, when other changed the base much more than current
+    did, the smaller changes of current are applied to other instead. This
+    is only kept if it is free of conflicts, otherwise the merge is redone
+    in the usual direction so that the conflicts are the same. Elements
+    added at the same place on both sides can come out in another order.
+
+    The conflicts are recorded in report, with their lines in the output.
+
+    While an outcome cache is active, see cache.use_outcome_cache(), the
+    output and the conflicts of a merge already done with the same
+    versions and options are returned without parsing anything.
+
+    Returns:
+        The merged source and whether it is free of conflicts.
+    """
+    from gitmergepy.cache import active_outcome_cache
+    from gitmergepy.conflicts import ConflictRecord, ConflictReport, collect_conflicts
+    from gitmergepy.metrics import Metrics, active_metrics, collect_metrics
+
+    if budget is None:
+        budget = Budget()
+    if stats is None:
+        stats = MergeStats()
+    if report is None:
+        report = ConflictReport()
+    others = [other] if isinstance(other, str) else other
+    # Counted for the caller collecting them only, see metrics.collect_metrics()
+    metrics = Metrics() if active_metrics() is not None else None
+
+    outcome_cache = active_outcome_cache()
+    outcome_key = ("chunked=%d symmetric=%d" % (chunked, symmetric), base, current, *others)
+    outcome = outcome_cache.get(outcome_key) if outcome_cache is not None else None
+    if outcome is not None:
+        output, clean = outcome["output"], outcome["clean"]
+        report.conflicts = [ConflictRecord(**details) for details in outcome["conflicts"]]
+        stats.conflicts = len(report.conflicts)
+        stats.cached_outcome = True
+    else:
+        try:
+            with (
+                enforce(budget),
+                collect_metrics(metrics) if metrics is not None else contextlib.nullcontext(),
+            ):
+                output = None
+                if symmetric and len(others) == 1 and _other_diff_larger(base, current, others[0]):
+                    output = _merge_swapped(base, current, others[0], chunked, stats)
+                if output is None:
+                    with collect_conflicts(report):
+                        output = _merge_versions(base, current, others, chunked, stats)
+                checkpoint("render")
+            report.locate(output)
+            clean = not report.conflicts
+            stats.conflicts = len(report.conflicts)
+        except BudgetExceeded as e:
+            logging.warning("%s, falling back to line based merge", e)
+            # Release the trees still referenced by the traceback frames
+            e.with_traceback(None)
+            gc.collect()
+            output = current
+            stats.conflicts = 0
+            for other_source in others:
+                output, conflicts = merge_lines(base, output, other_source)
+                stats.conflicts += conflicts
+            report.conflicts = [
+                ConflictRecord("line conflict", "", "<module>", start=start, end=end)
+                for start, end in conflict_ranges(output)
+            ]
+            clean = not stats.conflicts
+            stats.strategy = TEXT_STRATEGY
+            stats.fallback_reason = str(e)
+        # A line based merge is only the outcome of this budget
+        if outcome_cache is not None and not stats.fell_back:
+            outcome_cache.put(outcome_key, output, clean, report.to_dict()["details"])
+
+    stats.elapsed = budget.elapsed
+    stats.ops = dict(budget.ops)
+    if metrics is not None:
+        stats.counters = metrics.to_dict()
+    stats.peak_memory = budget.peak_memory
+    return output, clean
+
+
+def _merge_versions(
+    base: str, current: str, others: list[str], chunked: bool, stats: MergeStats
+) -> str:
+    from gitmergepy.chunks import collapse_unchanged, expand
+    from gitmergepy.conflicts import active_report
+
+    collapsed = collapse_unchanged(base, current, *others) if chunked else None
+    if collapsed is None:
+        return _merge_sources(base, current, others, stats)
+    sources, expansions = collapsed
+    report = active_report()
+    conflicts_count = len(report.conflicts) if report is not None else 0
+    attempt_stats = MergeStats()
+    attempt_stats.collapsed = len(expansions)
+    output = expand(
+        _merge_sources(sources[0], sources[1], list(sources[2:]), attempt_stats), expansions
+    )
+    if output is None:
+        logging.info("chunk placeholders moved by the merge, merging without chunks")
+        if report is not None:
+            del report.conflicts[conflicts_count:]
+        return _merge_sources(base, current, others, stats)
+    stats.add_plan_stats(attempt_stats)
+    return output
+
+
+def _other_diff_larger(base: str, current: str, other: str) -> bool:
+    from gitmergepy.chunks import edit_sizes
+
+    sizes = edit_sizes(base, current, other)
+    if sizes is None:
+        return False
+    current_size, other_size = sizes
+    return other_size > SWAP_RATIO * current_size
+
+
+def _merge_swapped(
+    base: str, current: str, other: str, chunked: bool, stats: MergeStats
+) -> str | None:
+    """Apply the changes of current to other instead of the reverse.
+
+    The conflicts would be reported from the point of view of other, so
+    None is returned as soon as one is found and the merge is to be done
+    in the usual direction.
+    """
+    from gitmergepy.conflicts import ConflictReport, FirstConflict, collect_conflicts
+
+    report = ConflictReport(insert_markers=False, stop_at_first=True)
+    # Only counted if the swapped merge is kept
+    attempt_stats = MergeStats()
+    try:
+        with collect_conflicts(report):
+            output = _merge_versions(base, other, [current], chunked, attempt_stats)
+    except FirstConflict:
+        logging.info("conflict in the swapped merge, merging other into current")
+        return None
+    stats.add_plan_stats(attempt_stats)
+    stats.swapped = True
+    return output
+
+
+def _merge_sources(
+    base: str, current: str, others: list[str], stats: MergeStats | None = None
+) -> str:
+    from redbaron import RedBaron
+
+    current_ast = RedBaron(current)
+    checkpoint("parse")
+    for other in others:
+        _apply_plan(current_ast, _source_plan(base, other, stats), stats)
+    return current_ast.dumps()
+
+
+def _source_plan(base: str, other: str, stats: MergeStats | None) -> list[Action]:
+    """Return the plan of the changes from base to other, from the plan
+    cache if one is active and has it."""
+    from redbaron import RedBaron
+
+    from gitmergepy.cache import active_plan_cache
+
+    plan_cache = active_plan_cache()
+    if plan_cache is not None:
+        changes = plan_cache.get(base, other)
+        if changes is not None:
+            if stats is not None:
+                stats.cached_plans += 1
+            return changes
+    # The base and other trees are released once diffed
+    changes = _diff_plan(RedBaron(base), RedBaron(other))
+    if plan_cache is not None and not plan_cache.put(base, other, changes) and stats is not None:
+        stats.skipped_plans += 1
+    return changes
+
+
+def merge_ast(
+    base_ast: RedBaron,
+    current_ast: RedBaron,
+    other_ast: RedBaron | Iterable[RedBaron],
+    stats: MergeStats | None = None,
+) -> None:
     """Merge changes from other_ast into current_ast using base_ast as reference.
 
+    other_ast can also be an iterable of trees with base_ast as common
+    ancestor. Each one is diffed and its changes applied to current_ast
+    before the next one is read. Diffing marks the nodes of the base tree,
+    so the trees after the first are diffed against a copy of base_ast
+    parsed from its source.
+
     Args:
         base_ast: The common ancestor AST
         current_ast: The current version AST (modified in place)
-        other_ast: The other version AST to merge from
+        other_ast: The other version AST to merge from, or several of them
+        stats: Filled with the size of the merge plans
     """
+    from redbaron import RedBaron
+
+    if isinstance(other_ast, RedBaron):
+        _merge_plan(base_ast, current_ast, other_ast, stats)
+        return
+
+    base_source = base_ast.dumps()
+    for index, other in enumerate(other_ast):
+        if index:
+            base_ast = RedBaron(base_source)
+        _merge_plan(base_ast, current_ast, other, stats)
+        # Only the copy of the next iteration is needed
+        del base_ast, other
+
+
+def _merge_plan(
+    base_ast: RedBaron, current_ast: RedBaron, other_ast: RedBaron, stats: MergeStats | None
+) -> None:
+    changes = _diff_plan(base_ast, other_ast)
+    # The changes hold copies or references of the nodes they need,
+    # drop ours so that the rest of the trees can be collected
+    del base_ast, other_ast
+    _apply_plan(current_ast, changes, stats)
+
+
+def _diff_plan(base_ast: RedBaron, other_ast: RedBaron) -> list[Action]:
+    from gitmergepy.differ import compute_diff_iterables
+
     changes = compute_diff_iterables(base_ast, other_ast)
+    checkpoint("diff")
+    return changes
+
+
+def _apply_plan(current_ast: RedBaron, changes: list[Action], stats: MergeStats | None) -> None:
+    from gitmergepy.applier import apply_changes, compact_hidden, plan_size
+    from gitmergepy.conflicts import add_conflicts
+
+    if stats is not None:
+        actions_count, plan_bytes = plan_size(changes)
+        stats.plan_actions += actions_count
+        stats.plan_bytes += plan_bytes
     logging.info("=========== applying changes")
     conflicts = apply_changes(current_ast, changes)
+    del changes
+    checkpoint("apply")
     add_conflicts(current_ast, conflicts)
+    # The next plan, if any, sees the merged tree as its starting point
+    compact_hidden(current_ast)
+
+
+def check_files(
+    base_file: str, current_file: str, other_file: str, stop_at_first: bool = False
+) -> ConflictReport:
+    """Predict the conflicts of a three-way merge without writing anything.
+
+    Args:
+        base_file: Path to the common ancestor file
+        current_file: Path to the current version (left untouched)
+        other_file: Path to the other version to merge
+        stop_at_first: Stop as soon as one conflict is found
+
+    Returns:
+        The report of the conflicts the merge would produce.
+    """
+    base_ast = parse_file(base_file)
+    current_ast = parse_file(current_file)
+    other_ast = parse_file(other_file)
+    return check_ast(base_ast, current_ast, other_ast, stop_at_first=stop_at_first)
+
+
+def check_ast(
+    base_ast: RedBaron, current_ast: RedBaron, other_ast: RedBaron, stop_at_first: bool = False
+) -> ConflictReport:
+    """Run the diff and apply steps of merge_ast only to collect conflicts.
+
+    No conflict markers are inserted and the final tree is not rendered.
+    The changed parts are still re-parsed like in merge_ast, so a merge
+    that would produce invalid code fails here too. current_ast is
+    modified in place and should be discarded.
+
+    Args:
+        base_ast: The common ancestor AST
+        current_ast: The current version AST
+        other_ast: The other version AST to merge from
+        stop_at_first: Stop as soon as one conflict is found
+    """
+    from gitmergepy.applier import apply_changes
+    from gitmergepy.conflicts import (
+        ConflictReport,
+        FirstConflict,
+        add_conflicts,
+        collect_conflicts,
+    )
+    from gitmergepy.differ import compute_diff_iterables
+
+    report = ConflictReport(insert_markers=False, stop_at_first=stop_at_first)
+    with collect_conflicts(report):
+        try:
+            changes = compute_diff_iterables(base_ast, other_ast)
+            conflicts = apply_changes(current_ast, changes)
+            add_conflicts(current_ast, conflicts)
+        except FirstConflict:
+            pass
+    return report
+
+
+def resolve_main(args: list[str]) -> int:
+    """Entry point for `gitmergepy resolve`.
+
+    Merges all the conflicted Python files of a stopped merge or rebase
+    and stages the clean results.
+
+    Returns:
+        0 if all files were resolved, 1 otherwise.
+    """
+    from gitmergepy.resolve import GitError, resolve_repository
+
+    parser = argparse.ArgumentParser(prog="gitmergepy resolve")
+    parser.add_argument("-j", "--jobs", type=int, help="number of parallel merges")
+    parser.add_argument(
+        "--no-stage", dest="stage", action="store_false", help="do not stage resolved files"
+    )
+    options = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    try:
+        results = resolve_repository(jobs=options.jobs, stage=options.stage)
+    except GitError as e:
+        logging.error("git failed: %s", e)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+
+    for result in results:
+        if result.clean:
+            status = "resolved"
+        elif result.error:
+            status = "failed: %s" % result.error
+        else:
+            status = "conflicts"
+        sys.stdout.write("%s: %s\n" % (result.path, status))
+    return 0 if all(result.clean for result in results) else 1
+
+
+def bench_replay_main(args: list[str]) -> int:
+    """Entry point for `gitmergepy bench-replay`.
+
+    Redoes the merges of a repository history and reports the outcome,
+    the time and the memory of each file merge.
+
+    Returns:
+        0 once the replay is done, 2 if git failed.
+    """
+    from gitmergepy.replay import replay_repository, summarize, write_report
+    from gitmergepy.resolve import GitError
+
+    parser = argparse.ArgumentParser(prog="gitmergepy bench-replay")
+    parser.add_argument("repository", help="path to a local clone")
+    parser.add_argument("--rev", default="HEAD", help="where to start walking the history")
+    parser.add_argument("--max-merges", type=int, metavar="N", help="replay the last N merges")
+    parser.add_argument("-o", "--output", help="write the report to this .json or .csv file")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="measure the peak memory with tracemalloc, slower",
+    )
+    parser.add_argument("--chunked", action="store_true", help="use the chunked merge mode")
+    _add_budget_arguments(parser)
+    options = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    # Keep the merge debug output out of the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        results = replay_repository(
+            options.repository,
+            rev=options.rev,
+            max_merges=options.max_merges,
+            budget_factory=lambda: _budget_from_options(options),
+            chunked=options.chunked,
+            trace_memory=options.trace_memory,
+        )
+    except GitError as e:
+        logging.error("git failed: %s", e)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+
+    if options.output:
+        write_report(results, options.output)
+    sys.stdout.write(json.dumps(summarize(results), indent=2) + "\n")
+    return 0
+
+
+def cache_main(args: list[str]) -> int:
+    """Entry point for `gitmergepy cache`.
+
+    Shows the size of the plan and outcome caches or empties them.
+
+    Returns:
+        0
+    """
+    from gitmergepy.cache import OutcomeCache, PlanCache
+
+    parser = argparse.ArgumentParser(prog="gitmergepy cache")
+    parser.add_argument("action", choices=("info", "clear"))
+    parser.add_argument("--only", choices=("plans", "outcomes"), help="default: both caches")
+    options = parser.parse_args(args)
+
+    caches = [PlanCache(), OutcomeCache()]
+    for cache in caches:
+        if options.only and cache.name != options.only:
+            continue
+        if options.action == "info":
+            info = cache.info()
+            sys.stdout.write(
+                "%s: %d entries, %d bytes of %d in %s\n"
+                % (cache.name, info["entries"], info["size"], info["max_size"], info["directory"])
+            )
+        else:
+            sys.stdout.write("%s: %d entries deleted\n" % (cache.name, cache.clear()))
+    return 0
+
+
+COMMANDS = {
+    "check": check_main,
+    "resolve": resolve_main,
+    "bench-replay": bench_replay_main,
+    "cache": cache_main,
+}
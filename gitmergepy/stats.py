@@ -0,0 +1,72 @@
+"""Statistics about how a merge was performed."""
+
+from __future__ import annotations
+
+from typing import Any
+
+AST_STRATEGY = "ast"
+TEXT_STRATEGY = "text"
+
+
+class MergeStats:
+    def __init__(self) -> None:
+        self.strategy = AST_STRATEGY
+        self.fallback_reason = ""
+        self.conflicts = 0
+        self.elapsed = 0.0
+        self.ops: dict[str, int] = {}
+        # Hot path counters, see metrics.Metrics
+        self.counters: dict[str, int] = {}
+        # Peak resident memory sampled during the merge, in bytes
+        self.peak_memory = 0
+        # Number of top-level definitions left out of the AST merge
+        self.collapsed = 0
+        # Number of actions of the merge plan and their size in bytes
+        self.plan_actions = 0
+        self.plan_bytes = 0
+        # Whether the changes of current were applied to other
+        self.swapped = False
+        # Number of merge plans read from the plan cache, and of plans
+        # that could not be stored in it
+        self.cached_plans = 0
+        self.skipped_plans = 0
+        # Whether the result was read from the outcome cache
+        self.cached_outcome = False
+
+    def __repr__(self) -> str:
+        return "<%s strategy=%r conflicts=%d elapsed=%.3f>" % (
+            self.__class__.__name__,
+            self.strategy,
+            self.conflicts,
+            self.elapsed,
+        )
+
+    @property
+    def fell_back(self) -> bool:
+        return self.strategy != AST_STRATEGY
+
+    def add_plan_stats(self, other: MergeStats) -> None:
+        """Add the plan counters of an attempt merged into other."""
+        self.collapsed += other.collapsed
+        self.plan_actions += other.plan_actions
+        self.plan_bytes += other.plan_bytes
+        self.cached_plans += other.cached_plans
+        self.skipped_plans += other.skipped_plans
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "fallback_reason": self.fallback_reason,
+            "conflicts": self.conflicts,
+            "elapsed": round(self.elapsed, 6),
+            "ops": dict(self.ops),
+            "counters": dict(self.counters),
+            "peak_memory": self.peak_memory,
+            "collapsed": self.collapsed,
+            "plan_actions": self.plan_actions,
+            "plan_bytes": self.plan_bytes,
+            "swapped": self.swapped,
+            "cached_plans": self.cached_plans,
+            "skipped_plans": self.skipped_plans,
+            "cached_outcome": self.cached_outcome,
+        }
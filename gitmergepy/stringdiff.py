@@ -0,0 +1,106 @@
+"""Character level diff and patch of string literals."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from .budget import charge
+
+if TYPE_CHECKING:
+    from diff_match_patch import patch_obj
+
+# Seconds diff_match_patch may spend looking for a minimal diff of one string
+DIFF_TIMEOUT = 0.1
+# Above this combined length in characters, only the common prefix and
+# suffix are kept and the middle is replaced as a whole
+MAX_DIFF_SIZE = 100_000
+
+
+class StringDiffer:
+    """Computes and applies the patches of string literals.
+
+    A single diff_match_patch instance is reused and the patches are kept
+    as objects between the diff and the apply.
+
+    Args:
+        timeout: Time limit of the diff of one string, in seconds
+        max_size: Combined length of the strings above which the diff is
+            reduced to the common prefix and suffix
+    """
+
+    def __init__(self, timeout: float = DIFF_TIMEOUT, max_size: int = MAX_DIFF_SIZE) -> None:
+        from diff_match_patch import diff_match_patch
+
+        self.dmp = diff_match_patch()
+        self.dmp.Diff_Timeout = timeout
+        self.max_size = max_size
+
+    def __repr__(self) -> str:
+        return "<%s timeout=%r max_size=%r>" % (
+            self.__class__.__name__,
+            self.dmp.Diff_Timeout,
+            self.max_size,
+        )
+
+    def _trimmed_diffs(self, old: str, new: str) -> list[tuple[int, str]]:
+        prefix_length = self.dmp.diff_commonPrefix(old, new)
+        suffix_length = self.dmp.diff_commonSuffix(old[prefix_length:], new[prefix_length:])
+        old_end = len(old) - suffix_length
+        new_end = len(new) - suffix_length
+        diffs = [
+            (self.dmp.DIFF_EQUAL, old[:prefix_length]),
+            (self.dmp.DIFF_DELETE, old[prefix_length:old_end]),
+            (self.dmp.DIFF_INSERT, new[prefix_length:new_end]),
+            (self.dmp.DIFF_EQUAL, old[old_end:]),
+        ]
+        return [(op, text) for op, text in diffs if text]
+
+    def make_patches(self, old: str, new: str) -> list[patch_obj]:
+        if old == new:
+            return []
+        charge("diff")
+        if len(old) + len(new) > self.max_size:
+            return self.dmp.patch_make(old, self._trimmed_diffs(old, new))
+        return self.dmp.patch_make(old, new)
+
+    def apply_patches(self, patches: list[patch_obj], text: str) -> str:
+        if not patches:
+            return text
+        patched, _ = self.dmp.patch_apply(patches, text)
+        return patched
+
+
+# Created on first use, most merges do not change any string
+_differ: StringDiffer | None = None
+
+
+def get_differ() -> StringDiffer:
+    """Return the active differ, creating the default one if needed."""
+    global _differ  # pylint: disable=global-statement
+    if _differ is None:
+        _differ = StringDiffer()
+    return _differ
+
+
+@contextmanager
+def use_differ(differ: StringDiffer) -> Iterator[StringDiffer]:
+    """Diff and patch the strings with differ while active."""
+    global _differ  # pylint: disable=global-statement
+    previous_differ = _differ
+    _differ = differ
+    try:
+        yield differ
+    finally:
+        _differ = previous_differ
+
+
+def make_patches(old: str, new: str) -> list[patch_obj]:
+    """Return the patches turning old into new."""
+    return get_differ().make_patches(old, new)
+
+
+def apply_patches(patches: list[patch_obj], text: str) -> str:
+    """Apply patches to text, as closely as possible if it changed."""
+    return get_differ().apply_patches(patches, text)
@@ -0,0 +1,100 @@
+"""Line-based three-way merge, used when the AST merge gives up."""
+
+from __future__ import annotations
+
+from difflib import SequenceMatcher
+
+CONFLICT_START = "<<<<<<< current\n"
+CONFLICT_SEPARATOR = "=======\n"
+CONFLICT_END = ">>>>>>> other\n"
+
+
+def _matches(base: list[str], other: list[str]) -> dict[int, int]:
+    """Map the base lines that are kept in other to their index in other."""
+    matcher = SequenceMatcher(None, base, other, autojunk=False)
+    matches = {}
+    for base_index, other_index, size in matcher.get_matching_blocks():
+        for offset in range(size):
+            matches[base_index + offset] = other_index + offset
+    return matches
+
+
+def _merge_chunk(base: list[str], current: list[str], other: list[str]) -> tuple[list[str], bool]:
+    if current == base or current == other:
+        return other, True
+    if other == base:
+        return current, True
+    lines = [CONFLICT_START]
+    lines += _with_endl(current)
+    lines += [CONFLICT_SEPARATOR]
+    lines += _with_endl(other)
+    lines += [CONFLICT_END]
+    return lines, False
+
+
+def _with_endl(lines: list[str]) -> list[str]:
+    if lines and not lines[-1].endswith("\n"):
+        return lines[:-1] + [lines[-1] + "\n"]
+    return lines
+
+
+def merge_lines(base: str, current: str, other: str) -> tuple[str, int]:
+    """Merge the line changes from base to other into current.
+
+    Regions changed on both sides are written between git style conflict
+    markers.
+
+    Returns:
+        The merged text and the number of conflicts.
+    """
+    base_lines = base.splitlines(keepends=True)
+    current_lines = current.splitlines(keepends=True)
+    other_lines = other.splitlines(keepends=True)
+
+    current_matches = _matches(base_lines, current_lines)
+    other_matches = _matches(base_lines, other_lines)
+    # Base lines present in both versions are the synchronisation points
+    stable_lines = sorted(set(current_matches) & set(other_matches))
+
+    output: list[str] = []
+    conflicts = 0
+    base_index = current_index = other_index = 0
+    for stable_index in stable_lines + [len(base_lines)]:
+        if stable_index < len(base_lines):
+            current_end = current_matches[stable_index]
+            other_end = other_matches[stable_index]
+        else:
+            current_end = len(current_lines)
+            other_end = len(other_lines)
+
+        if stable_index > base_index or current_end > current_index or other_end > other_index:
+            lines, chunk_clean = _merge_chunk(
+                base_lines[base_index:stable_index],
+                current_lines[current_index:current_end],
+                other_lines[other_index:other_end],
+            )
+            output += lines
+            if not chunk_clean:
+                conflicts += 1
+
+        if stable_index < len(base_lines):
+            output.append(base_lines[stable_index])
+        base_index = stable_index + 1
+        current_index = current_end + 1
+        other_index = other_end + 1
+
+    return "".join(output), conflicts
+
+
+def conflict_ranges(text: str) -> list[tuple[int, int]]:
+    """Return the 1-based first and last lines of the conflicts of a
+    merge_lines() output."""
+    ranges = []
+    start = None
+    for number, line in enumerate(text.splitlines(keepends=True), start=1):
+        if line == CONFLICT_START:
+            start = number
+        elif line == CONFLICT_END and start is not None:
+            ranges.append((start, number))
+            start = None
+    return ranges
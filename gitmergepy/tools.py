@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 from typing import Any, TypeVar
 
 from redbaron import nodes
 from redbaron.base_nodes import Node
 from redbaron.proxy_list import DotProxyList, ProxyList
 
+from .metrics import SAME_EL, count
+
 FIRST = object()
 LAST = object()
 INDENT = "."
@@ -63,12 +65,15 @@ def short_context(context: Any) -> str:
     if context is LAST:
         return "last"
 
-    from .context import AfterContext
+    from .context import AfterContext, ContextEl
+
+    def display(el: Any) -> str:
+        return str(el) if isinstance(el, ContextEl) else short_display_el(el)
 
     if isinstance(context, AfterContext):
-        return "before " + "|".join(short_display_el(el) for el in context)
+        return "before " + "|".join(display(el) for el in context)
 
-    return "|".join(short_display_el(el) for el in reversed(context))
+    return "|".join(display(el) for el in reversed(context))
 
 
 def id_from_el(arg: Node | None) -> str:
@@ -108,6 +113,11 @@ def id_from_el(arg: Node | None) -> str:
             return arg.dumps()
 
 
+def import_key(target: Node) -> tuple[str, str]:
+    """Return the imported name and its alias of a from import target."""
+    return target.value, getattr(target, "target", None) or ""
+
+
 def id_from_arg(arg: Node) -> str:
     """Extract identifier from a function argument node."""
     match arg:
@@ -161,13 +171,13 @@ def diff_list(
     Returns:
         Tuple of (to_add, to_remove) lists.
     """
-    left = list(left)
-    right = list(right)
-    left_keys = set(key_getter(i) for i in left)
-    right_keys = set(key_getter(i) for i in right)
+    left_keyed = [(key_getter(el), el) for el in left]
+    right_keyed = [(key_getter(el), el) for el in right]
+    left_keys = set(key for key, _ in left_keyed)
+    right_keys = set(key for key, _ in right_keyed)
 
-    to_add = [el for el in right if key_getter(el) not in left_keys]
-    to_remove = [el for el in left if key_getter(el) not in right_keys]
+    to_add = [el for key, el in right_keyed if key not in left_keys]
+    to_remove = [el for key, el in left_keyed if key not in right_keys]
 
     return to_add, to_remove
 
@@ -183,17 +193,14 @@ def changed_in_list(
     Returns:
         List of (left_el, right_el) tuples for changed elements.
     """
-    left_keys = set(key_getter(i) for i in left)
-    right_keys = set(key_getter(i) for i in right)
-    both_keys = left_keys & right_keys
+    # The last element wins for duplicated keys
+    left_els_map = {key_getter(el): el for el in left}
+    rights_els_map = {key_getter(el): el for el in right}
 
     changed = []
-    left_els_map = {key_getter(el): el for el in left if key_getter(el) in both_keys}
-    rights_els_map = {key_getter(el): el for el in right if key_getter(el) in both_keys}
-
     for key, left_el in left_els_map.items():
-        right_el = rights_els_map[key]
-        if value_getter(left_el) != value_getter(right_el):
+        right_el = rights_els_map.get(key)
+        if right_el is not None and value_getter(left_el) != value_getter(right_el):
             changed.append((left_el, right_el))
 
     return changed
@@ -270,6 +277,7 @@ def with_parent(tree: ProxyList, el: Node) -> Node:
 
 def same_el(left: Node | None, right: Node | None, discard_indentation: bool = True) -> bool:
     """Check if two elements are the same (by dumps comparison)."""
+    count(SAME_EL)
     if left is None and right is None:
         return True
 
@@ -285,6 +293,31 @@ def same_el(left: Node | None, right: Node | None, discard_indentation: bool = T
     return left.dumps() == right.dumps()
 
 
+def is_tombstone(el: Node, old_tree: bool = False) -> bool:
+    """Whether el is left out of a view of the tree.
+
+    The current tree hides the removed elements instead of deleting them,
+    the old tree is the current tree without the added elements.
+    """
+    return el.new if old_tree else el.hidden
+
+
+def visible_els(
+    tree: ProxyList,
+    start: int = 0,
+    stop: int | None = None,
+    reverse: bool = False,
+    old_tree: bool = False,
+) -> Iterator[Node]:
+    """Iterate lazily over the elements of tree[start:stop] that are not
+    tombstones, from the end if reverse is set."""
+    indexes = range(start, len(tree) if stop is None else stop)
+    for index in reversed(indexes) if reverse else indexes:
+        el = tree[index]
+        if not is_tombstone(el, old_tree):
+            yield el
+
+
 def empty_lines(els: list[Node]) -> bool:
     """Check if all elements are empty/newline nodes."""
     return all(isinstance(el, (nodes.EmptyLineNode, nodes.EndlNode)) for el in els)
@@ -0,0 +1,69 @@
+"""Write merge results without leaving a half written file behind."""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import stat
+import tempfile
+from collections.abc import Iterable
+
+
+def _default_mode() -> int:
+    """Mode of a new file, as open() would create it."""
+    # The umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_if_changed(
+    filename: str, chunks: str | Iterable[str], original: str | None = None
+) -> bool:
+    """Write chunks to filename through a temporary file renamed over it.
+
+    The chunks are written to a temporary file in the same directory,
+    which then atomically replaces filename, keeping its permissions, or
+    getting the default ones if filename does not exist. If the text
+    written equals original, the temporary file is dropped and filename
+    is left untouched, mtime included. A whole text equal to original is
+    not written at all.
+
+    Returns:
+        Whether filename was replaced.
+    """
+    if isinstance(chunks, str):
+        if chunks == original:
+            return False
+        chunks = [chunks]
+
+    # Replace the target of a symlink, not the symlink itself
+    filename = os.path.realpath(filename)
+    directory, name = os.path.split(filename)
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix=".%s." % name, suffix=".tmp")
+    try:
+        unchanged = original is not None
+        position = 0
+        with os.fdopen(fd, "w") as f:
+            for chunk in chunks:
+                if unchanged:
+                    unchanged = original.startswith(chunk, position)
+                position += len(chunk)
+                f.write(chunk)
+
+        if unchanged and position == len(original):
+            os.unlink(tmp_filename)
+            return False
+
+        try:
+            mode = stat.S_IMODE(os.stat(filename).st_mode)
+        except FileNotFoundError:
+            # mkstemp creates the file readable by its owner only
+            mode = _default_mode()
+        os.chmod(tmp_filename, mode)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_filename)
+        raise
+    return True
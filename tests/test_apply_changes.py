@@ -17,7 +17,7 @@ from gitmergepy.actions import (
     RemoveWith,
     SameEl,
 )
-from gitmergepy.applier import apply_changes
+from gitmergepy.applier import apply_changes, compact_hidden, plan_size
 from gitmergepy.context import AfterContext
 from gitmergepy.differ import compute_diff
 
@@ -2283,3 +2283,73 @@ def fun():
     # cache ignored
 """
     _test_apply_changes(base, current)
+
+
+def test_plan_size():
+    base = "def fun():\n    a = 1\n"
+    other = "def fun():\n    a = 2\n    b = 1\n"
+    changes = compute_diff(RedBaron(base), RedBaron(other))
+    count, size = plan_size(changes)
+    # The change of fun and the changes nested in it
+    assert count > len(changes)
+    assert size > 0
+    assert not hasattr(changes[0], "__dict__")
+
+
+def test_compact_hidden():
+    tree = RedBaron("a = 1\n\n\ndef fun():\n    b = 1\n    c = 2\n")
+    tree.hide(tree[0])
+    fun = tree.find("def")
+    fun.value.hide(fun.value[0])
+    output = tree.dumps()
+    assert compact_hidden(tree) == 2
+    assert tree.dumps() == output
+    assert not any(el.hidden for el in tree)
+
+
+def test_dict_key_index():
+    from gitmergepy.matcher import dict_key_index, find_key
+
+    base = "x = {'a': 1, 'b': 2}\n"
+    other = "x = {'a': 1, 'c': 3, 'b': 2}\n"
+    tree = RedBaron(base)
+    dict_node = tree[0].value
+    new_key = RedBaron(other)[0].value.value[1].key
+    assert find_key(new_key, dict_node) is None
+
+    apply_changes(tree, compute_diff(RedBaron(base), RedBaron(other)))
+    assert tree.dumps() == other
+    assert find_key(new_key, tree[0].value).value.value == "3"
+    index = dict_key_index(tree[0].value)
+    assert index.size == len(tree[0].value.value) == 3
+    assert index.positions == {"'a'": 0, "'c'": 1, "'b'": 2}
+
+
+def test_dict_key_index_changed_key():
+    from gitmergepy.matcher import dict_key_index, find_key
+
+    tree = RedBaron("x = {'a': 1, 'b': 2}\n")
+    dict_node = tree[0].value
+    index = dict_key_index(dict_node)
+    # Changed behind the back of the index, same number of items
+    dict_node.value[0].key = "'z'"
+    assert find_key(RedBaron("'a'")[0], dict_node) is None
+    assert find_key(RedBaron("'z'")[0], dict_node) is dict_node.value[0]
+    assert index.positions == {"'z'": 0, "'b'": 1}
+
+
+def test_call_index():
+    from gitmergepy.matcher import call_index, call_key
+
+    base = "register('a', f)\nregister('b', g)\nsetup()\n"
+    other = "register('a', f)\nregister('b', h)\nsetup()\nregister('c', i)\n"
+    tree = RedBaron(base)
+    index = call_index(tree)
+    assert index.calls_count() == 3
+    assert index.find_all(("register", 1)) == [tree[0], tree[1]]
+    assert call_key(tree[2]) == ("setup", 1)
+
+    apply_changes(tree, compute_diff(RedBaron(base), RedBaron(other)))
+    assert tree.dumps() == other
+    assert call_index(tree).calls_count() == 4
+    assert len(call_index(tree).find_all(("register", 1))) == 3
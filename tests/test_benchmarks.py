@@ -0,0 +1,82 @@
+import ast
+import json
+
+from benchmarks.generators import ModuleSpec, generate_versions
+from benchmarks.scaling import (
+    SCENARIOS,
+    compare,
+    environment,
+    fit_exponent,
+    main,
+    save_baseline,
+)
+from benchmarks.startup import deferred_imports, import_timings, parse_importtime
+
+
+def test_generate_versions():
+    spec = ModuleSpec(functions=20, classes=2, imports=5, dict_size=10, depth=3)
+    base, current, other = generate_versions(spec, density=0.1)
+    for source in (base, current, other):
+        ast.parse(source)
+    assert base != current != other
+    assert "current_function_0" in current
+    assert "other_key_0" in other
+
+
+def test_generate_versions_seed():
+    spec = ModuleSpec(functions=20)
+    assert generate_versions(spec, seed=1) == generate_versions(spec, seed=1)
+
+
+def test_fit_exponent():
+    assert round(fit_exponent([10, 20, 40], [1.0, 4.0, 16.0]), 6) == 2
+    assert round(fit_exponent([10, 20, 40], [1.0, 2.0, 4.0]), 6) == 1
+
+
+def test_compare():
+    baseline = {"scenarios": {"dict": {"exponents": {"diff": 1.0, "apply": 1.1}}}}
+    results = {"dict": {"diff": 1.2, "apply": 2.0}, "depth": {"diff": 3.0}}
+    assert compare(results, baseline, tolerance=0.3) == ["dict/apply: exponent 2.00, baseline 1.10"]
+
+
+def test_save_baseline(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    save_baseline(path, {"dict": {"diff": 1.004, "apply": 1.1}}, 0.2, [10, 20])
+    save_baseline(path, {"depth": {"diff": 1.0}}, 0.4, None)
+    with open(path) as f:
+        baseline = json.load(f)
+    assert baseline["environment"] == environment()
+    assert baseline["tolerance"] == 0.4
+    assert baseline["scenarios"]["dict"] == {
+        "sizes": [10, 20],
+        "exponents": {"diff": 1.0, "apply": 1.1},
+    }
+    assert baseline["scenarios"]["depth"]["sizes"] == SCENARIOS["depth"][1]
+
+
+def test_scaling_without_baseline(tmp_path, capsys):
+    args = ["--scenario", "dict", "--sizes", "10,20", "--repeat", "1"]
+    assert main([*args, "--baseline", str(tmp_path / "baseline.json")]) == 2
+    assert "no baseline" in capsys.readouterr().out
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   redbaron.nodes\n"
+        "import time:        80 |        200 | redbaron\n"
+        "import time:        50 |        50 | gitmergepy.runner\n"
+    )
+    timings = parse_importtime(output)
+    assert timings == {
+        "redbaron.nodes": (120, 120),
+        "redbaron": (80, 200),
+        "gitmergepy.runner": (50, 50),
+    }
+    assert deferred_imports(timings) == ["redbaron", "redbaron.nodes"]
+
+
+def test_startup_defers_parser():
+    timings = import_timings("gitmergepy.runner")
+    assert "gitmergepy.runner" in timings
+    assert deferred_imports(timings) == []
@@ -0,0 +1,31 @@
+import pytest
+
+from gitmergepy.budget import Budget, BudgetExceeded, charge, checkpoint, enforce, memory_usage
+
+
+def test_charge():
+    budget = Budget()
+    with enforce(budget):
+        charge("diff")
+        charge("similarity", 3)
+    charge("diff")
+    assert budget.ops == {"diff": 1, "similarity": 3}
+    assert budget.total_ops == 4
+
+
+def test_max_ops():
+    budget = Budget(max_ops=2)
+    with enforce(budget):
+        charge("diff", 2)
+        with pytest.raises(BudgetExceeded):
+            charge("diff")
+
+
+def test_max_memory():
+    if memory_usage() is None:
+        pytest.skip("memory usage not available")
+    budget = Budget(max_memory=1)
+    with enforce(budget):
+        with pytest.raises(BudgetExceeded, match="during parse"):
+            checkpoint("parse")
+    assert budget.peak_memory > 0
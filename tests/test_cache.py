@@ -0,0 +1,88 @@
+import os
+
+from gitmergepy.cache import CACHE_DIR_ENV, OutcomeCache, PlanCache, cache_dir, content_key
+
+
+def test_content_key():
+    assert content_key("a", "b") == content_key("a", "b")
+    assert content_key("a", "b") != content_key("b", "a")
+    # The texts are length prefixed
+    assert content_key("ab", "c") != content_key("a", "bc")
+
+
+def test_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    assert cache_dir() == str(tmp_path)
+    monkeypatch.delenv(CACHE_DIR_ENV)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert cache_dir() == os.path.join(str(tmp_path), "gitmergepy")
+
+
+def test_plan_cache(tmp_path):
+    plan_cache = PlanCache(str(tmp_path))
+    assert plan_cache.get("base", "other") is None
+    assert plan_cache.put("base", "other", [("change", 1)])
+    assert plan_cache.get("base", "other") == [("change", 1)]
+    assert plan_cache.get("base", "current") is None
+
+
+def test_plan_cache_not_picklable(tmp_path):
+    plan_cache = PlanCache(str(tmp_path))
+    assert not plan_cache.put("base", "other", [lambda: None])
+    assert plan_cache.entries() == []
+
+
+def test_plan_cache_unreadable(tmp_path):
+    plan_cache = PlanCache(str(tmp_path))
+    plan_cache.put("base", "other", [1])
+    with open(plan_cache.path("base", "other"), "wb") as f:
+        f.write(b"truncated")
+    assert plan_cache.get("base", "other") is None
+    assert plan_cache.entries() == []
+
+
+def test_plan_cache_prune(tmp_path):
+    plan_cache = PlanCache(str(tmp_path), max_size=3500)
+    for index in range(3):
+        plan_cache.put("base", "other %d" % index, ["x" * 1000])
+        os.utime(plan_cache.path("base", "other %d" % index), (index, index))
+    # Reading the oldest plan makes it the most recently used
+    assert plan_cache.get("base", "other 0") is not None
+    plan_cache.put("base", "other 3", ["x" * 1000])
+    assert plan_cache.get("base", "other 1") is None
+    assert plan_cache.get("base", "other 0") is not None
+    assert plan_cache.get("base", "other 3") is not None
+
+
+def test_outcome_cache(tmp_path):
+    outcome_cache = OutcomeCache(str(tmp_path))
+    key = ("options", "base", "current", "other")
+    assert outcome_cache.get(key) is None
+    conflicts = [{"reason": "el not found", "change": "", "location": "f", "start": 1, "end": 4}]
+    assert outcome_cache.put(key, "merged\n", False, conflicts)
+    assert outcome_cache.get(key) == {"output": "merged\n", "clean": False, "conflicts": conflicts}
+    assert outcome_cache.get(("options", "base", "other", "current")) is None
+
+
+def test_cache_info_clear(tmp_path):
+    outcome_cache = OutcomeCache(str(tmp_path))
+    outcome_cache.put(("a",), "a\n", True, [])
+    outcome_cache.put(("b",), "b\n", True, [])
+    info = outcome_cache.info()
+    assert info["entries"] == 2
+    assert info["size"] == sum(entry.stat().st_size for entry in outcome_cache.entries())
+    assert outcome_cache.clear() == 2
+    assert outcome_cache.info()["entries"] == 0
+
+
+def test_plan_cache_max_plan_size(tmp_path):
+    plan_cache = PlanCache(str(tmp_path), max_plan_size=100)
+    assert not plan_cache.put("base", "other", ["x" * 1000])
+    assert plan_cache.entries() == []
+
+
+def test_plan_cache_untrusted(tmp_path):
+    plan_cache = PlanCache(str(tmp_path))
+    plan_cache.put("base", "other", [1])
+    os.chmod(plan_cache.path("base", "other"), 0o666)
+    assert plan_cache.get("base", "other") is None
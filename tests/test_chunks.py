@@ -0,0 +1,89 @@
+from gitmergepy.chunks import (
+    PLACEHOLDER_PREFIX,
+    collapse_unchanged,
+    edit_sizes,
+    expand,
+    split_chunks,
+)
+
+BASE = """import os
+
+
+@decorator
+def unchanged():
+    return 1
+
+
+def changed():
+    return 2
+"""
+CURRENT = BASE.replace("return 2", "return 3")
+OTHER = BASE + "\n\ndef added():\n    pass\n"
+
+
+def test_split_chunks():
+    chunks = split_chunks(BASE)
+    assert chunks is not None
+    assert [chunk.text for chunk in chunks] == [
+        "import os\n\n\n",
+        "@decorator\ndef unchanged():\n    return 1\n\n\n",
+        "def changed():\n    return 2\n",
+    ]
+    assert [chunk.collapsible for chunk in chunks] == [False, True, True]
+    assert "".join(chunk.text for chunk in chunks) == BASE
+
+
+def test_split_chunks_no_end_of_line():
+    chunks = split_chunks("def f():\n    pass")
+    assert chunks is not None
+    assert not chunks[0].collapsible
+
+
+def test_split_chunks_syntax_error():
+    assert split_chunks("def f(:\n") is None
+
+
+def test_collapse_unchanged():
+    collapsed = collapse_unchanged(BASE, CURRENT, OTHER)
+    assert collapsed is not None
+    (base, current, other), expansions = collapsed
+    assert len(expansions) == 1
+    placeholder = next(iter(expansions))
+    assert placeholder.startswith(PLACEHOLDER_PREFIX)
+    assert base == "import os\n\n\n" + placeholder + "def changed():\n    return 2\n"
+    assert "def unchanged" not in current + other
+    assert expand(other, expansions) == OTHER
+
+
+def test_collapse_unchanged_several_others():
+    second_other = OTHER.replace("import os", "import sys")
+    collapsed = collapse_unchanged(BASE, CURRENT, OTHER, second_other)
+    assert collapsed is not None
+    sources, expansions = collapsed
+    assert len(sources) == 4
+    assert len(expansions) == 1
+    assert expand(sources[3], expansions) == second_other
+
+
+def test_expand_moved_placeholder():
+    (_, _, other), expansions = collapse_unchanged(BASE, CURRENT, OTHER)
+    placeholder = next(iter(expansions))
+    # Lost
+    assert expand(other.replace(placeholder, ""), expansions) is None
+    # Duplicated
+    assert expand(other + placeholder, expansions) is None
+    # Reindented
+    assert expand(other.replace(placeholder, "    " + placeholder), expansions) is None
+    # Attached to a statement
+    assert expand(other.replace(placeholder, "x = 1  " + placeholder), expansions) is None
+
+
+def test_collapse_unchanged_nothing():
+    assert collapse_unchanged("a = 1\n", "a = 2\n", "a = 3\n") is None
+
+
+def test_edit_sizes():
+    # CURRENT changes a two lines function, OTHER adds one after it,
+    # with the blank lines in between counted as a change of the last one
+    assert edit_sizes(BASE, BASE, CURRENT, OTHER) == [0, 4, 8]
+    assert edit_sizes(BASE, "def f(:\n") is None
@@ -1,6 +1,15 @@
+import gc
+import weakref
+
 from redbaron import RedBaron
 
-from gitmergepy.context import AfterContext, BeforeContext, find_context
+from gitmergepy.context import (
+    AfterContext,
+    BeforeContext,
+    ContextEl,
+    find_context,
+    fingerprint,
+)
 
 
 def test_match_after_context():
@@ -122,3 +131,59 @@ def fun():
     decorator1 = fun.decorators[0]
     context = BeforeContext([decorator1])
     assert find_context(fun.decorators, context) == [1]
+
+
+def test_fingerprint():
+    tree = RedBaron("def fun():\n    pass\ndef fun():\n    return 1\nx = 1\nx = 2\n")
+    assert fingerprint(tree[0]) == fingerprint(tree[1])
+    assert fingerprint(tree[2]) == fingerprint(tree[3])
+    assert fingerprint(tree[0]) != fingerprint(tree[2])
+    assert fingerprint(None) == (None,)
+
+
+def test_context_fingerprints_updated():
+    tree = RedBaron("a = 1\nb = 2\n")
+    context = BeforeContext([tree[0]])
+    assert context.fingerprints == (fingerprint(tree[0]),)
+    context.insert(0, tree[1])
+    assert context.fingerprints == (fingerprint(tree[1]), fingerprint(tree[0]))
+    copy = context.copy()
+    assert isinstance(copy, BeforeContext)
+    del copy[0]
+    assert copy.fingerprints == (fingerprint(tree[0]),)
+    assert len(context.fingerprints) == 2
+
+
+def test_context_keeps_no_node():
+    other = RedBaron("with open(f) as fd:\n    fd.read()\n    fd.close()\n")
+    context = BeforeContext([other[0], None])
+    assert all(isinstance(el, ContextEl) for el in context[:-1])
+    tree_ref = weakref.ref(other)
+    del other
+    gc.collect()
+    assert tree_ref() is None
+
+    # The fuzzy fallback still works without the tree: same body, other file
+    tree = RedBaron("with open(g) as fd:\n    fd.read()\n    fd.close()\nx = 1\n")
+    assert find_context(tree, context) == [1]
+    assert context != BeforeContext([tree[0], None])
+    same = RedBaron("with open(f) as fd:\n    fd.read()\n    fd.close()\n")
+    assert context == BeforeContext([same[0], None])
+
+
+def test_find_context_fuzzy_match():
+    # Same call with an extra argument, matched by same_el_guess
+    tree = RedBaron("fun(a, b, c)\nx = 1\n")
+    other = RedBaron("fun(a, b, c, d)\n")
+    context = BeforeContext([other[0]])
+    assert find_context(tree, context) == [1]
+
+
+def test_match_before_context_skips_hidden():
+    tree = RedBaron("a = 1\nprint(b)\nc = 3\nd = 4\n")
+    context = BeforeContext([tree[2], tree[0]])
+    assert not context.match(tree, 3)
+    tree.hide(tree[1])
+    assert context.match(tree, 3)
+    # The hidden element is still there for the old tree
+    assert not context.match(tree, 3, old_tree=True)
@@ -0,0 +1,77 @@
+import json
+
+from gitmergepy.metrics import (
+    DUMPS,
+    SAME_EL,
+    Metrics,
+    active_metrics,
+    collect_metrics,
+    count,
+)
+from gitmergepy.runner import merge_text
+from gitmergepy.stats import MergeStats
+
+
+def test_metrics_count():
+    metrics = Metrics()
+    metrics.count(SAME_EL)
+    metrics.count(SAME_EL, 2)
+    assert metrics.to_dict() == {SAME_EL: 3}
+    # Nothing to count into
+    count(SAME_EL)
+
+
+def test_collect_metrics_nested():
+    outer = Metrics()
+    inner = Metrics()
+    with collect_metrics(outer):
+        count(SAME_EL)
+        with collect_metrics(inner):
+            assert active_metrics() is inner
+            count(SAME_EL)
+    assert active_metrics() is None
+    assert inner.to_dict() == {SAME_EL: 1}
+    assert outer.to_dict() == {SAME_EL: 2}
+
+
+def test_merge_text_counters():
+    base = "def f():\n    return 1\n\n\ndef g():\n    pass\n"
+    current = "import os\n\n\n" + base
+    other = base.replace("return 1", "return 2")
+    stats = MergeStats()
+    metrics = Metrics()
+    with collect_metrics(metrics):
+        merge_text(base, current, other, stats=stats)
+    assert stats.counters[DUMPS] > 0
+    assert stats.counters == stats.to_dict()["counters"]
+    # The counters are deterministic
+    second_stats = MergeStats()
+    with collect_metrics(Metrics()):
+        merge_text(base, current, other, stats=second_stats)
+    assert second_stats.counters == stats.counters
+    # and aggregated in the metrics active around the merge
+    assert metrics.to_dict() == stats.counters
+
+
+def test_merge_text_no_counters():
+    from redbaron.base_nodes import Node
+
+    dumps = Node.dumps
+    stats = MergeStats()
+    with collect_metrics(Metrics()):
+        pass
+    assert Node.dumps is dumps
+    merge_text("a = 1\n", "a = 1\nb = 2\n", "a = 3\n", stats=stats)
+    assert stats.counters == {}
+
+
+def test_main_stats_counters(tmp_path, capsys):
+    from gitmergepy.runner import main
+
+    paths = []
+    for name, content in (("base", "a = 1\n"), ("current", "a = 1\nb = 2\n"), ("other", "a = 3\n")):
+        paths.append(str(tmp_path / ("%s.py" % name)))
+        (tmp_path / ("%s.py" % name)).write_text(content)
+    assert main([*paths, "--stats"]) == 0
+    stats = json.loads(capsys.readouterr().err.splitlines()[-1])
+    assert stats["counters"][DUMPS] > 0
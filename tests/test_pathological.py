@@ -0,0 +1,167 @@
+"""Adversarial inputs aimed at the super-linear paths of the merge.
+
+Each case is merged at two sizes and the growth of the internal operation
+counters (similarity computations, context probes, diff and apply steps
+and dumps() calls) is checked against a maximum exponent. Counting
+operations instead of timing keeps the checks stable on noisy machines.
+"""
+
+import logging
+import math
+
+import pytest
+
+from gitmergepy.budget import Budget
+from gitmergepy.metrics import DUMPS, Metrics, collect_metrics
+from gitmergepy.runner import merge_text
+from gitmergepy.stats import MergeStats
+
+SIZE_RATIO = 4
+
+
+def _lines(*parts):
+    return "".join(part + "\n" for part in parts)
+
+
+def _pass_functions(n):
+    # Identical bodies tie in best_block
+    functions = ["def function_%d():\n    pass\n\n" % i for i in range(n)]
+    base = "\n".join(functions)
+    other_functions = list(functions)
+    other_functions[n // 2] = "def function_%d():\n    return 1\n\n" % (n // 2)
+    other_functions.insert(n // 4, "def added():\n    pass\n\n")
+    current_functions = list(functions)
+    current_functions[3 * n // 4] = "def function_%d():\n    return 2\n\n" % (3 * n // 4)
+    return base, "\n".join(current_functions), "\n".join(other_functions)
+
+
+def _with_blocks(n):
+    # check_removed_withs and look_for_with
+    blocks = ["with context_%d():\n    call_%d()\n" % (i, i) for i in range(n)]
+    base = "".join(blocks)
+    other_blocks = list(blocks)
+    other_blocks[n // 2] = "call_%d()\n" % (n // 2)
+    current_blocks = list(blocks)
+    current_blocks[3 * n // 4] = "with context_%d():\n    call_%d()\n    added()\n" % (
+        3 * n // 4,
+        3 * n // 4,
+    )
+    return base, "".join(current_blocks), "".join(other_blocks)
+
+
+def _dict_items(n, edits=1):
+    # find_key
+    def render(items):
+        return "CONFIG = {\n" + "".join("    %s: %s,\n" % item for item in items) + "}\n"
+
+    items = [("'key_%d'" % i, str(i)) for i in range(n)]
+    other_items = list(items)
+    current_items = list(items)
+    for edit in range(edits):
+        index = (edit * n) // edits
+        other_items[index] = (other_items[index][0], "'changed'")
+        other_items.insert(index + 1, ("'other_%d'" % edit, "None"))
+    current_items.append(("'current'", "None"))
+    return render(items), render(current_items), render(other_items)
+
+
+def _dense_dict_items(n):
+    return _dict_items(n, edits=max(1, n // 50))
+
+
+def _elif_chain(n):
+    def render(bodies):
+        lines = ["if value == 0:", "    result = 0"]
+        for i, body in enumerate(bodies[1:], start=1):
+            lines += ["elif value == %d:" % i, "    " + body]
+        return _lines(*lines)
+
+    bodies = ["result = %d" % i for i in range(n)]
+    other_bodies = list(bodies)
+    other_bodies[n // 2] = "result = -1"
+    current_bodies = list(bodies)
+    current_bodies[3 * n // 4] = "result = -2"
+    return render(bodies), render(current_bodies), render(other_bodies)
+
+
+def _all_list(n):
+    def render(names):
+        return "__all__ = [\n" + "".join("    '%s',\n" % name for name in names) + "]\n"
+
+    names = ["name_%d" % i for i in range(n)]
+    other_names = list(names)
+    other_names.insert(n // 2, "other_name")
+    current_names = names + ["current_name"]
+    return render(names), render(current_names), render(other_names)
+
+
+def _imports(n):
+    # Whole import blocks are merged as sets of names
+    imports = ["from module_%d import name_%d" % (i, i) for i in range(n)]
+    other_imports = list(imports)
+    other_imports[n // 2] = "from module_%d import name_%d, other" % (n // 2, n // 2)
+    other_imports.insert(n // 4, "import other")
+    current_imports = imports + ["import current"]
+    body = ["", "", "x = 1"]
+    return _lines(*imports, *body), _lines(*current_imports, *body), _lines(*other_imports, *body)
+
+
+def _calls(n, edits=1):
+    # same_call_guess and parent.find_all
+    calls = ["register('name_%d', handler_%d, priority=%d)" % (i, i, i) for i in range(n)]
+    other_calls = list(calls)
+    current_calls = list(calls)
+    for edit in range(edits):
+        index = (edit * n) // edits + n // (2 * edits)
+        other_calls[index] = "register('name_%d', handler_%d, priority=-1)" % (index, index)
+    current_calls.insert(n // 4, "register('current', handler)")
+    return _lines(*calls), _lines(*current_calls), _lines(*other_calls)
+
+
+def _dense_calls(n):
+    return _calls(n, edits=max(1, n // 50))
+
+
+# (case, size, max exponent of the operation count)
+CASES = [
+    (_pass_functions, 50, 1.3),
+    (_with_blocks, 50, 1.3),
+    (_dict_items, 100, 1.3),
+    (_elif_chain, 50, 1.3),
+    (_all_list, 100, 1.3),
+    (_calls, 50, 1.3),
+    (_imports, 60, 1.3),
+    # The number of edits grows with the size, dict keys are looked up
+    # in an index
+    (_dense_dict_items, 100, 1.5),
+    # Calls are looked up by name, but find_context() probes every index
+    # of the module for the context of each edit: edits times module size
+    # probes, quadratic here since the edits grow with the size. Nothing
+    # else grows faster, the exponent stays under 2.
+    (_dense_calls, 50, 2.0),
+]
+
+
+def _count_operations(case, size):
+    budget = Budget()
+    stats = MergeStats()
+    with collect_metrics(Metrics()):
+        merge_text(*case(size), budget=budget, stats=stats)
+    assert not stats.fell_back
+    return budget.total_ops + stats.counters.get(DUMPS, 0)
+
+
+@pytest.mark.parametrize(
+    "case,size,max_exponent", CASES, ids=[case.__name__.lstrip("_") for case, _, _ in CASES]
+)
+def test_operations_growth(case, size, max_exponent, caplog):
+    caplog.set_level(logging.WARNING)
+    small = _count_operations(case, size)
+    large = _count_operations(case, size * SIZE_RATIO)
+    exponent = math.log(large / small, SIZE_RATIO)
+    assert exponent <= max_exponent, "%d ops for size %d, %d for size %d" % (
+        small,
+        size,
+        large,
+        size * SIZE_RATIO,
+    )
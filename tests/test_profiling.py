@@ -0,0 +1,59 @@
+import pstats
+
+import pytest
+
+from gitmergepy.profiling import APPLY, DIFF, Profile, active_profile, profiling
+
+
+def test_profile_add():
+    profile = Profile()
+    profile.add(APPLY, "ChangeClass", "Foo", 1.0)
+    profile.add(APPLY, "ChangeClass", "Foo", 2.0)
+    profile.add(APPLY, "ChangeClass", "Bar", 0.5)
+    profile.add(DIFF, "diff_class", "Foo", 4.0)
+    assert profile.slowest(2) == [
+        (DIFF, "diff_class", "Foo", 1, 4.0),
+        (APPLY, "ChangeClass", "Foo", 2, 3.0),
+    ]
+    assert profile.totals(APPLY) == [("ChangeClass", 3, 3.5)]
+    report = profile.report()
+    assert "apply ChangeClass Foo" in report
+    assert "diff_class" in report
+
+
+def test_profile_call():
+    profile = Profile()
+    assert profile.call(APPLY, "AddEl", None, lambda x: x + 1, 1) == 2
+    assert profile.timings[(APPLY, "AddEl", "")][0] == 1
+    with pytest.raises(ZeroDivisionError):
+        profile.call(APPLY, "AddEl", None, lambda: 1 / 0)
+    # Failed calls are timed too
+    assert profile.timings[(APPLY, "AddEl", "")][0] == 2
+
+
+def test_profiling(tmp_path):
+    profile = Profile(cprofile=True)
+    with profiling(profile):
+        assert active_profile() is profile
+        sum(range(1000))
+    assert active_profile() is None
+    filename = str(tmp_path / "merge.prof")
+    profile.dump_stats(filename)
+    assert pstats.Stats(filename).total_calls
+    with pytest.raises(ValueError):
+        Profile().dump_stats(filename)
+
+
+def test_merge_text_profile():
+    from gitmergepy.runner import merge_text
+
+    base = "class A:\n    def f(self):\n        return 1\n"
+    current = "import os\n\n\n" + base
+    other = "class A:\n    def f(self):\n        return 2\n"
+    profile = Profile()
+    with profiling(profile):
+        output, clean = merge_text(base, current, other)
+    assert clean
+    assert "return 2" in output
+    assert profile.totals(DIFF)
+    assert profile.totals(APPLY)
@@ -0,0 +1,83 @@
+import json
+import subprocess
+
+from gitmergepy import runner
+from gitmergepy.replay import (
+    CLEAN,
+    ERROR,
+    ReplayResult,
+    list_merges,
+    replay_file,
+    replay_repository,
+    summarize,
+    write_report,
+)
+
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@test", *args],
+        cwd=repo,
+        check=False,
+        capture_output=True,
+    )
+
+
+def _merged_repo(tmp_path):
+    repo = str(tmp_path)
+    module = tmp_path / "module.py"
+    _git(repo, "init", "-q", "-b", "main")
+    module.write_text("def a():\n    pass\n\n\ndef b():\n    pass\n")
+    _git(repo, "add", "module.py")
+    _git(repo, "commit", "-q", "-m", "base")
+    _git(repo, "checkout", "-q", "-b", "other")
+    module.write_text("def a():\n    return 1\n\n\ndef b():\n    pass\n")
+    _git(repo, "commit", "-q", "-a", "-m", "other")
+    _git(repo, "checkout", "-q", "main")
+    module.write_text("def a():\n    pass\n\n\ndef b():\n    return 2\n")
+    _git(repo, "commit", "-q", "-a", "-m", "current")
+    _git(repo, "merge", "-q", "--no-edit", "other")
+    return repo
+
+
+def test_list_merges(tmp_path):
+    repo = _merged_repo(tmp_path)
+    merges = list(list_merges(repo))
+    assert len(merges) == 1
+    assert len(merges[0]) == 3
+
+
+def test_replay_repository(tmp_path):
+    repo = _merged_repo(tmp_path)
+    results = replay_repository(repo)
+    assert len(results) == 1
+    assert results[0].path == "module.py"
+    assert results[0].outcome == CLEAN
+    assert results[0].agrees
+    summary = summarize(results)
+    assert summary["resolution_rate"] == 1
+    assert summary["agreement_rate"] == 1
+
+
+def test_replay_file_crash(monkeypatch):
+    def crashing_merge_files(*args, **kwargs):
+        raise KeyError("el")
+
+    monkeypatch.setattr(runner, "merge_files", crashing_merge_files)
+    result = ReplayResult("0" * 40, "module.py")
+    replay_file(result, "a = 1\n", "a = 2\n", "a = 3\n", "a = 2\n")
+    assert result.outcome == ERROR
+    assert result.error == "KeyError: 'el'"
+    assert result.agrees is None
+
+
+def test_write_report(tmp_path):
+    (tmp_path / "repo").mkdir()
+    repo = _merged_repo(tmp_path / "repo")
+    results = replay_repository(repo)
+    write_report(results, str(tmp_path / "report.json"))
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["summary"]["files"] == 1
+    assert report["results"][0]["path"] == "module.py"
+    write_report(results, str(tmp_path / "report.csv"))
+    assert (tmp_path / "report.csv").read_text().startswith("commit,path,outcome")
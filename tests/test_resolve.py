@@ -0,0 +1,70 @@
+import subprocess
+
+from gitmergepy import runner
+from gitmergepy.resolve import CatFile, _merge_one, list_unmerged, resolve_repository
+
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@test", *args],
+        cwd=repo,
+        check=False,
+        capture_output=True,
+    )
+
+
+def _conflicted_repo(tmp_path):
+    repo = str(tmp_path)
+    module = tmp_path / "module.py"
+    _git(repo, "init", "-q", "-b", "main")
+    module.write_text("def a():\n    pass\n")
+    _git(repo, "add", "module.py")
+    _git(repo, "commit", "-q", "-m", "base")
+    _git(repo, "checkout", "-q", "-b", "other")
+    module.write_text("def a():\n    pass\n\n\ndef c():\n    pass\n")
+    _git(repo, "commit", "-q", "-a", "-m", "other")
+    _git(repo, "checkout", "-q", "main")
+    module.write_text("def a():\n    pass\n\n\ndef b():\n    pass\n")
+    _git(repo, "commit", "-q", "-a", "-m", "current")
+    _git(repo, "merge", "-q", "other")
+    return repo
+
+
+def test_list_unmerged(tmp_path):
+    repo = _conflicted_repo(tmp_path)
+    unmerged = list_unmerged(repo)
+    assert list(unmerged) == ["module.py"]
+    assert sorted(unmerged["module.py"]) == [1, 2, 3]
+
+
+def test_cat_file(tmp_path):
+    repo = _conflicted_repo(tmp_path)
+    stages = list_unmerged(repo)["module.py"]
+    with CatFile(cwd=repo) as cat_file:
+        base, current, other = cat_file.read_many([stages[1], stages[2], stages[3]])
+        assert cat_file.read(stages[1]) == base
+    assert base == b"def a():\n    pass\n"
+    assert b"def b" in current
+    assert b"def c" in other
+
+
+def test_resolve_repository(tmp_path):
+    repo = _conflicted_repo(tmp_path)
+    results = resolve_repository(cwd=repo, jobs=1)
+    assert len(results) == 1
+    assert results[0].clean
+    output = (tmp_path / "module.py").read_text()
+    assert "def b" in output
+    assert "def c" in output
+    assert list_unmerged(repo) == {}
+
+
+def test_merge_one_crash(monkeypatch):
+    def crashing_merge_text(base, current, other):
+        raise RecursionError("maximum recursion depth exceeded")
+
+    monkeypatch.setattr(runner, "merge_text", crashing_merge_text)
+    result = _merge_one("module.py", "a = 1\n", "a = 2\n", "a = 3\n")
+    assert not result.clean
+    assert result.output is None
+    assert result.error == "RecursionError: maximum recursion depth exceeded"
@@ -1,5 +1,398 @@
-from gitmergepy.runner import main
+import ast
+import json
+
+from gitmergepy.budget import Budget
+from gitmergepy.runner import check_ast, check_files, main, merge_text
+from gitmergepy.stats import TEXT_STRATEGY, MergeStats
+
+CONFLICT_BASE = """
+if cond:
+    # context
+    pass
+"""
+CONFLICT_CURRENT = """
+if cond:
+    # changed context
+    changed_too
+"""
+CONFLICT_OTHER = """
+if cond:
+    # context
+    # added elements
+    pass
+"""
+
+
+def _write_files(tmp_path, base, current, other):
+    paths = []
+    for name, content in (("base.py", base), ("current.py", current), ("other.py", other)):
+        path = tmp_path / name
+        path.write_text(content)
+        paths.append(str(path))
+    return paths
 
 
 def test_main():
     main(["tests/files/base.py", "tests/files/current.py", "tests/files/other.py"])
+
+
+def test_check_files_no_conflict(tmp_path):
+    base, current, other = _write_files(tmp_path, "a = 1\n", "a = 1\nb = 2\n", "a = 3\n")
+    report = check_files(base, current, other)
+    assert not report.conflicts
+    assert (tmp_path / "current.py").read_text() == "a = 1\nb = 2\n"
+
+
+def test_check_files_conflict(tmp_path):
+    base, current, other = _write_files(tmp_path, CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER)
+    report = check_files(base, current, other)
+    assert len(report.conflicts) == 1
+    assert report.conflicts[0].reason == "context not found"
+    assert report.conflicts[0].location == "<module>"
+    # Nothing is written
+    assert (tmp_path / "current.py").read_text() == CONFLICT_CURRENT
+
+
+def test_check_files_stop_at_first(tmp_path):
+    # The same conflict twice, in two blocks
+    versions = [
+        text + text.replace("cond", "other_cond")
+        for text in (CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER)
+    ]
+    base, current, other = _write_files(tmp_path, *versions)
+    assert len(check_files(base, current, other).conflicts) == 2
+    report = check_files(base, current, other, stop_at_first=True)
+    assert len(report.conflicts) == 1
+
+
+def test_check_ast_stop_at_first_skips_later_changes():
+    from redbaron import RedBaron
+
+    base, current, other = (
+        RedBaron(text) for text in (CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER + "last = 1\n")
+    )
+    report = check_ast(base, current, other, stop_at_first=True)
+    assert len(report.conflicts) == 1
+    # The addition following the conflict was not applied
+    assert "last" not in current.dumps()
+
+    base, current, other = (
+        RedBaron(text) for text in (CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER + "last = 1\n")
+    )
+    check_ast(base, current, other)
+    assert "last = 1" in current.dumps()
+
+
+def test_check_main(tmp_path, capsys):
+    base, current, other = _write_files(tmp_path, CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER)
+    assert main(["check", base, current, other]) == 1
+    assert capsys.readouterr().out == "<module>: context not found\n"
+
+
+def test_merge_text_budget_fallback():
+    stats = MergeStats()
+    output, clean = merge_text(
+        "a = 1\n\nb = 1\n",
+        "a = 1\n\nb = 2\n",
+        "a = 3\n\nb = 1\n",
+        budget=Budget(max_ops=1),
+        stats=stats,
+    )
+    assert clean
+    assert output == "a = 3\n\nb = 2\n"
+    assert stats.strategy == TEXT_STRATEGY
+    assert stats.fell_back
+
+
+def test_main_budget_exit_code(tmp_path, caplog):
+    base, current, other = _write_files(tmp_path, "a = 1\n", "a = 1\nb = 2\n", "a = 3\n")
+    # A clean line based merge is a clean merge
+    assert main([base, current, other, "--max-ops", "1"]) == 0
+    assert "Merged line by line" in caplog.text
+    assert (tmp_path / "current.py").read_text() == "a = 3\nb = 2\n"
+
+
+def test_merge_text_memory_fallback():
+    stats = MergeStats()
+    _, clean = merge_text("a = 1\n", "a = 1\n", "a = 3\n", budget=Budget(max_memory=1), stats=stats)
+    assert clean
+    assert stats.strategy == TEXT_STRATEGY
+    assert stats.peak_memory > 0
+
+
+def test_merge_text_chunked():
+    base = "def a():\n    pass\n\n\ndef b():\n    return 1\n"
+    current = base.replace("return 1", "return 2")
+    other = base + "\n\ndef c():\n    pass\n"
+    stats = MergeStats()
+    output, clean = merge_text(base, current, other, stats=stats, chunked=True)
+    assert clean
+    assert output == current + "\n\ndef c():\n    pass\n"
+    assert stats.collapsed == 1
+
+
+def test_merge_text_chunked_edit_next_to_chunk():
+    base = "def a():\n    pass\n\n\ndef b():\n    return 1\n"
+    current = base.replace("return 1", "return 2")
+    # Edited right after the collapsed function a
+    other = base.replace("\n\n\ndef b", "\n\nx = 1\n\n\ndef b")
+    output, clean = merge_text(base, current, other, chunked=True)
+    assert clean
+    assert (output, clean) == merge_text(base, current, other)
+    assert output.count("def a():\n    pass\n") == 1
+    assert "gitmergepy chunk" not in output
+
+
+def test_merge_text_plan_stats():
+    stats = MergeStats()
+    merge_text("a = 1\n", "a = 1\n", "a = 1\nb = 2\n", stats=stats)
+    assert stats.plan_actions
+    assert stats.plan_bytes
+
+
+def test_main_report(tmp_path):
+    base, current, other = _write_files(tmp_path, CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER)
+    report_file = tmp_path / "report.json"
+    assert main([base, current, other, "--report", str(report_file)]) == 1
+    report = json.loads(report_file.read_text())
+    assert report["conflicts"] == 1
+    conflict = report["details"][0]
+    assert conflict["reason"] == "context not found"
+    lines = (tmp_path / "current.py").read_text().splitlines()
+    assert lines[conflict["start"] - 1].strip() == "# <<<<<<<<<<"
+    assert lines[conflict["end"] - 1].strip() == "# >>>>>>>>>>"
+
+
+def test_merge_text_import_block():
+    imports = ["from module_%d import name_%d\n" % (i, i) for i in range(60)]
+    base = "".join(imports) + "\n\nx = 1\n"
+    other_imports = list(imports)
+    del other_imports[3]
+    other_imports[5] = "from module_5 import extra, name_5\n"
+    other = "".join(other_imports) + "import os\n\n\nx = 1\n"
+    current = "".join(imports) + "from current import thing\n\n\nx = 2\n"
+    output, clean = merge_text(base, current, other)
+    assert clean
+    assert "from module_3 import" not in output
+    assert "from module_5 import extra, name_5\n" in output
+    assert "from current import thing\nimport os\n" in output
+    assert output.endswith("\n\n\nx = 2\n")
+
+
+def test_merge_text_import_block_later_imports():
+    imports = ["from module_%d import name_%d\n" % (i, i) for i in range(60)]
+    base = "".join(imports) + "\n\nx = 1\n\nimport late\n"
+    other = base.replace("from module_5 import name_5", "from module_5 import extra, name_5")
+    other = other.replace("\n\nx = 1", "import os\n\n\nx = 1")
+    current = base.replace("x = 1", "x = 2")
+    output, clean = merge_text(base, current, other)
+    assert clean
+    assert "from module_5 import extra, name_5\n" in output
+    # Added to the leading block, not after the last import of the module
+    assert output.index("import os\n") < output.index("x = 2")
+    assert output.endswith("\nimport late\n")
+
+
+def test_merge_text_import_block_alias_conflict():
+    imports = ["from module_%d import name_%d\n" % (i, i) for i in range(60)]
+    base = "".join(imports) + "\n\nx = 1\n"
+    other = base.replace("from module_5 import name_5\n", "")
+    current = base.replace("import name_5", "import name_5 as alias")
+    output, clean = merge_text(base, current, other)
+    assert not clean
+    assert "from module_5 import name_5 as alias\n" in output
+
+
+def test_merge_text_import_block_future():
+    imports = ["from module_%d import name_%d\n" % (i, i) for i in range(60)]
+    base = '"""Docstring."""\n' + "".join(imports) + "\n\nx = 1\n"
+    other = base.replace("from module_0", "from __future__ import annotations\nfrom module_0")
+    other = other.replace(
+        "from module_59 import name_59\n", "from module_59 import name_59\nimport os\n"
+    )
+    current = base.replace("x = 1", "x = 2")
+    output, clean = merge_text(base, current, other)
+    assert clean
+    # Right after the docstring, before the other imports
+    assert output.startswith('"""Docstring."""\nfrom __future__ import annotations\nfrom module_0')
+    assert "from module_59 import name_59\nimport os\n" in output
+    ast.parse(output)
+
+
+def test_merge_text_long_list():
+    def render(names):
+        return "__all__ = [\n" + "".join("    '%s',\n" % name for name in names) + "]\n"
+
+    names = ["name_%d" % i for i in range(40)]
+    other_names = list(names)
+    other_names.insert(11, "other")
+    other_names.remove("name_20")
+    current_names = list(names) + ["current"]
+    current_names[30] = "renamed"
+    output, clean = merge_text(render(names), render(current_names), render(other_names))
+    assert clean
+    expected = list(current_names)
+    expected.insert(11, "other")
+    expected.remove("name_20")
+    assert ast.literal_eval(ast.parse(output).body[0].value) == expected
+
+
+def test_merge_text_long_list_same_item():
+    def render(names):
+        return "__all__ = [\n" + "".join("    '%s',\n" % name for name in names) + "]\n"
+
+    names = ["name_%d" % i for i in range(40)]
+    current_names = list(names)
+    current_names[20] = "current"
+    other_names = list(names)
+    other_names[20] = "other"
+    output, clean = merge_text(render(names), render(current_names), render(other_names))
+    assert not clean
+    items = ast.literal_eval(ast.parse(output).body[0].value)
+    assert "other" not in items
+    assert "current" in items
+    # The same change on both sides is not a conflict
+    output, clean = merge_text(render(names), render(current_names), render(current_names))
+    assert clean
+    assert output == render(current_names)
+
+
+def test_merge_text_long_list_duplicate_before_item():
+    def render(names):
+        return "__all__ = [\n" + "".join("    '%s',\n" % name for name in names) + "]\n"
+
+    names = ["name_%d" % i for i in range(40)]
+    # The first name_20 is now the one added here, not the one other edits
+    current_names = list(names)
+    current_names.insert(5, "name_20")
+    other_names = list(names)
+    other_names[20] = "other"
+    output, clean = merge_text(render(names), render(current_names), render(other_names))
+    assert not clean
+    items = ast.literal_eval(ast.parse(output).body[0].value)
+    assert items == current_names
+
+
+def test_merge_text_several_others():
+    base = "import os\n\n\ndef f():\n    return 1\n"
+    current = "import os\nimport re\n\n\ndef f():\n    return 1\n"
+    first_other = "import os\n\n\ndef f():\n    return 2\n"
+    second_other = "import os\n\n\ndef f():\n    return 1\n\n\ndef g():\n    pass\n"
+    stats = MergeStats()
+    output, clean = merge_text(base, current, [first_other, second_other], stats=stats)
+    assert clean
+    assert output == "import os\nimport re\n\n\ndef f():\n    return 2\n\n\ndef g():\n    pass\n"
+    single_stats = MergeStats()
+    merge_text(base, current, first_other, stats=single_stats)
+    assert stats.plan_actions > single_stats.plan_actions
+
+
+def test_main_several_others(tmp_path):
+    base, current, other = _write_files(tmp_path, "a = 1\n", "a = 1\nb = 2\n", "a = 3\n")
+    second_other = tmp_path / "second_other.py"
+    second_other.write_text("a = 1\n\n\ndef f():\n    pass\n")
+    assert main([base, current, other, str(second_other)]) == 0
+    assert (tmp_path / "current.py").read_text() == "a = 3\nb = 2\n\n\ndef f():\n    pass\n"
+
+
+def _functions(returns):
+    return "\n\n".join(
+        "def f%d():\n    return %s\n" % (i, value) for i, value in enumerate(returns)
+    )
+
+
+def test_merge_text_symmetric():
+    base = _functions(range(10))
+    current = _functions([0, -1] + list(range(2, 10)))
+    other = _functions(list(range(5)) + [-2] * 5)
+    expected, _ = merge_text(base, current, other)
+    stats = MergeStats()
+    output, clean = merge_text(base, current, other, stats=stats, symmetric=True)
+    assert clean
+    assert stats.swapped
+    assert output == expected
+
+
+def test_merge_text_symmetric_conflict():
+    base = CONFLICT_BASE + _functions(range(5))
+    current = CONFLICT_CURRENT + _functions(range(5))
+    other = CONFLICT_OTHER + _functions([-1] * 5)
+    expected_stats = MergeStats()
+    expected, expected_clean = merge_text(base, current, other, stats=expected_stats)
+    stats = MergeStats()
+    output, clean = merge_text(base, current, other, stats=stats, symmetric=True)
+    assert not stats.swapped
+    assert (output, clean) == (expected, expected_clean)
+    # The aborted swapped merge is not counted
+    assert stats.plan_actions == expected_stats.plan_actions
+    assert stats.plan_bytes == expected_stats.plan_bytes
+
+
+def test_merge_text_plan_cache(tmp_path):
+    from gitmergepy.cache import PlanCache, use_plan_cache
+
+    base = "a = 1\n"
+    other = "a = 1\n\n\ndef f():\n    pass\n"
+    with use_plan_cache(PlanCache(str(tmp_path))):
+        first_stats = MergeStats()
+        first_output, _ = merge_text(base, "a = 1\nb = 2\n", other, stats=first_stats)
+        second_stats = MergeStats()
+        second_output, _ = merge_text(base, "a = 1\nb = 2\n", other, stats=second_stats)
+    assert first_stats.cached_plans == 0
+    assert second_stats.cached_plans == 1
+    assert second_output == first_output
+
+
+def test_merge_text_plan_cache_module(tmp_path):
+    from benchmarks.generators import ModuleSpec, generate_versions
+    from gitmergepy.cache import PlanCache, use_plan_cache
+
+    spec = ModuleSpec(functions=30, classes=3, imports=10, dict_size=20, depth=2)
+    base, current, other = generate_versions(spec, density=0.1)
+    expected, _ = merge_text(base, current, other)
+    with use_plan_cache(PlanCache(str(tmp_path))):
+        first_stats = MergeStats()
+        merge_text(base, current, other, stats=first_stats)
+        second_stats = MergeStats()
+        output, clean = merge_text(base, current, other, stats=second_stats)
+    assert first_stats.skipped_plans == 0
+    assert second_stats.cached_plans == 1
+    assert clean
+    assert output == expected
+
+
+def test_merge_text_outcome_cache(tmp_path):
+    from gitmergepy.cache import OutcomeCache, use_outcome_cache
+    from gitmergepy.conflicts import ConflictReport
+
+    with use_outcome_cache(OutcomeCache(str(tmp_path))):
+        first_report = ConflictReport()
+        first = merge_text(CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER, report=first_report)
+        stats = MergeStats()
+        second_report = ConflictReport()
+        second = merge_text(
+            CONFLICT_BASE, CONFLICT_CURRENT, CONFLICT_OTHER, stats=stats, report=second_report
+        )
+    assert stats.cached_outcome
+    assert second == first
+    assert second_report.to_dict() == first_report.to_dict()
+    assert stats.conflicts == 1
+
+
+def test_main_cache(tmp_path, monkeypatch, capsys):
+    from gitmergepy.cache import CACHE_DIR_ENV, OutcomeCache
+
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    OutcomeCache().put(("key",), "output\n", True, [])
+    assert main(["cache", "info", "--only", "outcomes"]) == 0
+    assert capsys.readouterr().out.startswith("outcomes: 1 entries")
+    assert main(["cache", "clear"]) == 0
+    assert capsys.readouterr().out == "plans: 0 entries deleted\noutcomes: 1 entries deleted\n"
+
+
+def test_main_profile(tmp_path, capsys):
+    base, current, other = _write_files(tmp_path, "a = 1\n", "a = 1\nb = 2\n", "a = 3\n")
+    stats_file = tmp_path / "merge.prof"
+    assert main([base, current, other, "--profile-stats", str(stats_file)]) == 0
+    assert "slowest elements:" in capsys.readouterr().err
+    assert stats_file.exists()
@@ -0,0 +1,39 @@
+from gitmergepy.budget import Budget, enforce
+from gitmergepy.stringdiff import StringDiffer, apply_patches, make_patches, use_differ
+
+OLD = "bacon\neggs\nham\nguido\n"
+NEW = "python\neggs\nham\nguido\n"
+
+
+def test_make_patches():
+    patches = make_patches(OLD, NEW)
+    assert apply_patches(patches, OLD) == NEW
+    # The patches are reusable
+    assert apply_patches(patches, OLD) == NEW
+    # And apply to a text changed elsewhere
+    assert apply_patches(patches, OLD + "spam\n") == NEW + "spam\n"
+
+
+def test_make_patches_unchanged():
+    assert make_patches(OLD, OLD) == []
+    assert apply_patches([], OLD) == OLD
+
+
+def test_make_patches_over_size():
+    differ = StringDiffer(max_size=10)
+    assert differ._trimmed_diffs("abcXdef", "abcYYdef") == [
+        (0, "abc"),
+        (-1, "X"),
+        (1, "YY"),
+        (0, "def"),
+    ]
+    with use_differ(differ):
+        patches = make_patches(OLD, NEW)
+        assert apply_patches(patches, OLD) == NEW
+
+
+def test_make_patches_charged():
+    budget = Budget()
+    with enforce(budget):
+        make_patches(OLD, NEW)
+    assert budget.ops["diff"] == 1
@@ -0,0 +1,33 @@
+from gitmergepy.textmerge import conflict_ranges, merge_lines
+
+
+def test_merge_lines_identical():
+    assert merge_lines("a\nb\n", "a\nb\n", "a\nb\n") == ("a\nb\n", 0)
+
+
+def test_merge_lines_both_sides():
+    base = "a\nb\nc\n"
+    current = "a0\na\nb\nc\n"
+    other = "a\nb\nc\nd\n"
+    assert merge_lines(base, current, other) == ("a0\na\nb\nc\nd\n", 0)
+
+
+def test_merge_lines_change():
+    base = "a\nb\nc\n"
+    current = "a\nb\nc\n"
+    other = "a\nB\nc\n"
+    assert merge_lines(base, current, other) == ("a\nB\nc\n", 0)
+
+
+def test_merge_lines_conflict():
+    base = "a\nb\nc\n"
+    current = "a\nb1\nc\n"
+    other = "a\nb2\nc\n"
+    output, conflicts = merge_lines(base, current, other)
+    assert conflicts == 1
+    assert output == "a\n<<<<<<< current\nb1\n=======\nb2\n>>>>>>> other\nc\n"
+
+
+def test_conflict_ranges():
+    output, _ = merge_lines("a\nb\nc\n", "a\nb1\nc\n", "a\nb2\nc\n")
+    assert conflict_ranges(output) == [(2, 6)]
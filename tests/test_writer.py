@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+import pytest
+
+from gitmergepy.writer import write_if_changed
+
+
+def test_write_if_changed(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("a = 1\n")
+    path.chmod(0o640)
+    assert write_if_changed(str(path), ["a = 1\n", "b = 2\n"], original="a = 1\n")
+    assert path.read_text() == "a = 1\nb = 2\n"
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["module.py"]
+
+
+def test_write_if_changed_new_file(tmp_path):
+    path = tmp_path / "module.py"
+    umask = os.umask(0o022)
+    try:
+        assert write_if_changed(str(path), ["a = 1\n"])
+    finally:
+        os.umask(umask)
+    assert path.read_text() == "a = 1\n"
+    assert path.stat().st_mode & 0o777 == 0o644
+
+
+def test_write_if_changed_unchanged(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("a = 1\nb = 2\n")
+    os.utime(path, (0, 0))
+    assert not write_if_changed(str(path), ["a = 1\n", "b = 2\n"], original="a = 1\nb = 2\n")
+    assert path.stat().st_mtime == 0
+    # A prefix of the original is a change
+    assert write_if_changed(str(path), ["a = 1\n"], original="a = 1\nb = 2\n")
+    assert path.read_text() == "a = 1\n"
+
+
+def test_write_if_changed_same_text(tmp_path, monkeypatch):
+    path = tmp_path / "module.py"
+    path.write_text("a = 1\n")
+
+    def mkstemp(*args, **kwargs):
+        raise AssertionError("no temporary file expected")
+
+    monkeypatch.setattr(tempfile, "mkstemp", mkstemp)
+    assert not write_if_changed(str(path), "a = 1\n", original="a = 1\n")
+
+
+def test_write_if_changed_error(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("a = 1\n")
+
+    def chunks():
+        yield "b = 2\n"
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        write_if_changed(str(path), chunks())
+    assert path.read_text() == "a = 1\n"
+    assert os.listdir(tmp_path) == ["module.py"]